@@ -3,18 +3,18 @@ from typing import Any, Dict
 from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Request
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.responses import RedirectResponse
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
-from app.core.database import get_db
+from app.core.database import get_async_db
 from app.core.security import (
     create_access_token,
     create_refresh_token,
-    verify_password,
-    get_password_hash,
+    current_token_version,
     generate_password
 )
-from app.core.rate_limiter import rate_limit
+from app.core.passwords import password_hasher
 from app.models.user import User, UserRole
 from app.schemas.user import (
     UserCreate,
@@ -91,16 +91,36 @@ def log_auth_attempt(
         logger.warning(f"🚨 AUTH FAILED: {json.dumps(log_data, ensure_ascii=False)}")
 
 
+async def check_password(db: AsyncSession, user: User, password: str) -> bool:
+    """
+    Проверка пароля в пуле bcrypt; устаревший хэш (меньше BCRYPT_ROUNDS)
+    пересчитывается и сохраняется прозрачно для пользователя
+    """
+    valid, new_hash = await password_hasher.verify(password, user.hashed_password)
+    if valid and new_hash:
+        user_id = user.id
+        user.hashed_password = new_hash
+        try:
+            await db.commit()
+        except Exception as e:
+            # Вход не зависит от апгрейда хэша - попробуем при следующем
+            logger.warning(f"Password hash upgrade failed for user {user_id}: {e}")
+            # rollback истекает все объекты сессии: без перечитывания первое же
+            # обращение к user (is_active в login) - ленивый IO в AsyncSession
+            await db.rollback()
+            await db.refresh(user)
+    return valid
+
+
 @router.post("/register", response_model=UserSchema)
-@rate_limit("auth_register")
-def register(
+async def register(
     request: Request,
     user_in: RegisterRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> Any:
     """Register new user - punk rock style"""
     # Check if user exists
-    user = db.query(User).filter(User.email == user_in.email).first()
+    user = await db.scalar(select(User).where(User.email == user_in.email))
     if user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -110,32 +130,32 @@ def register(
     # Create new user
     user = User(
         email=user_in.email,
-        hashed_password=get_password_hash(user_in.password),
+        hashed_password=await password_hasher.hash(user_in.password),
         full_name=user_in.full_name,
         phone=user_in.phone,
         address=user_in.address,
         role=UserRole.CLIENT
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     
     return user
 
 
 @router.post("/login", response_model=Token)
-@rate_limit("auth_login")
-def login(
+async def login(
     request: Request,
     user_credentials: LoginRequest, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> Any:
     """Standard email/password login"""
     start_time = time.time()
     
     try:
-        user = db.query(User).filter(User.email == user_credentials.email).first()
-        if not user or not verify_password(user_credentials.password, user.hashed_password):
+        user = await db.scalar(select(User).where(User.email == user_credentials.email))
+        # bcrypt - CPU-bound, считается в пуле процессов
+        if not user or not await check_password(db, user, user_credentials.password):
             log_auth_attempt(
                 method="email_password",
                 request=request,
@@ -163,8 +183,9 @@ def login(
             )
         
         # ✅ ИСПРАВЛЕНО: JWT требует sub как строку
-        access_token = create_access_token(data={"sub": str(user.id)})
-        refresh_token = create_refresh_token(data={"sub": str(user.id)})
+        token_version = await current_token_version(user.id)
+        access_token = create_access_token(data={"sub": str(user.id), "tv": token_version})
+        refresh_token = create_refresh_token(data={"sub": str(user.id), "tv": token_version})
         
         log_auth_attempt(
             method="email_password",
@@ -204,14 +225,14 @@ def login(
 
 
 @router.post("/admin-login", response_model=Token)
-def admin_login(
+async def admin_login(
     login_data: LoginRequest,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> Any:
     """Admin login - only for emergency access"""
-    user = db.query(User).filter(User.email == login_data.email).first()
-    if not user or not verify_password(login_data.password, user.hashed_password):
+    user = await db.scalar(select(User).where(User.email == login_data.email))
+    if not user or not await check_password(db, user, login_data.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password"
@@ -231,8 +252,9 @@ def admin_login(
         )
     
     # Create tokens
-    access_token = create_access_token(data={"sub": user.id})
-    refresh_token = create_refresh_token(data={"sub": user.id})
+    token_version = await current_token_version(user.id)
+    access_token = create_access_token(data={"sub": user.id, "tv": token_version})
+    refresh_token = create_refresh_token(data={"sub": user.id, "tv": token_version})
     
     logger.info(f"Admin login: {user.id} ({user.email})")
     
@@ -244,10 +266,10 @@ def admin_login(
 
 
 @router.post("/refresh", response_model=Token)
-def refresh_token(
+async def refresh_token(
     request: Request,
     refresh_request: dict,  # ✅ ИСПРАВЛЕНО: принимаем JSON вместо простого параметра
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> Any:
     """Refresh access token"""
     start_time = time.time()
@@ -283,7 +305,7 @@ def refresh_token(
             )
         
         user_id = payload.get("sub")
-        user = db.query(User).filter(User.id == user_id).first()
+        user = await db.get(User, int(user_id)) if user_id else None
         if not user or not user.is_active:
             log_auth_attempt(
                 method="token_refresh",
@@ -299,8 +321,9 @@ def refresh_token(
         
         # Create new tokens
         # ✅ ИСПРАВЛЕНО: JWT требует sub как строку
-        access_token = create_access_token(data={"sub": str(user.id)})
-        new_refresh_token = create_refresh_token(data={"sub": str(user.id)})
+        token_version = await current_token_version(user.id)
+        access_token = create_access_token(data={"sub": str(user.id), "tv": token_version})
+        new_refresh_token = create_refresh_token(data={"sub": str(user.id), "tv": token_version})
         
         log_auth_attempt(
             method="token_refresh",
@@ -334,17 +357,17 @@ def refresh_token(
 
 
 @router.post("/password-reset")
-def request_password_reset(
+async def request_password_reset(
     reset_data: PasswordResetRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> Any:
     """Request password reset - we'll send you a new one"""
-    user = db.query(User).filter(User.email == reset_data.email).first()
+    user = await db.scalar(select(User).where(User.email == reset_data.email))
     if user:
         # Generate new password
         new_password = generate_password()
-        user.hashed_password = get_password_hash(new_password)
-        db.commit()
+        user.hashed_password = await password_hasher.hash(new_password)
+        await db.commit()
         
         # TODO: Send email with new password
         # For now, just return success
@@ -355,9 +378,9 @@ def request_password_reset(
 
 
 @router.post("/password-reset/confirm")
-def confirm_password_reset(
+async def confirm_password_reset(
     reset_data: PasswordResetConfirm,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> Any:
     """Confirm password reset with token"""
     # TODO: Implement token verification
@@ -486,12 +509,11 @@ def verify_telegram_website_data(auth_data: TelegramWebsiteAuthRequest, bot_toke
 
 
 @router.post("/telegram-miniapp", response_model=AuthResponse)
-@rate_limit("auth_login")
-def telegram_miniapp_auth(
+async def telegram_miniapp_auth(
     request: Request,
     auth_data: TelegramMiniAppAuthRequest,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> AuthResponse:
     """Авторизация через Telegram Mini App с проверкой initData"""
     start_time = time.time()
@@ -512,7 +534,7 @@ def telegram_miniapp_auth(
         # ✅ ИСПРАВЛЕНО: Используем try/finally для безопасной работы с транзакциями
         try:
             # Проверяем, существует ли пользователь
-            user = db.query(User).filter(User.telegram_id == telegram_id).first()
+            user = await db.scalar(select(User).where(User.telegram_id == telegram_id))
             
             is_new_user = False
             if not user:
@@ -526,7 +548,7 @@ def telegram_miniapp_auth(
                     is_active=True
                 )
                 db.add(user)
-                db.flush()  # ✅ ИСПРАВЛЕНО: flush вместо commit для получения ID
+                await db.flush()  # ✅ ИСПРАВЛЕНО: flush вместо commit для получения ID
                 is_new_user = True
             
             # ✅ ИСПРАВЛЕНО: Сохраняем данные пользователя сразу после flush
@@ -539,16 +561,17 @@ def telegram_miniapp_auth(
             
             # ✅ ИСПРАВЛЕНО: Только ОДИН commit в конце
             if is_new_user:
-                db.commit()
+                await db.commit()
                 
         except Exception as db_error:
-            db.rollback()
+            await db.rollback()
             raise db_error
         
         # Создаем токены
         # ✅ ИСПРАВЛЕНО: JWT требует sub как строку, не число
-        access_token = create_access_token(data={"sub": str(user_id)})
-        refresh_token = create_refresh_token(data={"sub": str(user_id)})
+        token_version = await current_token_version(user_id)
+        access_token = create_access_token(data={"sub": str(user_id), "tv": token_version})
+        refresh_token = create_refresh_token(data={"sub": str(user_id), "tv": token_version})
         
         # ✅ ОТЛАДКА: Логируем созданные токены
         logger.info(f"🔐 CREATED TOKENS for user {user_id}: access_token_len={len(access_token)}, refresh_token_len={len(refresh_token)}")
@@ -622,12 +645,11 @@ def telegram_miniapp_auth(
 
 
 @router.post("/telegram-website", response_model=AuthResponse)
-@rate_limit("auth_login")
-def telegram_website_auth(
+async def telegram_website_auth(
     request: Request,
     auth_data: TelegramWebsiteAuthRequest,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> AuthResponse:
     """Авторизация через веб-сайт с Telegram Login Widget"""
     start_time = time.time()
@@ -638,7 +660,7 @@ def telegram_website_auth(
             raise ValueError("Invalid Telegram signature")
         
         # Проверяем, существует ли пользователь
-        user = db.query(User).filter(User.telegram_id == auth_data.id).first()
+        user = await db.scalar(select(User).where(User.telegram_id == auth_data.id))
         
         is_new_user = False
         if not user:
@@ -653,14 +675,15 @@ def telegram_website_auth(
                 is_active=True
             )
             db.add(user)
-            db.commit()
-            db.refresh(user)
+            await db.commit()
+            await db.refresh(user)
             is_new_user = True
         
         # Создаем токены
         # ✅ ИСПРАВЛЕНО: JWT требует sub как строку
-        access_token = create_access_token(data={"sub": str(user.id)})
-        refresh_token = create_refresh_token(data={"sub": str(user.id)})
+        token_version = await current_token_version(user.id)
+        access_token = create_access_token(data={"sub": str(user.id), "tv": token_version})
+        refresh_token = create_refresh_token(data={"sub": str(user.id), "tv": token_version})
         
         # ✅ НОВОЕ: Детальное логирование успешной авторизации
         log_auth_attempt(
@@ -6,7 +6,9 @@ import secrets
 import string
 
 from app.core.database import get_db
+from app.core.auth import Principal
 from app.api.v1.deps import get_current_active_user, get_current_admin_user
+from app.core.user_cache import UserCache
 from app.models.user import User
 from app.models.bonus import Bonus, Referral, GiftCertificate, BonusType, BonusStatus
 from app.schemas.bonus import (
@@ -28,7 +30,7 @@ def get_my_bonuses(
     limit: int = Query(100, ge=1, le=1000),
     status: BonusStatus = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """Get user bonuses"""
     query = db.query(Bonus).filter(Bonus.user_id == current_user.id)
@@ -44,7 +46,7 @@ def get_my_bonuses(
 def get_my_bonus(
     bonus_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """Get specific bonus"""
     bonus = db.query(Bonus).filter(
@@ -64,7 +66,7 @@ def get_my_bonus(
 @router.get("/my-referrals", response_model=List[ReferralSchema])
 def get_my_referrals(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """Get user referrals"""
     referrals = db.query(Referral).filter(Referral.referrer_id == current_user.id).all()
@@ -74,7 +76,7 @@ def get_my_referrals(
 @router.post("/referral-code")
 def generate_referral_code(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """Generate referral code for user"""
     # Generate unique referral code
@@ -91,7 +93,7 @@ def generate_referral_code(
 def use_referral_code(
     referral_code: str,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """Use referral code"""
     # Find referral by code
@@ -147,7 +149,7 @@ def use_referral_code(
 @router.get("/gift-certificates", response_model=List[GiftCertificateSchema])
 def get_gift_certificates(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """Get user gift certificates"""
     certificates = db.query(GiftCertificate).filter(
@@ -160,7 +162,7 @@ def get_gift_certificates(
 def activate_gift_certificate(
     code: str,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """Activate gift certificate"""
     certificate = db.query(GiftCertificate).filter(
@@ -187,9 +189,14 @@ def activate_gift_certificate(
     
     # Add bonus points to user
     bonus_points = int(certificate.amount * 10)  # Convert amount to bonus points
-    current_user.bonus_points += bonus_points
+    # Principal read-only: атомарный UPDATE строки пользователя
+    db.query(User).filter(User.id == current_user.id).update(
+        {User.bonus_points: User.bonus_points + bonus_points},
+        synchronize_session=False
+    )
     
     db.commit()
+    UserCache.invalidate_user(current_user.id)
     
     return {"message": "Gift certificate activated", "bonus_points_added": bonus_points}
 
@@ -203,7 +210,7 @@ def create_bonus(
     description: str,
     expires_at: datetime = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    current_user: Principal = Depends(get_current_admin_user)
 ) -> Any:
     """Create bonus for user - admin only"""
     user = db.query(User).filter(User.id == user_id).first()
@@ -235,7 +242,7 @@ def create_gift_certificate(
     description: str = None,
     expires_at: datetime = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    current_user: Principal = Depends(get_current_admin_user)
 ) -> Any:
     """Create gift certificate - admin only"""
     # Generate unique code
@@ -264,7 +271,7 @@ def create_gift_certificate(
 @router.get("/admin/bonus-stats")
 def get_bonus_stats(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    current_user: Principal = Depends(get_current_admin_user)
 ) -> Any:
     """Get bonus statistics - admin only"""
     from sqlalchemy import func
@@ -1,13 +1,17 @@
 from typing import Any, Dict, List
 from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Request
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, date
 
-from app.core.database import get_db
+from app.core.database import get_async_db, AsyncSessionLocal
+from app.core.auth import Principal
 from app.api.v1.deps import get_current_active_user, get_current_admin_user
-from app.models.user import User
 from app.models.order import Order
+from app.crud.crud_order import crud_order
+from app.services.checkout import checkout_service
 from app.services.delivery import delivery_service
+from app.services.popularity import popularity_engine
 from app.core.config import settings
 import logging
 
@@ -21,7 +25,7 @@ async def calculate_delivery_price(
     delivery_address: str,
     items_count: int = 1,
     items_weight: float = 1.0,
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Dict[str, Any]:
     """Расчет стоимости доставки"""
     
@@ -50,7 +54,7 @@ async def calculate_delivery_price(
 async def get_delivery_intervals(
     delivery_address: str,
     delivery_date: date = None,
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Dict[str, Any]:
     """Получение доступных временных интервалов доставки"""
     
@@ -84,13 +88,16 @@ async def create_delivery_order(
     order_id: int,
     delivery_interval: Dict = None,
     background_tasks: BackgroundTasks = BackgroundTasks(),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Dict[str, Any]:
     """Создание заказа доставки"""
     
-    # Получаем заказ из базы данных
-    order = db.query(Order).filter(Order.id == order_id, Order.user_id == current_user.id).first()
+    # Получаем заказ из базы данных (позиции и цветы сразу - в async сессии нет lazy load)
+    order = await db.scalar(
+        crud_order.select_orders(flowers=True)
+        .where(Order.id == order_id, Order.user_id == current_user.id)
+    )
     if not order:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -107,7 +114,7 @@ async def create_delivery_order(
     try:
         # Подготавливаем данные для API
         items = []
-        for order_item in order.items:
+        for order_item in order.order_items:
             items.append({
                 "name": order_item.flower.name,
                 "quantity": order_item.quantity,
@@ -132,13 +139,15 @@ async def create_delivery_order(
         # Обновляем заказ в базе данных
         order.delivery_claim_id = delivery_result["claim_id"]
         order.delivery_status = delivery_result["status"]
+        old_status = order.status
         order.status = "delivering"
+        popularity_change = await popularity_engine.apply_status_change(db, order, old_status)
         
-        db.commit()
-        db.refresh(order)
+        await db.commit()
+        await popularity_engine.publish(popularity_change)
         
-        # Запускаем фоновую задачу для отслеживания статуса
-        background_tasks.add_task(track_delivery_status, delivery_result["claim_id"], order_id, db)
+        # Запускаем фоновую задачу для отслеживания статуса (со своей сессией)
+        background_tasks.add_task(track_delivery_status, delivery_result["claim_id"], order_id)
         
         return {
             "success": True,
@@ -161,16 +170,18 @@ async def create_delivery_order(
 @router.get("/status/{claim_id}")
 async def get_delivery_status(
     claim_id: str,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
 ) -> Dict[str, Any]:
     """Получение статуса доставки"""
     
     # Проверяем что заказ принадлежит пользователю
-    order = db.query(Order).filter(
-        Order.delivery_claim_id == claim_id,
-        Order.user_id == current_user.id
-    ).first()
+    order = await db.scalar(
+        select(Order).where(
+            Order.delivery_claim_id == claim_id,
+            Order.user_id == current_user.id
+        )
+    )
     
     if not order:
         raise HTTPException(
@@ -198,16 +209,18 @@ async def get_delivery_status(
 async def cancel_delivery(
     claim_id: str,
     reason: str = "Отмена заказа по требованию клиента",
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
 ) -> Dict[str, Any]:
     """Отмена доставки"""
     
     # Проверяем что заказ принадлежит пользователю
-    order = db.query(Order).filter(
-        Order.delivery_claim_id == claim_id,
-        Order.user_id == current_user.id
-    ).first()
+    order = await db.scalar(
+        select(Order).where(
+            Order.delivery_claim_id == claim_id,
+            Order.user_id == current_user.id
+        )
+    )
     
     if not order:
         raise HTTPException(
@@ -221,8 +234,10 @@ async def cancel_delivery(
         if success:
             # Обновляем статус заказа
             order.delivery_status = "cancelled"
-            order.status = "cancelled"
-            db.commit()
+            # Отмена возвращает остатки на склад
+            popularity_change = await checkout_service.cancel_order(db, order)
+            await db.commit()
+            await popularity_engine.publish(popularity_change)
             
             return {
                 "success": True,
@@ -246,7 +261,7 @@ async def cancel_delivery(
 async def delivery_webhook(
     request: Request,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> Dict[str, Any]:
     """Webhook для получения обновлений статуса доставки от Яндекса"""
     
@@ -262,7 +277,7 @@ async def delivery_webhook(
             )
         
         # Находим заказ по claim_id
-        order = db.query(Order).filter(Order.delivery_claim_id == claim_id).first()
+        order = await db.scalar(select(Order).where(Order.delivery_claim_id == claim_id))
         if not order:
             logger.warning(f"Order with claim_id {claim_id} not found")
             return {"success": True, "message": "Order not found"}
@@ -277,14 +292,21 @@ async def delivery_webhook(
             "failed": "cancelled"
         }
         
-        if status in status_mapping:
+        popularity_change = None
+        if status_mapping.get(status) == "cancelled":
+            # Отмена возвращает остатки на склад
+            popularity_change = await checkout_service.cancel_order(db, order)
+        elif status in status_mapping:
+            old_status = order.status
             order.status = status_mapping[status]
+            popularity_change = await popularity_engine.apply_status_change(db, order, old_status)
             
             # Если доставлен - обновляем дату доставки
             if status == "delivered":
                 order.delivered_at = datetime.now()
         
-        db.commit()
+        await db.commit()
+        await popularity_engine.publish(popularity_change)
         
         # Отправляем уведомление пользователю в фоне
         background_tasks.add_task(send_delivery_notification, order.user_id, order.id, status)
@@ -310,17 +332,18 @@ async def get_delivery_orders(
     skip: int = 0,
     limit: int = 100,
     status: str = None,
-    current_admin: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    current_admin: Principal = Depends(get_current_admin_user),
+    db: AsyncSession = Depends(get_async_db)
 ) -> Dict[str, Any]:
     """Получение списка заказов доставки для админа"""
     
-    query = db.query(Order).filter(Order.delivery_claim_id.isnot(None))
+    # Покупатель - JOIN в том же запросе (many-to-one), без второго round-trip
+    query = crud_order.select_orders(user=True).where(Order.delivery_claim_id.isnot(None))
     
     if status:
-        query = query.filter(Order.delivery_status == status)
+        query = query.where(Order.delivery_status == status)
     
-    orders = query.offset(skip).limit(limit).all()
+    orders = (await db.scalars(query.offset(skip).limit(limit))).all()
     
     return {
         "success": True,
@@ -343,12 +366,12 @@ async def get_delivery_orders(
 @router.post("/admin/refresh-status/{claim_id}")
 async def refresh_delivery_status(
     claim_id: str,
-    current_admin: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    current_admin: Principal = Depends(get_current_admin_user),
+    db: AsyncSession = Depends(get_async_db)
 ) -> Dict[str, Any]:
     """Принудительное обновление статуса доставки (админ)"""
     
-    order = db.query(Order).filter(Order.delivery_claim_id == claim_id).first()
+    order = await db.scalar(select(Order).where(Order.delivery_claim_id == claim_id))
     if not order:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -360,7 +383,7 @@ async def refresh_delivery_status(
         
         # Обновляем статус в базе
         order.delivery_status = status_info["status"]
-        db.commit()
+        await db.commit()
         
         return {
             "success": True,
@@ -376,7 +399,7 @@ async def refresh_delivery_status(
 
 
 # Background tasks
-async def track_delivery_status(claim_id: str, order_id: int, db: Session):
+async def track_delivery_status(claim_id: str, order_id: int):
     """Фоновая задача для отслеживания статуса доставки"""
     
     import asyncio
@@ -389,21 +412,23 @@ async def track_delivery_status(claim_id: str, order_id: int, db: Session):
             try:
                 status_info = await delivery_service.get_delivery_status(claim_id)
                 
-                order = db.query(Order).filter(Order.id == order_id).first()
-                if order:
-                    old_status = order.delivery_status
-                    order.delivery_status = status_info["status"]
-                    
-                    if old_status != status_info["status"]:
-                        db.commit()
-                        logger.info(f"Delivery status updated for order {order_id}: {status_info['status']}")
+                # Сессия запроса к этому моменту уже закрыта - открываем свою на каждую проверку
+                async with AsyncSessionLocal() as db:
+                    order = await db.get(Order, order_id)
+                    if order:
+                        old_status = order.delivery_status
+                        order.delivery_status = status_info["status"]
                         
-                        # Отправляем уведомление пользователю
-                        await send_delivery_notification(order.user_id, order_id, status_info["status"])
-                    
-                    # Останавливаем отслеживание если доставка завершена
-                    if status_info["status"] in ["delivered", "cancelled", "failed"]:
-                        break
+                        if old_status != status_info["status"]:
+                            await db.commit()
+                            logger.info(f"Delivery status updated for order {order_id}: {status_info['status']}")
+                            
+                            # Отправляем уведомление пользователю
+                            await send_delivery_notification(order.user_id, order_id, status_info["status"])
+                
+                # Останавливаем отслеживание если доставка завершена
+                if order and status_info["status"] in ["delivered", "cancelled", "failed"]:
+                    break
                         
             except Exception as e:
                 logger.error(f"Error tracking delivery status: {e}")
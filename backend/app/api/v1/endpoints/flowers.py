@@ -1,12 +1,24 @@
 from typing import Any, List, Dict, Union
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_
+from fastapi import APIRouter, Depends, HTTPException, status, Query, BackgroundTasks
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.database import get_db
+from app.core.database import get_async_db
+from app.core.pagination import Keyset, PaginationMode, CountMode, total_count_async
+from app.core.search import flower_search
+from app.core.serializers import flower_list_item, flower_detail, render
+from app.crud.crud_flower import crud_flower
+from app.services.popularity import popularity_engine, PopularityWindow
+from app.services.seasonal import seasonal_index
+from app.core.cache import (
+    cache_result,
+    cache_manager,
+    invalidate_flowers_cache,
+    FLOWERS_TAG,
+    FLOWERS_LIST_TAG
+)
+from app.core.auth import Principal
 from app.api.v1.deps import get_current_active_user, get_current_admin_user
 from app.models.flower import Flower, FlowerCategory
-from app.models.user import User
 from app.schemas.flower import (
     FlowerCreate,
     FlowerUpdate,
@@ -18,10 +30,17 @@ from app.schemas.flower import (
 
 router = APIRouter()
 
+# Ключи keyset-пагинации каталога: sort_by -> колонка (+ Flower.id как tie-breaker)
+FLOWER_SORT_COLUMNS = {
+    "name": Flower.name,
+    "price": Flower.price,
+    "popularity": Flower.orders_count,
+}
+
 
 @router.get("/")
 @router.get("")  # Роут без trailing slash
-def get_flowers(
+async def get_flowers(
     page: int = Query(1, ge=1),
     per_page: int = Query(12, ge=1, le=100),
     category: FlowerCategory = None,
@@ -31,71 +50,114 @@ def get_flowers(
     search: str = None,
     sort_by: str = "name",
     sort_order: str = "asc",
-    db: Session = Depends(get_db)
+    pagination: PaginationMode = PaginationMode.PAGE,
+    cursor: str = Query(None, description="next_cursor предыдущей страницы (keyset-режим)"),
+    count: CountMode = CountMode.EXACT,
+    db: AsyncSession = Depends(get_async_db)
 ) -> Any:
-    """Get flowers list with filtering and search"""
-    query = db.query(Flower)
-    
-    # Apply filters
-    if category:
-        query = query.filter(Flower.category == category)
-    
-    if min_price is not None:
-        query = query.filter(Flower.price >= min_price)
-    
-    if max_price is not None:
-        query = query.filter(Flower.price <= max_price)
+    """
+    Get flowers list with filtering and search
     
-    if available_only:
-        query = query.filter(Flower.is_available == True)
+    pagination=page - классические page/per_page (OFFSET);
+    pagination=cursor (или передан cursor) - keyset по (sort_by, id), page игнорируется.
+    count управляет total: exact / cached / estimated / none.
+    """
+    page = await _get_flowers_page(
+        db=db,
+        page=page,
+        per_page=per_page,
+        category=category.value if category else None,
+        min_price=min_price,
+        max_price=max_price,
+        available_only=available_only,
+        search=search,
+        sort_by=sort_by,
+        sort_order=sort_order,
+        pagination=PaginationMode.CURSOR.value if cursor else pagination.value,
+        cursor=cursor,
+        count=count.value
+    )
+    return render(page)
+
+
+def _flowers_page_key(db: AsyncSession = None, **params) -> str:
+    """Ключ кэша страницы каталога (без сессии БД)"""
+    return cache_manager._generate_key("flowers_list", **params)
+
+
+@cache_result(
+    "flowers_list",
+    ttl=300,
+    cache_key_func=_flowers_page_key,
+    tags=[FLOWERS_TAG, FLOWERS_LIST_TAG],
+    namespace="flowers",
+    early_refresh=True
+)
+async def _get_flowers_page(db: AsyncSession, **params) -> Dict[str, Any]:
+    """
+    Страница каталога через кэш
+    Конкурентные промахи схлопываются в один COUNT+SELECT (single-flight)
+    """
+    return await _query_flowers_page(db, **params)
+
+
+async def _query_flowers_page(
+    db: AsyncSession,
+    page: int,
+    per_page: int,
+    category: str = None,
+    min_price: float = None,
+    max_price: float = None,
+    available_only: bool = True,
+    search: str = None,
+    sort_by: str = "name",
+    sort_order: str = "asc",
+    pagination: str = PaginationMode.PAGE.value,
+    cursor: str = None,
+    count: str = CountMode.EXACT.value
+) -> Dict[str, Any]:
+    # Только колонки списка, без гидрации ORM-объектов
+    query = crud_flower.list_query(
+        category=category,
+        min_price=min_price,
+        max_price=max_price,
+        available_only=available_only,
+        search=search
+    )
     
-    if search:
-        search_term = f"%{search}%"
-        query = query.filter(
-            or_(
-                Flower.name.ilike(search_term),
-                Flower.description.ilike(search_term)
-            )
-        )
+    # Apply sorting (id - tie-breaker, чтобы порядок был стабильным между страницами)
+    if sort_by not in FLOWER_SORT_COLUMNS:
+        sort_by = "name"
+    keyset = Keyset(
+        f"flowers:{sort_by}:{sort_order}",
+        FLOWER_SORT_COLUMNS[sort_by],
+        Flower.id,
+        descending=sort_order == "desc"
+    )
     
-    # Apply sorting
-    if sort_by == "price":
-        if sort_order == "desc":
-            query = query.order_by(Flower.price.desc())
-        else:
-            query = query.order_by(Flower.price.asc())
-    elif sort_by == "popularity":
-        if sort_order == "desc":
-            query = query.order_by(Flower.orders_count.desc())
-        else:
-            query = query.order_by(Flower.orders_count.asc())
-    else:  # name
-        if sort_order == "desc":
-            query = query.order_by(Flower.name.desc())
-        else:
-            query = query.order_by(Flower.name.asc())
+    total_count = await total_count_async(db, query, CountMode(count))
     
-    # Calculate pagination
-    skip = (page - 1) * per_page
-    total_count = query.count()
-    flowers = query.offset(skip).limit(per_page).all()
+    next_cursor = None
+    if pagination == PaginationMode.CURSOR.value:
+        rows = (await db.execute(keyset.apply(query, cursor, per_page))).all()
+        flowers, next_cursor = keyset.split(rows, per_page)
+    else:
+        # Calculate pagination
+        skip = (page - 1) * per_page
+        flowers = (await db.execute(query.order_by(*keyset.order_by).offset(skip).limit(per_page))).all()
     
     # Calculate total pages
-    total_pages = (total_count + per_page - 1) // per_page
+    total_pages = (total_count + per_page - 1) // per_page if total_count is not None else None
+    
+    result = [flower_list_item(row) for row in flowers]
     
-    # Convert to dict with proper enum handling
-    result = []
-    for flower in flowers:
-        result.append({
-            "id": flower.id,
-            "name": flower.name,
-            "category": flower.category.value if flower.category else None,  # Convert enum to string
-            "price": flower.price,
-            "image_url": flower.image_url,
-            "is_available": flower.is_available,
-            "views_count": flower.views_count,
-            "orders_count": flower.orders_count
-        })
+    if pagination == PaginationMode.CURSOR.value:
+        return {
+            "items": result,
+            "total": total_count,
+            "next_cursor": next_cursor,
+            "per_page": per_page
+        }
     
     return {
         "items": result,
@@ -107,186 +169,96 @@ def get_flowers(
 
 
 @router.get("/search")
-def search_flowers(
+async def search_flowers(
     query: str = Query(..., description="Search query"),
     limit: int = Query(10, ge=1, le=50),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> Any:
-    """Search flowers by name and description"""
-    search_term = f"%{query}%"
-    flowers = db.query(Flower).filter(
-        or_(
-            Flower.name.ilike(search_term),
-            Flower.description.ilike(search_term)
-        )
-    ).limit(limit).all()
-    
-    # Convert to dict with proper enum handling
-    result = []
-    for flower in flowers:
-        result.append({
-            "id": flower.id,
-            "name": flower.name,
-            "category": flower.category.value if flower.category else None,
-            "price": flower.price,
-            "image_url": flower.image_url,
-            "is_available": flower.is_available,
-            "views_count": flower.views_count,
-            "orders_count": flower.orders_count
-        })
-    
-    return result
+    """Search flowers by name, tags and description (ranked, typo tolerant)"""
+    rows = await flower_search.search(db, query, limit)
+    return render([flower_list_item(row) for row in rows])
+
+
+@router.get("/autocomplete")
+async def autocomplete_flowers(
+    prefix: str = Query(..., min_length=1, max_length=100, description="Name prefix"),
+    limit: int = Query(10, ge=1, le=20),
+    db: AsyncSession = Depends(get_async_db)
+) -> Any:
+    """Autocomplete flower names by prefix (самые заказываемые первыми)"""
+    return render(await flower_search.autocomplete(db, prefix, limit))
 
 
 @router.get("/popular")
-def get_popular_flowers(
+async def get_popular_flowers(
     limit: int = Query(10, ge=1, le=50),
-    db: Session = Depends(get_db)
+    window: PopularityWindow = PopularityWindow.ALL,
+    db: AsyncSession = Depends(get_async_db)
 ) -> Any:
-    """Get most popular flowers"""
-    flowers = db.query(Flower).filter(
-        Flower.is_available == True
-    ).order_by(Flower.orders_count.desc()).limit(limit).all()
+    """Get most popular flowers (window: all, 7d, 30d - с затуханием по давности заказов)"""
+    # Рейтинг из Redis sorted set + карточки, без запроса к flowers
+    ranked = await popularity_engine.top(limit, window.value)
+    if ranked is not None:
+        return render(ranked)
     
-    # Convert to dict with proper enum handling
-    result = []
-    for flower in flowers:
-        result.append({
-            "id": flower.id,
-            "name": flower.name,
-            "category": flower.category.value if flower.category else None,
-            "price": flower.price,
-            "image_url": flower.image_url,
-            "is_available": flower.is_available,
-            "views_count": flower.views_count,
-            "orders_count": flower.orders_count
-        })
+    # Fallback: Redis недоступен или рейтинг еще не построен
+    rows = await crud_flower.list_popular(db, limit)
     
-    return result
+    return render([flower_list_item(row) for row in rows])
 
 
 @router.get("/seasonal")
-def get_seasonal_flowers(
-    db: Session = Depends(get_db)
-) -> Any:
-    """Get seasonal flowers"""
-    from datetime import datetime
-    
-    current_date = datetime.now().strftime("%m-%d")
-    flowers = db.query(Flower).filter(
-        and_(
-            Flower.is_seasonal == True,
-            Flower.is_available == True,
-            Flower.season_start <= current_date,
-            Flower.season_end >= current_date
-        )
-    ).all()
-    
-    # Convert to dict with proper enum handling
-    result = []
-    for flower in flowers:
-        result.append({
-            "id": flower.id,
-            "name": flower.name,
-            "category": flower.category.value if flower.category else None,
-            "price": flower.price,
-            "image_url": flower.image_url,
-            "is_available": flower.is_available,
-            "views_count": flower.views_count,
-            "orders_count": flower.orders_count
-        })
-    
-    return result
+async def get_seasonal_flowers() -> Any:
+    """Get seasonal flowers (из предрасчитанного индекса, сезоны через Новый год поддерживаются)"""
+    return render(await seasonal_index.for_day())
 
 
 @router.get("/{flower_id}")
-def get_flower(
+async def get_flower(
     flower_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> Any:
-    """Get flower by ID"""
-    flower = db.query(Flower).filter(Flower.id == flower_id).first()
-    if not flower:
+    """Get flower by ID (read-only: просмотры считает ViewCountMiddleware)"""
+    row = await crud_flower.get_detail(db, flower_id)
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Flower not found"
         )
     
-    # Increment view count
-    flower.views_count += 1
-    db.commit()
-    
-    # Convert to dict with proper enum handling
-    return {
-        "id": flower.id,
-        "name": flower.name,
-        "description": flower.description,
-        "category": flower.category.value if flower.category else None,
-        "price": flower.price,
-        "image_url": flower.image_url,
-        "is_available": flower.is_available,
-        "is_seasonal": flower.is_seasonal,
-        "season_start": flower.season_start,
-        "season_end": flower.season_end,
-        "stock_quantity": flower.stock_quantity,
-        "min_order_quantity": flower.min_order_quantity,
-        "max_order_quantity": flower.max_order_quantity,
-        "meta_title": flower.meta_title,
-        "meta_description": flower.meta_description,
-        "tags": flower.tags,
-        "views_count": flower.views_count,
-        "orders_count": flower.orders_count,
-        "created_at": flower.created_at.isoformat() if flower.created_at else None,
-        "updated_at": flower.updated_at.isoformat() if flower.updated_at else None
-    }
+    return render(flower_detail(row))
 
 
 @router.post("/")
-def create_flower(
+async def create_flower(
     flower_in: FlowerCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
 ) -> Any:
     """Create new flower"""
     flower = Flower(**flower_in.dict())
     db.add(flower)
-    db.commit()
-    db.refresh(flower)
+    await db.commit()
+    await db.refresh(flower)
+    background_tasks.add_task(invalidate_flowers_cache)
+    background_tasks.add_task(popularity_engine.add_flower, flower.id)
+    if flower.is_seasonal:
+        background_tasks.add_task(seasonal_index.flower_changed, flower.id)
     
-    # Convert to dict with proper enum handling
-    return {
-        "id": flower.id,
-        "name": flower.name,
-        "description": flower.description,
-        "category": flower.category.value if flower.category else None,
-        "price": flower.price,
-        "image_url": flower.image_url,
-        "is_available": flower.is_available,
-        "is_seasonal": flower.is_seasonal,
-        "season_start": flower.season_start,
-        "season_end": flower.season_end,
-        "stock_quantity": flower.stock_quantity,
-        "min_order_quantity": flower.min_order_quantity,
-        "max_order_quantity": flower.max_order_quantity,
-        "meta_title": flower.meta_title,
-        "meta_description": flower.meta_description,
-        "tags": flower.tags,
-        "views_count": flower.views_count,
-        "orders_count": flower.orders_count,
-        "created_at": flower.created_at.isoformat() if flower.created_at else None,
-        "updated_at": flower.updated_at.isoformat() if flower.updated_at else None
-    }
+    return render(flower_detail(flower))
 
 
 @router.put("/{flower_id}")
-def update_flower(
+async def update_flower(
     flower_id: int,
     flower_in: FlowerUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
 ) -> Any:
     """Update flower"""
-    flower = db.query(Flower).filter(Flower.id == flower_id).first()
+    flower = await db.get(Flower, flower_id)
     if not flower:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -297,49 +269,34 @@ def update_flower(
     for field, value in update_data.items():
         setattr(flower, field, value)
     
-    db.commit()
-    db.refresh(flower)
+    await db.commit()
+    await db.refresh(flower)
+    background_tasks.add_task(invalidate_flowers_cache)
+    background_tasks.add_task(popularity_engine.drop_card, flower.id)
+    background_tasks.add_task(seasonal_index.flower_changed, flower.id)
     
-    # Convert to dict with proper enum handling
-    return {
-        "id": flower.id,
-        "name": flower.name,
-        "description": flower.description,
-        "category": flower.category.value if flower.category else None,
-        "price": flower.price,
-        "image_url": flower.image_url,
-        "is_available": flower.is_available,
-        "is_seasonal": flower.is_seasonal,
-        "season_start": flower.season_start,
-        "season_end": flower.season_end,
-        "stock_quantity": flower.stock_quantity,
-        "min_order_quantity": flower.min_order_quantity,
-        "max_order_quantity": flower.max_order_quantity,
-        "meta_title": flower.meta_title,
-        "meta_description": flower.meta_description,
-        "tags": flower.tags,
-        "views_count": flower.views_count,
-        "orders_count": flower.orders_count,
-        "created_at": flower.created_at.isoformat() if flower.created_at else None,
-        "updated_at": flower.updated_at.isoformat() if flower.updated_at else None
-    }
+    return render(flower_detail(flower))
 
 
 @router.delete("/{flower_id}")
-def delete_flower(
+async def delete_flower(
     flower_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
 ) -> Any:
     """Delete flower"""
-    flower = db.query(Flower).filter(Flower.id == flower_id).first()
+    flower = await db.get(Flower, flower_id)
     if not flower:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Flower not found"
         )
     
-    db.delete(flower)
-    db.commit()
+    await db.delete(flower)
+    await db.commit()
+    background_tasks.add_task(invalidate_flowers_cache)
+    background_tasks.add_task(popularity_engine.drop_card, flower_id, True)
+    background_tasks.add_task(seasonal_index.flower_changed, flower_id)
     
     return {"message": "Flower deleted successfully"} 
\ No newline at end of file
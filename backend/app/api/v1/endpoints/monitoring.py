@@ -6,13 +6,15 @@ API для мониторинга состояния системы
 from typing import Any, Dict, List
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 import logging
 import json
 
-from app.core.database import get_db
+from app.core.database import get_db, get_async_db
+from app.core.auth import Principal
 from app.api.v1.deps import get_current_admin_user
 from app.models.user import User
 from app.core.monitoring import (
@@ -22,7 +24,6 @@ from app.core.monitoring import (
     create_alert,
     AlertLevel
 )
-from app.core.rate_limiter import rate_limit
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -45,7 +46,6 @@ class DiagnosticReport(BaseModel):
     user_info: Optional[Dict[str, Any]] = None
 
 @router.post("/telegram-diagnostics")
-@rate_limit("diagnostics")
 def submit_telegram_diagnostics(
     request: Request,
     report: DiagnosticReport,
@@ -204,7 +204,7 @@ async def health_check() -> Dict[str, Any]:
 
 @router.get("/metrics")
 async def get_metrics(
-    current_user: User = Depends(get_current_admin_user)
+    current_user: Principal = Depends(get_current_admin_user)
 ) -> Dict[str, Any]:
     """
     Получить метрики системы
@@ -224,6 +224,9 @@ async def get_metrics(
                 "application": {
                     "active_connections": metrics.active_connections,
                     "response_time_avg": metrics.response_time_avg,
+                    "response_time_p50": metrics.response_time_p50,
+                    "response_time_p95": metrics.response_time_p95,
+                    "response_time_p99": metrics.response_time_p99,
                     "error_rate": metrics.error_rate,
                     "requests_per_minute": metrics.requests_per_minute,
                 }
@@ -237,7 +240,7 @@ async def get_metrics(
 
 @router.get("/alerts")
 async def get_alerts(
-    current_user: User = Depends(get_current_admin_user)
+    current_user: Principal = Depends(get_current_admin_user)
 ) -> Dict[str, Any]:
     """
     Получить активные алерты
@@ -261,7 +264,7 @@ async def get_alerts(
 @router.post("/alerts/{alert_id}/resolve")
 async def resolve_alert(
     alert_id: str,
-    current_user: User = Depends(get_current_admin_user)
+    current_user: Principal = Depends(get_current_admin_user)
 ) -> Dict[str, Any]:
     """
     Разрешить алерт
@@ -290,7 +293,7 @@ async def resolve_alert(
 
 @router.post("/alerts/test")
 async def create_test_alert(
-    current_user: User = Depends(get_current_admin_user)
+    current_user: Principal = Depends(get_current_admin_user)
 ) -> Dict[str, Any]:
     """
     Создать тестовый алерт (для проверки системы уведомлений)
@@ -317,8 +320,8 @@ async def create_test_alert(
 
 @router.get("/stats")
 async def get_system_stats(
-    current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_admin_user),
+    db: AsyncSession = Depends(get_async_db)
 ) -> Dict[str, Any]:
     """
     Получить общую статистику системы
@@ -329,30 +332,36 @@ async def get_system_stats(
         from app.models.order import Order
         from app.models.flower import Flower
         from app.models.review import Review
-        from sqlalchemy import func, text
+        from sqlalchemy import select, func, text
         
         # Статистика пользователей
-        total_users = db.query(UserModel).count()
-        active_users = db.query(UserModel).filter(UserModel.is_active == True).count()
+        total_users = await db.scalar(select(func.count()).select_from(UserModel))
+        active_users = await db.scalar(
+            select(func.count()).select_from(UserModel).where(UserModel.is_active == True)
+        )
         
         # Статистика заказов
-        total_orders = db.query(Order).count()
-        today_orders = db.query(Order).filter(
-            func.date(Order.created_at) == func.current_date()
-        ).count()
+        total_orders = await db.scalar(select(func.count()).select_from(Order))
+        today_orders = await db.scalar(
+            select(func.count()).select_from(Order).where(
+                func.date(Order.created_at) == func.current_date()
+            )
+        )
         
         # Статистика цветов
-        total_flowers = db.query(Flower).count()
-        available_flowers = db.query(Flower).filter(Flower.is_available == True).count()
+        total_flowers = await db.scalar(select(func.count()).select_from(Flower))
+        available_flowers = await db.scalar(
+            select(func.count()).select_from(Flower).where(Flower.is_available == True)
+        )
         
         # Статистика отзывов
-        total_reviews = db.query(Review).count()
-        avg_rating = db.query(func.avg(Review.rating)).scalar() or 0
+        total_reviews = await db.scalar(select(func.count()).select_from(Review))
+        avg_rating = await db.scalar(select(func.avg(Review.rating))) or 0
         
         # Статистика базы данных
-        db_size_result = db.execute(text(
+        db_size_result = await db.scalar(text(
             "SELECT pg_size_pretty(pg_database_size(current_database()))"
-        )).scalar()
+        ))
         
         return {
             "status": "success",
@@ -390,7 +399,7 @@ async def get_system_stats(
 async def get_recent_logs(
     lines: int = 100,
     level: str = "ERROR",
-    current_user: User = Depends(get_current_admin_user)
+    current_user: Principal = Depends(get_current_admin_user)
 ) -> Dict[str, Any]:
     """
     Получить последние логи системы
@@ -1,27 +1,35 @@
 from typing import Any, List
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session
 from datetime import datetime
 
 from app.core.database import get_db
+from app.core.auth import Principal
 from app.api.v1.deps import get_current_active_user, get_current_admin_user
+from app.core.pagination import Keyset, PaginationMode, CountMode, paginate
 from app.models.user import User
 from app.models.notification import Notification, NotificationType, NotificationChannel, NotificationStatus
 from app.schemas.notification import NotificationCreate, NotificationUpdate, Notification as NotificationSchema
 
 router = APIRouter()
 
+NOTIFICATIONS_KEYSET = Keyset("notifications:created_at", Notification.created_at, Notification.id, descending=True)
+
 
 @router.get("/", response_model=List[NotificationSchema])
 def get_notifications(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     type: NotificationType = None,
     channel: NotificationChannel = None,
     status: NotificationStatus = None,
     unread_only: bool = False,
+    pagination: PaginationMode = PaginationMode.PAGE,
+    cursor: str = Query(None, description="X-Next-Cursor предыдущей страницы"),
+    count: CountMode = CountMode.NONE,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """Get user notifications"""
     query = db.query(Notification).filter(Notification.user_id == current_user.id)
@@ -35,15 +43,24 @@ def get_notifications(
     if unread_only:
         query = query.filter(Notification.status == NotificationStatus.PENDING)
     
-    notifications = query.order_by(Notification.created_at.desc()).offset(skip).limit(limit).all()
-    return notifications
+    return paginate(
+        db,
+        query,
+        NOTIFICATIONS_KEYSET,
+        limit,
+        skip=skip,
+        cursor=cursor,
+        mode=pagination,
+        count=count,
+        response=response
+    )
 
 
 @router.get("/{notification_id}", response_model=NotificationSchema)
 def get_notification(
     notification_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """Get notification by ID"""
     notification = db.query(Notification).filter(
@@ -64,7 +81,7 @@ def get_notification(
 def mark_as_read(
     notification_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """Mark notification as read"""
     notification = db.query(Notification).filter(
@@ -88,7 +105,7 @@ def mark_as_read(
 @router.post("/read-all")
 def mark_all_as_read(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """Mark all notifications as read"""
     notifications = db.query(Notification).filter(
@@ -108,7 +125,7 @@ def mark_all_as_read(
 @router.get("/unread-count")
 def get_unread_count(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """Get count of unread notifications"""
     count = db.query(Notification).filter(
@@ -122,16 +139,20 @@ def get_unread_count(
 # Admin endpoints
 @router.get("/admin/all", response_model=List[NotificationSchema])
 def get_all_notifications(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     type: NotificationType = None,
     channel: NotificationChannel = None,
     status: NotificationStatus = None,
     user_id: int = None,
+    pagination: PaginationMode = PaginationMode.PAGE,
+    cursor: str = Query(None, description="X-Next-Cursor предыдущей страницы"),
+    count: CountMode = CountMode.NONE,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    current_user: Principal = Depends(get_current_admin_user)
 ) -> Any:
-    """Get all notifications - admin only"""
+    """Get all notifications - admin only (pagination=cursor - keyset, курсор в X-Next-Cursor)"""
     query = db.query(Notification)
     
     if type:
@@ -143,8 +164,17 @@ def get_all_notifications(
     if user_id:
         query = query.filter(Notification.user_id == user_id)
     
-    notifications = query.order_by(Notification.created_at.desc()).offset(skip).limit(limit).all()
-    return notifications
+    return paginate(
+        db,
+        query,
+        NOTIFICATIONS_KEYSET,
+        limit,
+        skip=skip,
+        cursor=cursor,
+        mode=pagination,
+        count=count,
+        response=response
+    )
 
 
 @router.post("/admin/send", response_model=NotificationSchema)
@@ -156,7 +186,7 @@ def send_notification(
     content: str,
     metadata: str = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    current_user: Principal = Depends(get_current_admin_user)
 ) -> Any:
     """Send notification to user - admin only"""
     # Check if user exists
@@ -197,7 +227,7 @@ def broadcast_notification(
     content: str,
     metadata: str = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    current_user: Principal = Depends(get_current_admin_user)
 ) -> Any:
     """Send notification to all users - admin only"""
     # Get all active users
@@ -232,7 +262,7 @@ def broadcast_notification(
 @router.get("/admin/stats")
 def get_notification_stats(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    current_user: Principal = Depends(get_current_admin_user)
 ) -> Any:
     """Get notification statistics - admin only"""
     from sqlalchemy import func
@@ -1,15 +1,17 @@
 from typing import Any, List
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
-import uuid
 
-from app.core.database import get_db
+from app.core.database import get_async_db
+from app.core.auth import Principal
 from app.api.v1.deps import get_current_active_user, get_current_admin_user
-from app.core.rate_limiter import rate_limit
-from app.models.user import User
-from app.models.order import Order, OrderItem, OrderStatus, PaymentStatus
-from app.models.flower import Flower
+from app.core.pagination import Keyset, PaginationMode, CountMode, paginate_async
+from app.crud.crud_order import crud_order
+from app.services.checkout import CANCELLABLE_STATUSES, checkout_service
+from app.services.popularity import popularity_engine
+from app.models.order import Order, OrderStatus, PaymentStatus
 from app.schemas.order import (
     OrderCreate,
     OrderUpdate,
@@ -21,39 +23,57 @@ from app.schemas.order import (
 
 router = APIRouter()
 
+# Новые заказы первыми; seek по индексу (created_at, id)
+ORDERS_KEYSET = Keyset("orders:created_at", Order.created_at, Order.id, descending=True)
+
 
 @router.get("/", response_model=List[OrderList])
-def get_orders(
+async def get_orders(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     status: OrderStatus = None,
     payment_status: PaymentStatus = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    pagination: PaginationMode = PaginationMode.PAGE,
+    cursor: str = Query(None, description="X-Next-Cursor предыдущей страницы"),
+    count: CountMode = CountMode.NONE,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
-    """Get user orders"""
-    query = db.query(Order).filter(Order.user_id == current_user.id)
-    
-    if status:
-        query = query.filter(Order.status == status)
-    if payment_status:
-        query = query.filter(Order.payment_status == payment_status)
+    """Get user orders (pagination=cursor - keyset, курсор в X-Next-Cursor)"""
+    # Только колонки OrderList: строки вместо ORM-объектов
+    query = crud_order.list_query(
+        user_id=current_user.id,
+        status=status,
+        payment_status=payment_status
+    )
     
-    orders = query.order_by(Order.created_at.desc()).offset(skip).limit(limit).all()
-    return orders
+    return await paginate_async(
+        db,
+        query,
+        ORDERS_KEYSET,
+        limit,
+        skip=skip,
+        cursor=cursor,
+        mode=pagination,
+        count=count,
+        response=response
+    )
 
 
 @router.get("/{order_id}", response_model=OrderSchema)
-def get_order(
+async def get_order(
     order_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """Get order by ID"""
-    order = db.query(Order).filter(
-        Order.id == order_id,
-        Order.user_id == current_user.id
-    ).first()
+    order = await db.scalar(
+        crud_order.select_orders(items=True).where(
+            Order.id == order_id,
+            Order.user_id == current_user.id
+        )
+    )
     
     if not order:
         raise HTTPException(
@@ -65,106 +85,30 @@ def get_order(
 
 
 @router.post("/", response_model=OrderSchema)
-@rate_limit("user_orders")
-def create_order(
+async def create_order(
     request: Request,
     order_in: OrderCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
-    """Create new order"""
-    # Generate order number
-    order_number = f"FL-{datetime.now().strftime('%Y%m%d')}-{str(uuid.uuid4())[:8].upper()}"
-    
-    # Calculate totals
-    subtotal = 0
-    order_items = []
-    
-    for item in order_in.items:
-        flower = db.query(Flower).filter(Flower.id == item.flower_id).first()
-        if not flower:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Flower {item.flower_id} not found"
-            )
-        
-        if not flower.is_available:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Flower {flower.name} is not available"
-            )
-        
-        if item.quantity < flower.min_order_quantity:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Minimum quantity for {flower.name} is {flower.min_order_quantity}"
-            )
-        
-        if item.quantity > flower.max_order_quantity:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Maximum quantity for {flower.name} is {flower.max_order_quantity}"
-            )
-        
-        item_total = flower.price * item.quantity
-        subtotal += item_total
-        
-        order_items.append({
-            "flower_id": item.flower_id,
-            "quantity": item.quantity,
-            "unit_price": flower.price,
-            "total_price": item_total,
-            "notes": item.notes
-        })
-    
-    # Calculate delivery fee (simple logic for now)
-    delivery_fee = 0 if subtotal > 1000 else 200
-    
-    # Create order
-    order = Order(
-        order_number=order_number,
-        user_id=current_user.id,
-        subscription_id=order_in.subscription_id,
-        delivery_address=order_in.delivery_address,
-        delivery_date=order_in.delivery_date,
-        delivery_slot=order_in.delivery_slot,
-        delivery_instructions=order_in.delivery_instructions,
-        customer_notes=order_in.customer_notes,
-        subtotal=subtotal,
-        delivery_fee=delivery_fee,
-        total_amount=subtotal + delivery_fee
-    )
-    
-    db.add(order)
-    db.commit()
-    db.refresh(order)
-    
-    # Create order items
-    for item_data in order_items:
-        order_item = OrderItem(
-            order_id=order.id,
-            **item_data
-        )
-        db.add(order_item)
-    
-    db.commit()
-    db.refresh(order)
-    
-    return order
+    """Create new order (остатки списываются атомарно, без overselling)"""
+    return await checkout_service.place_order(db, current_user, order_in)
 
 
 @router.put("/{order_id}", response_model=OrderSchema)
-def update_order(
+async def update_order(
     order_id: int,
     order_update: OrderUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """Update order"""
-    order = db.query(Order).filter(
-        Order.id == order_id,
-        Order.user_id == current_user.id
-    ).first()
+    order = await db.scalar(
+        crud_order.select_orders(items=True).where(
+            Order.id == order_id,
+            Order.user_id == current_user.id
+        )
+    )
     
     if not order:
         raise HTTPException(
@@ -182,22 +126,24 @@ def update_order(
     for field, value in order_update.dict(exclude_unset=True).items():
         setattr(order, field, value)
     
-    db.commit()
-    db.refresh(order)
-    return order
+    await db.commit()
+    return await crud_order.reload(db, order, items=True)
 
 
 @router.post("/{order_id}/cancel")
-def cancel_order(
+async def cancel_order(
     order_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
-    """Cancel order"""
-    order = db.query(Order).filter(
-        Order.id == order_id,
-        Order.user_id == current_user.id
-    ).first()
+    """Cancel order (остатки возвращаются на склад)"""
+    # FOR UPDATE: повторная параллельная отмена не вернет остатки дважды
+    order = await db.scalar(
+        select(Order).where(
+            Order.id == order_id,
+            Order.user_id == current_user.id
+        ).with_for_update()
+    )
     
     if not order:
         raise HTTPException(
@@ -211,15 +157,17 @@ def cancel_order(
             detail="Cannot cancel order in current status"
         )
     
-    order.status = OrderStatus.CANCELLED
-    db.commit()
+    popularity_change = await checkout_service.cancel_order(db, order)
+    await db.commit()
+    await popularity_engine.publish(popularity_change)
     
     return {"message": "Order cancelled"}
 
 
 # Admin endpoints
 @router.get("/admin/all", response_model=List[OrderSchema])
-def get_all_orders(
+async def get_all_orders(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     status: OrderStatus = None,
@@ -227,64 +175,101 @@ def get_all_orders(
     user_id: int = None,
     date_from: datetime = None,
     date_to: datetime = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    pagination: PaginationMode = PaginationMode.PAGE,
+    cursor: str = Query(None, description="X-Next-Cursor предыдущей страницы"),
+    count: CountMode = CountMode.NONE,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
 ) -> Any:
-    """Get all orders - admin only"""
-    query = db.query(Order)
+    """Get all orders - admin only (pagination=cursor - keyset, курсор в X-Next-Cursor)"""
+    # Позиции всей страницы одним IN-запросом, а не по запросу на заказ
+    query = crud_order.select_orders(items=True)
     
     if status:
-        query = query.filter(Order.status == status)
+        query = query.where(Order.status == status)
     if payment_status:
-        query = query.filter(Order.payment_status == payment_status)
+        query = query.where(Order.payment_status == payment_status)
     if user_id:
-        query = query.filter(Order.user_id == user_id)
+        query = query.where(Order.user_id == user_id)
     if date_from:
-        query = query.filter(Order.created_at >= date_from)
+        query = query.where(Order.created_at >= date_from)
     if date_to:
-        query = query.filter(Order.created_at <= date_to)
+        query = query.where(Order.created_at <= date_to)
     
-    orders = query.order_by(Order.created_at.desc()).offset(skip).limit(limit).all()
-    return orders
+    return await paginate_async(
+        db,
+        query,
+        ORDERS_KEYSET,
+        limit,
+        skip=skip,
+        cursor=cursor,
+        mode=pagination,
+        count=count,
+        response=response
+    )
 
 
 @router.put("/admin/{order_id}/status", response_model=OrderSchema)
-def update_order_status(
+async def update_order_status(
     order_id: int,
     status_update: OrderStatusUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
 ) -> Any:
     """Update order status - admin only"""
-    order = db.query(Order).filter(Order.id == order_id).first()
+    # FOR UPDATE: допустимость перехода проверяется по статусу под блокировкой
+    order = await db.scalar(select(Order).where(Order.id == order_id).with_for_update())
     if not order:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Order not found"
         )
     
-    order.status = status_update.status
+    new_status = status_update.status
+    if (
+        new_status == OrderStatus.CANCELLED
+        and order.status != OrderStatus.CANCELLED
+        and order.status not in CANCELLABLE_STATUSES
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cannot cancel order that has already been shipped"
+        )
+    
     if status_update.admin_notes:
         order.admin_notes = status_update.admin_notes
     
-    db.commit()
-    db.refresh(order)
-    return order
+    # orders_count и рейтинг популярности меняются только на переходах подтверждения/отмены
+    if new_status == OrderStatus.CANCELLED:
+        # Отмена возвращает остатки на склад
+        popularity_change = await checkout_service.cancel_order(db, order)
+    elif order.status == OrderStatus.CANCELLED:
+        # Возврат из отмены списывает остатки заново (409, если их уже нет)
+        popularity_change = await checkout_service.reopen_order(db, order, new_status)
+    else:
+        old_status = order.status
+        order.status = new_status
+        popularity_change = await popularity_engine.apply_status_change(db, order, old_status)
+    await db.commit()
+    await popularity_engine.publish(popularity_change)
+    return await crud_order.reload(db, order, items=True)
 
 
-@router.get("/admin/today")
-def get_today_orders(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+@router.get("/admin/today", response_model=List[OrderSchema])
+async def get_today_orders(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
 ) -> Any:
     """Get today's orders - admin only"""
     from datetime import date
     
     today = date.today()
-    orders = db.query(Order).filter(
-        Order.delivery_date >= today,
-        Order.delivery_date < today + timedelta(days=1),
-        Order.status.in_([OrderStatus.CONFIRMED, OrderStatus.PREPARING, OrderStatus.DELIVERING])
-    ).all()
+    orders = (await db.scalars(
+        crud_order.select_orders(items=True).where(
+            Order.delivery_date >= today,
+            Order.delivery_date < today + timedelta(days=1),
+            Order.status.in_([OrderStatus.CONFIRMED, OrderStatus.PREPARING, OrderStatus.DELIVERING])
+        )
+    )).all()
     
     return orders 
\ No newline at end of file
@@ -1,17 +1,20 @@
 from typing import Any, List
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session
 from datetime import datetime
 
 from app.core.database import get_db
+from app.core.auth import Principal
 from app.api.v1.deps import get_current_active_user, get_current_admin_user
-from app.models.user import User
+from app.core.pagination import Keyset, PaginationMode, CountMode, paginate
 from app.models.payment import Payment, PaymentMethod, PaymentStatus
 from app.models.order import Order
 from app.schemas.payment import PaymentCreate, PaymentUpdate, Payment as PaymentSchema
 
 router = APIRouter()
 
+PAYMENTS_KEYSET = Keyset("payments:created_at", Payment.created_at, Payment.id, descending=True)
+
 
 @router.get("/", response_model=List[PaymentSchema])
 def get_payments(
@@ -20,7 +23,7 @@ def get_payments(
     status: PaymentStatus = None,
     method: PaymentMethod = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """Get user payments"""
     query = db.query(Payment).filter(Payment.user_id == current_user.id)
@@ -38,7 +41,7 @@ def get_payments(
 def get_payment(
     payment_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """Get payment by ID"""
     payment = db.query(Payment).filter(
@@ -60,7 +63,7 @@ def create_payment(
     order_id: int,
     method: PaymentMethod,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """Create payment for order"""
     # Check if order exists and belongs to user
@@ -110,7 +113,7 @@ def create_payment(
 def process_payment(
     payment_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """Process payment - integrate with payment gateway"""
     payment = db.query(Payment).filter(
@@ -153,7 +156,7 @@ def refund_payment(
     amount: float = None,
     reason: str = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    current_user: Principal = Depends(get_current_admin_user)
 ) -> Any:
     """Refund payment - admin only"""
     payment = db.query(Payment).filter(Payment.id == payment_id).first()
@@ -188,6 +191,7 @@ def refund_payment(
 # Admin endpoints
 @router.get("/admin/all", response_model=List[PaymentSchema])
 def get_all_payments(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     status: PaymentStatus = None,
@@ -195,10 +199,13 @@ def get_all_payments(
     user_id: int = None,
     date_from: datetime = None,
     date_to: datetime = None,
+    pagination: PaginationMode = PaginationMode.PAGE,
+    cursor: str = Query(None, description="X-Next-Cursor предыдущей страницы"),
+    count: CountMode = CountMode.NONE,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    current_user: Principal = Depends(get_current_admin_user)
 ) -> Any:
-    """Get all payments - admin only"""
+    """Get all payments - admin only (pagination=cursor - keyset, курсор в X-Next-Cursor)"""
     query = db.query(Payment)
     
     if status:
@@ -212,8 +219,17 @@ def get_all_payments(
     if date_to:
         query = query.filter(Payment.created_at <= date_to)
     
-    payments = query.order_by(Payment.created_at.desc()).offset(skip).limit(limit).all()
-    return payments
+    return paginate(
+        db,
+        query,
+        PAYMENTS_KEYSET,
+        limit,
+        skip=skip,
+        cursor=cursor,
+        mode=pagination,
+        count=count,
+        response=response
+    )
 
 
 @router.get("/admin/stats")
@@ -221,7 +237,7 @@ def get_payment_stats(
     date_from: datetime = None,
     date_to: datetime = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    current_user: Principal = Depends(get_current_admin_user)
 ) -> Any:
     """Get payment statistics - admin only"""
     from sqlalchemy import func
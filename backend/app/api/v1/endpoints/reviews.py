@@ -4,8 +4,8 @@ from sqlalchemy.orm import Session
 from datetime import datetime
 
 from app.core.database import get_db
+from app.core.auth import Principal
 from app.api.v1.deps import get_current_active_user, get_current_admin_user
-from app.models.user import User
 from app.models.review import Review
 from app.schemas.review import ReviewCreate, ReviewUpdate, Review as ReviewSchema
 
@@ -54,7 +54,7 @@ def get_review(
 def create_review(
     review_in: ReviewCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """Create new review"""
     # Check if user has already reviewed this order
@@ -86,7 +86,7 @@ def update_review(
     review_id: int,
     review_update: ReviewUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """Update review"""
     review = db.query(Review).filter(
@@ -119,7 +119,7 @@ def update_review(
 def delete_review(
     review_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """Delete review"""
     review = db.query(Review).filter(
@@ -144,7 +144,7 @@ def vote_review(
     review_id: int,
     helpful: bool,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """Vote on review helpfulness"""
     review = db.query(Review).filter(Review.id == review_id).first()
@@ -171,7 +171,7 @@ def get_pending_reviews(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    current_user: Principal = Depends(get_current_admin_user)
 ) -> Any:
     """Get pending reviews for moderation - admin only"""
     reviews = db.query(Review).filter(
@@ -185,7 +185,7 @@ def get_pending_reviews(
 def approve_review(
     review_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    current_user: Principal = Depends(get_current_admin_user)
 ) -> Any:
     """Approve review - admin only"""
     review = db.query(Review).filter(Review.id == review_id).first()
@@ -209,7 +209,7 @@ def reject_review(
     review_id: int,
     reason: str,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    current_user: Principal = Depends(get_current_admin_user)
 ) -> Any:
     """Reject review - admin only"""
     review = db.query(Review).filter(Review.id == review_id).first()
@@ -232,7 +232,7 @@ def reject_review(
 @router.get("/admin/stats")
 def get_review_stats(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    current_user: Principal = Depends(get_current_admin_user)
 ) -> Any:
     """Get review statistics - admin only"""
     from sqlalchemy import func
@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Response, HTTPException, Depends
 from fastapi.responses import PlainTextResponse
-from sqlalchemy.orm import Session
-from app.api.v1.deps import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_async_db
 from app.models.flower import Flower
 from typing import List
 import json
@@ -10,11 +11,11 @@ from datetime import datetime
 router = APIRouter()
 
 @router.get("/sitemap.xml")
-async def generate_sitemap(db: Session = Depends(get_db)):
+async def generate_sitemap(db: AsyncSession = Depends(get_async_db)):
     """Generate sitemap.xml with all flowers and static pages"""
     try:
         # Get all flowers
-        flowers = db.query(Flower).filter(Flower.is_available == True).all()
+        flowers = (await db.scalars(select(Flower).where(Flower.is_available == True))).all()
         
         base_url = "https://flowerpunk.ru"
         current_date = datetime.now().strftime("%Y-%m-%d")
@@ -171,9 +172,9 @@ async def get_homepage_structured_data():
     return structured_data
 
 @router.get("/structured-data/catalog")
-async def get_catalog_structured_data(db: Session = Depends(get_db)):
+async def get_catalog_structured_data(db: AsyncSession = Depends(get_async_db)):
     """Get structured data for catalog page"""
-    flowers = db.query(Flower).filter(Flower.is_available == True).limit(10).all()
+    flowers = (await db.scalars(select(Flower).where(Flower.is_available == True).limit(10))).all()
     
     item_list_element = []
     for i, flower in enumerate(flowers):
@@ -208,9 +209,9 @@ async def get_catalog_structured_data(db: Session = Depends(get_db)):
     return structured_data
 
 @router.get("/structured-data/flower/{flower_id}")
-async def get_flower_structured_data(flower_id: int, db: Session = Depends(get_db)):
+async def get_flower_structured_data(flower_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get structured data for specific flower"""
-    flower = db.query(Flower).filter(Flower.id == flower_id).first()
+    flower = await db.get(Flower, flower_id)
     
     if not flower:
         raise HTTPException(status_code=404, detail="Flower not found")
@@ -5,8 +5,8 @@ from datetime import datetime, timedelta
 import json
 
 from app.core.database import get_db
+from app.core.auth import Principal
 from app.api.v1.deps import get_current_active_user, get_current_admin_user
-from app.models.user import User
 from app.models.subscription import Subscription, SubscriptionStatus, SubscriptionFrequency
 from app.schemas.subscription import (
     SubscriptionCreate,
@@ -27,7 +27,7 @@ def get_subscriptions(
     limit: int = Query(100, ge=1, le=1000),
     status: SubscriptionStatus = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """Get user subscriptions"""
     query = db.query(Subscription).filter(Subscription.user_id == current_user.id)
@@ -43,7 +43,7 @@ def get_subscriptions(
 def get_subscription(
     subscription_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """Get subscription by ID"""
     subscription = db.query(Subscription).filter(
@@ -64,7 +64,7 @@ def get_subscription(
 def create_subscription(
     subscription_in: SubscriptionCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """Create new subscription"""
     # Calculate total price based on frequency
@@ -92,7 +92,7 @@ def update_subscription(
     subscription_id: int,
     subscription_update: SubscriptionUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """Update subscription"""
     subscription = db.query(Subscription).filter(
@@ -119,7 +119,7 @@ def pause_subscription(
     subscription_id: int,
     pause_data: SubscriptionPause,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """Pause subscription"""
     subscription = db.query(Subscription).filter(
@@ -144,7 +144,7 @@ def resume_subscription(
     subscription_id: int,
     resume_data: SubscriptionResume,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """Resume subscription"""
     subscription = db.query(Subscription).filter(
@@ -170,7 +170,7 @@ def skip_delivery(
     subscription_id: int,
     skip_data: SubscriptionSkip,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """Skip next delivery"""
     subscription = db.query(Subscription).filter(
@@ -195,7 +195,7 @@ def skip_delivery(
 def cancel_subscription(
     subscription_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """Cancel subscription"""
     subscription = db.query(Subscription).filter(
@@ -224,7 +224,7 @@ def get_all_subscriptions(
     status: SubscriptionStatus = None,
     user_id: int = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    current_user: Principal = Depends(get_current_admin_user)
 ) -> Any:
     """Get all subscriptions - admin only"""
     query = db.query(Subscription)
@@ -242,7 +242,7 @@ def get_all_subscriptions(
 def get_upcoming_deliveries(
     days: int = Query(7, ge=1, le=30),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    current_user: Principal = Depends(get_current_admin_user)
 ) -> Any:
     """Get upcoming deliveries - admin only"""
     from datetime import datetime, timedelta
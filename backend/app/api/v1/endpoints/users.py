@@ -1,18 +1,23 @@
 from typing import Any, List
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session
 
 from app.core.database import get_db
+from app.core.auth import Principal
 from app.api.v1.deps import get_current_active_user, get_current_admin_user
+from app.core.user_cache import UserCache
+from app.core.pagination import Keyset, PaginationMode, CountMode, paginate
 from app.models.user import User, UserRole
 from app.schemas.user import UserUpdate, UserProfile, User as UserSchema
 
 router = APIRouter()
 
+USERS_KEYSET = Keyset("users:id", User.id, User.id)
+
 
 @router.get("/me", response_model=UserProfile)
 def get_current_user_profile(
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """Get current user profile"""
     return current_user
@@ -21,28 +26,41 @@ def get_current_user_profile(
 @router.put("/me", response_model=UserProfile)
 def update_current_user_profile(
     user_update: UserUpdate,
-    current_user: User = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ) -> Any:
     """Update current user profile"""
+    # current_user - read-only Principal, изменяем строку из БД
+    user = db.get(User, current_user.id)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    
     for field, value in user_update.dict(exclude_unset=True).items():
-        setattr(current_user, field, value)
+        setattr(user, field, value)
     
     db.commit()
-    db.refresh(current_user)
-    return current_user
+    db.refresh(user)
+    UserCache.invalidate_user(user.id)
+    return user
 
 
 @router.get("/users", response_model=List[UserSchema])
 def get_users(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     role: UserRole = None,
     is_active: bool = None,
+    pagination: PaginationMode = PaginationMode.PAGE,
+    cursor: str = Query(None, description="X-Next-Cursor предыдущей страницы"),
+    count: CountMode = CountMode.NONE,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    current_user: Principal = Depends(get_current_admin_user)
 ) -> Any:
-    """Get users list - admin only"""
+    """Get users list - admin only (pagination=cursor - keyset, курсор в X-Next-Cursor)"""
     query = db.query(User)
     
     if role:
@@ -50,15 +68,24 @@ def get_users(
     if is_active is not None:
         query = query.filter(User.is_active == is_active)
     
-    users = query.offset(skip).limit(limit).all()
-    return users
+    return paginate(
+        db,
+        query,
+        USERS_KEYSET,
+        limit,
+        skip=skip,
+        cursor=cursor,
+        mode=pagination,
+        count=count,
+        response=response
+    )
 
 
 @router.get("/users/{user_id}", response_model=UserSchema)
 def get_user(
     user_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    current_user: Principal = Depends(get_current_admin_user)
 ) -> Any:
     """Get user by ID - admin only"""
     user = db.query(User).filter(User.id == user_id).first()
@@ -75,7 +102,7 @@ def update_user(
     user_id: int,
     user_update: UserUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    current_user: Principal = Depends(get_current_admin_user)
 ) -> Any:
     """Update user - admin only"""
     user = db.query(User).filter(User.id == user_id).first()
@@ -90,6 +117,7 @@ def update_user(
     
     db.commit()
     db.refresh(user)
+    UserCache.invalidate_user(user.id)
     return user
 
 
@@ -97,7 +125,7 @@ def update_user(
 def delete_user(
     user_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    current_user: Principal = Depends(get_current_admin_user)
 ) -> Any:
     """Delete user - admin only"""
     user = db.query(User).filter(User.id == user_id).first()
@@ -110,6 +138,7 @@ def delete_user(
     # Soft delete - just deactivate
     user.is_active = False
     db.commit()
+    UserCache.invalidate_user(user.id)
     
     return {"message": "User deactivated"}
 
@@ -118,7 +147,7 @@ def delete_user(
 def activate_user(
     user_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    current_user: Principal = Depends(get_current_admin_user)
 ) -> Any:
     """Activate user - admin only"""
     user = db.query(User).filter(User.id == user_id).first()
@@ -130,6 +159,7 @@ def activate_user(
     
     user.is_active = True
     db.commit()
+    UserCache.invalidate_user(user.id)
     
     return {"message": "User activated"}
 
@@ -138,7 +168,7 @@ def activate_user(
 def verify_user(
     user_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    current_user: Principal = Depends(get_current_admin_user)
 ) -> Any:
     """Verify user - admin only"""
     user = db.query(User).filter(User.id == user_id).first()
@@ -150,5 +180,6 @@ def verify_user(
     
     user.is_verified = True
     db.commit()
+    UserCache.invalidate_user(user.id)
     
     return {"message": "User verified"} 
\ No newline at end of file
@@ -350,7 +350,8 @@ async def show_category_flowers(chat_id: int, category: str):
     
     db = SessionLocal()
     try:
-        flowers = crud_flower.get_by_category(db, category, limit=5)
+        # Для меню нужны только id, название и цена
+        flowers = crud_flower.get_menu_by_category(db, category, limit=5)
         
         if not flowers:
             await bot.send_message(chat_id, "В этой категории пока нет цветов.")
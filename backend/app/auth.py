@@ -14,7 +14,6 @@ from app.core.security import (
     get_password_hash,
     generate_password
 )
-from app.core.rate_limiter import rate_limit
 from app.models.user import User, UserRole
 from app.schemas.user import (
     UserCreate,
@@ -40,7 +39,6 @@ logger = logging.getLogger(__name__)
 
 
 @router.post("/register", response_model=UserSchema)
-@rate_limit("auth_register")
 def register(
     request: Request,
     user_in: RegisterRequest,
@@ -320,7 +318,6 @@ def verify_telegram_website_data(auth_data: TelegramWebsiteAuthRequest, bot_toke
 
 
 @router.post("/telegram-miniapp", response_model=AuthResponse)
-@rate_limit("auth_login")
 def telegram_miniapp_auth(
     request: Request,
     auth_data: TelegramMiniAppAuthRequest,
@@ -400,7 +397,6 @@ def telegram_miniapp_auth(
 
 
 @router.post("/telegram-website", response_model=AuthResponse)
-@rate_limit("auth_login")
 def telegram_website_auth(
     request: Request,
     auth_data: TelegramWebsiteAuthRequest,
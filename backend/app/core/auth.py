@@ -0,0 +1,171 @@
+"""
+🔐 Auth Fast Path
+Проверка access-токена на каждом запросе без лишних round-trip'ов:
+claims JWT кэшируются в процессе по хэшу токена, отзывы проверяются по
+локальной реплике (app.core.revocation), снимок пользователя - L1 или один
+GET из Redis, результат - неизменяемый Principal
+"""
+
+import json
+import time
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import HTTPException, status
+from jose import JWTError, jwt
+
+from app.core.config import settings
+from app.core.redis import redis_manager
+from app.core.database import AsyncSessionLocal
+from app.core.local_cache import get_local_cache
+from app.core.revocation import token_revocation, token_hash
+from app.core.user_cache import UserCache
+from app.models.user import User, UserRole
+
+logger = logging.getLogger(__name__)
+
+TOKENS_NAMESPACE = "tokens"
+
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """
+    Аутентифицированный пользователь запроса (read-only снимок)
+    Для изменения профиля эндпоинт загружает User из БД по id
+    """
+    id: int
+    email: str
+    full_name: str
+    role: UserRole
+    is_active: bool
+    is_verified: bool
+    bonus_points: int
+    phone: Optional[str] = None
+    telegram_id: Optional[str] = None
+    address: Optional[str] = None
+    preferences: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    
+    @classmethod
+    def from_snapshot(cls, data: Dict[str, Any]) -> "Principal":
+        """Из снимка UserCache (JSON user_cache:{id})"""
+        created_at = data.get("created_at")
+        updated_at = data.get("updated_at")
+        return cls(
+            id=data["id"],
+            email=data["email"],
+            full_name=data["full_name"],
+            role=UserRole(data.get("role") or UserRole.CLIENT.value),
+            is_active=data["is_active"],
+            is_verified=data.get("is_verified", False),
+            bonus_points=data.get("bonus_points") or 0,
+            phone=data.get("phone"),
+            telegram_id=data.get("telegram_id"),
+            address=data.get("address"),
+            preferences=data.get("preferences"),
+            created_at=datetime.fromisoformat(created_at) if created_at else None,
+            updated_at=datetime.fromisoformat(updated_at) if updated_at else None
+        )
+
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def decode_token_cached(token: str, digest: str) -> Tuple[int, int]:
+    """
+    (user_id, tv) из access-токена; подпись проверяется один раз за время
+    жизни токена (ключ L1 - sha256 токена, TTL - до exp)
+    """
+    cache = get_local_cache(TOKENS_NAMESPACE)
+    if cache is not None:
+        claims = cache.get(digest)
+        if claims is not None:
+            return claims
+    
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        claims = (int(payload["sub"]), int(payload.get("tv") or 0))
+    except (JWTError, KeyError, ValueError, TypeError):
+        raise _credentials_exception()
+    
+    if cache is not None:
+        ttl = payload.get("exp", 0) - time.time()
+        if ttl > 0:
+            cache.set(digest, claims, ttl)
+    return claims
+
+
+async def _fetch_snapshot(user_id: int) -> Optional[str]:
+    """JSON снимка из Redis (ошибки Redis - снимок берется из БД)"""
+    client = redis_manager.redis_client
+    if client is None:
+        return None
+    try:
+        return await client.get(UserCache.key(user_id))
+    except Exception as e:
+        logger.warning(f"User snapshot read error for user {user_id}: {e}")
+        return None
+
+
+async def _load_snapshot(user_id: int) -> Optional[Dict[str, Any]]:
+    """Промах кэша: пользователь из БД, снимок - обратно в Redis и L1"""
+    async with AsyncSessionLocal() as db:
+        user = await db.get(User, user_id)
+    if user is None:
+        return None
+    snapshot = UserCache.snapshot(user)
+    client = redis_manager.redis_client
+    if client is not None:
+        try:
+            await client.setex(
+                UserCache.key(user_id),
+                UserCache.DEFAULT_TTL,
+                json.dumps(snapshot, ensure_ascii=False)
+            )
+        except Exception as e:
+            logger.warning(f"Error caching user {user_id}: {e}")
+    return snapshot
+
+
+async def authenticate(token: str) -> Principal:
+    """
+    Principal по access-токену (401 - невалидный или отозванный токен,
+    400 - неактивный пользователь)
+    """
+    digest = token_hash(token)
+    user_id, token_version = decode_token_cached(token, digest)
+    
+    # Отзывы - локальная реплика, без сети
+    if token_revocation.is_token_revoked(digest):
+        raise _credentials_exception()
+    if token_revocation.is_user_revoked(user_id, token_version):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User access revoked"
+        )
+    
+    local = get_local_cache(UserCache.NAMESPACE)
+    snapshot = local.get(UserCache.key(user_id)) if local is not None else None
+    if snapshot is None:
+        raw = await _fetch_snapshot(user_id)
+        snapshot = json.loads(raw) if raw else await _load_snapshot(user_id)
+        if snapshot is None:
+            raise _credentials_exception()
+        if local is not None:
+            local.set(UserCache.key(user_id), snapshot)
+    
+    principal = Principal.from_snapshot(snapshot)
+    if not principal.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Inactive user"
+        )
+    return principal
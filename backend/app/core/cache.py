@@ -3,28 +3,55 @@
 Система кэширования для оптимизации производительности API
 """
 
+import re
+import gzip
 import json
+import math
+import time
+import uuid
+import random
 import hashlib
 import asyncio
-from typing import Any, Optional, Union, Callable, Dict
+from typing import Any, Awaitable, Optional, Union, Callable, Dict, List, Tuple
 from functools import wraps
 from datetime import datetime, timedelta
-import redis
 import logging
 
-from app.core.config import settings
+from app.core.redis import redis_manager, RedisManager
+from app.core.local_cache import get_local_cache, get_local_cache_stats, invalidation_bus
 
 logger = logging.getLogger(__name__)
 
-# Redis connection for caching
-cache_client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
-
 class CacheManager:
-    """Менеджер кэширования"""
+    """
+    Менеджер кэширования
+    
+    Работает поверх асинхронного пула RedisManager: никаких
+    asyncio.to_thread, пакетные операции уходят одним round-trip.
+    Если передан namespace с настроенным L1 (LOCAL_CACHE_NAMESPACES),
+    перед Redis проверяется in-process кэш воркера.
+    
+    Инвалидация по тегам: запись хранит версии своих тегов
+    ({"t": {tag: version}, "d": value}), invalidate_tags делает INCR
+    счетчика версии - O(1) вместо KEYS. Записи со старой версией
+    считаются промахом и вытесняются по TTL.
+    """
+    
+    SCAN_BATCH = 500
     
-    def __init__(self):
-        self.client = cache_client
+    def __init__(self, redis: RedisManager = redis_manager):
+        self.redis = redis
         self.default_ttl = 300  # 5 минут
+    
+    @property
+    def client(self):
+        """Асинхронный клиент Redis (None до redis_manager.connect())"""
+        return self.redis.redis_client
+    
+    @property
+    def binary_client(self):
+        """Клиент без decode_responses - для бинарных значений (HTTP кэш)"""
+        return self.redis.binary_client
         
     def _generate_key(self, prefix: str, *args, **kwargs) -> str:
         """Генерирует ключ кэша на основе аргументов"""
@@ -33,53 +60,228 @@ class CacheManager:
         key_hash = hashlib.md5(key_data.encode()).hexdigest()
         return f"cache:{prefix}:{key_hash}"
     
-    async def get(self, key: str) -> Optional[Any]:
-        """Получает значение из кэша"""
-        try:
-            value = await asyncio.to_thread(self.client.get, key)
-            if value:
-                return json.loads(value)
+    @staticmethod
+    def _tag_key(tag: str) -> str:
+        """Ключ счетчика версии тега"""
+        return f"cache:tag:{tag}"
+    
+    async def tag_versions(self, tags: List[str]) -> Dict[str, int]:
+        """Текущие версии тегов одним MGET"""
+        client = self.client
+        if client is None or not tags:
+            return {}
+        values = await client.mget([self._tag_key(tag) for tag in tags])
+        return {tag: int(value or 0) for tag, value in zip(tags, values)}
+    
+    async def get_entry(
+        self,
+        key: str,
+        tags: List[str]
+    ) -> Tuple[Optional[Dict[str, Any]], Dict[str, int]]:
+        """
+        GET записи и MGET версий ее тегов в одном pipeline
+        Возвращает (конверт {"t", "d", ...} или None, текущие версии) -
+        версии нужны для последующего set, чтобы не записать устаревшие
+        данные поверх инвалидации, случившейся во время вычисления.
+        """
+        client = self.client
+        if client is None:
+            return None, {}
+        async with client.pipeline(transaction=False) as pipe:
+            pipe.get(key)
+            pipe.mget([self._tag_key(tag) for tag in tags])
+            raw, raw_versions = await pipe.execute()
+        versions = {tag: int(value or 0) for tag, value in zip(tags, raw_versions)}
+        if not raw:
+            return None, versions
+        entry = json.loads(raw)
+        if not isinstance(entry, dict) or entry.get("t") != versions:
+            return None, versions
+        return entry, versions
+    
+    async def get_with_versions(
+        self,
+        key: str,
+        tags: List[str]
+    ) -> Tuple[Optional[Any], Dict[str, int]]:
+        """То же, что get_entry, но возвращает само значение"""
+        entry, versions = await self.get_entry(key, tags)
+        return (entry.get("d") if entry else None), versions
+    
+    async def get(
+        self,
+        key: str,
+        namespace: Optional[str] = None,
+        tags: Optional[List[str]] = None
+    ) -> Optional[Any]:
+        """Получает значение из кэша (L1 -> Redis), с проверкой версий тегов"""
+        local = get_local_cache(namespace) if namespace else None
+        if local is not None:
+            value = local.get(key)
+            if value is not None:
+                return value
+        
+        client = self.client
+        if client is None:
             return None
+        try:
+            if tags:
+                result, _ = await self.get_with_versions(key, tags)
+            else:
+                value = await client.get(key)
+                result = json.loads(value) if value else None
+            if result is not None and local is not None:
+                local.set(key, result)
+            return result
         except Exception as e:
             logger.error(f"Cache get error: {e}")
             return None
     
-    async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
-        """Сохраняет значение в кэш"""
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """Получает несколько значений одним MGET, возвращает только попадания"""
+        client = self.client
+        if client is None or not keys:
+            return {}
+        try:
+            values = await client.mget(keys)
+            return {
+                key: json.loads(value)
+                for key, value in zip(keys, values)
+                if value
+            }
+        except Exception as e:
+            logger.error(f"Cache get_many error: {e}")
+            return {}
+    
+    async def set(
+        self,
+        key: str,
+        value: Any,
+        ttl: Optional[int] = None,
+        namespace: Optional[str] = None,
+        tags: Optional[List[str]] = None,
+        versions: Optional[Dict[str, int]] = None,
+        compute_time: Optional[float] = None
+    ) -> bool:
+        """
+        Сохраняет значение в кэш
+        tags - теги записи; versions - версии, прочитанные до вычисления
+        значения (из get_with_versions), иначе берутся текущие.
+        compute_time - время вычисления, сохраняется для XFetch.
+        """
+        client = self.client
+        if client is None:
+            return False
         try:
             ttl = ttl or self.default_ttl
-            serialized_value = json.dumps(value, default=str)
-            await asyncio.to_thread(self.client.setex, key, ttl, serialized_value)
+            if tags:
+                if versions is None:
+                    versions = await self.tag_versions(tags)
+                entry = {"t": versions, "d": value}
+                if compute_time is not None:
+                    entry["x"] = compute_time
+                    entry["e"] = time.time() + ttl
+                serialized_value = json.dumps(entry, default=str)
+            else:
+                serialized_value = json.dumps(value, default=str)
+            await client.setex(key, ttl, serialized_value)
+            local = get_local_cache(namespace) if namespace else None
+            if local is not None:
+                # В L1 кладем тот же вид, что вернет Redis после json round-trip
+                stored = json.loads(serialized_value)
+                local.set(key, stored["d"] if tags else stored, ttl)
             return True
         except Exception as e:
             logger.error(f"Cache set error: {e}")
             return False
     
-    async def delete(self, key: str) -> bool:
-        """Удаляет значение из кэша"""
+    async def set_many(self, items: Dict[str, Any], ttl: Optional[int] = None) -> bool:
+        """Сохраняет несколько значений: MSET + EXPIRE в одном pipeline"""
+        client = self.client
+        if client is None or not items:
+            return False
+        try:
+            ttl = ttl or self.default_ttl
+            serialized = {key: json.dumps(value, default=str) for key, value in items.items()}
+            async with client.pipeline(transaction=False) as pipe:
+                pipe.mset(serialized)
+                for key in serialized:
+                    pipe.expire(key, ttl)
+                await pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Cache set_many error: {e}")
+            return False
+    
+    async def delete(self, *keys: str, namespace: Optional[str] = None) -> bool:
+        """Удаляет значение(я) из кэша, включая L1 всех воркеров"""
+        client = self.client
+        if client is None or not keys:
+            return False
         try:
-            await asyncio.to_thread(self.client.delete, key)
+            await client.delete(*keys)
             return True
         except Exception as e:
             logger.error(f"Cache delete error: {e}")
             return False
+        finally:
+            # L1 сбрасываем после Redis, чтобы воркеры не перечитали старое значение
+            if namespace:
+                for key in keys:
+                    await invalidation_bus.publish(namespace, key)
     
-    async def delete_pattern(self, pattern: str) -> int:
-        """Удаляет все ключи по паттерну"""
+    async def invalidate_tags(self, *tags: str, namespace: Optional[str] = None) -> bool:
+        """Инвалидирует все записи с любым из тегов: INCR версии, O(1) на тег"""
+        client = self.client
+        if client is None or not tags:
+            return False
         try:
-            keys = await asyncio.to_thread(self.client.keys, pattern)
-            if keys:
-                deleted = await asyncio.to_thread(self.client.delete, *keys)
-                return deleted
+            async with client.pipeline(transaction=False) as pipe:
+                for tag in tags:
+                    pipe.incr(self._tag_key(tag))
+                await pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Cache invalidate tags error: {e}")
+            return False
+        finally:
+            if namespace:
+                await invalidation_bus.publish(namespace)
+    
+    async def delete_pattern(self, pattern: str, namespace: Optional[str] = None) -> int:
+        """
+        Удаляет все ключи по паттерну (namespace - сбросить его L1 целиком)
+        Инкрементальный SCAN + UNLINK пачками, без блокирующего KEYS.
+        Для инвалидации данных используйте invalidate_tags.
+        """
+        client = self.client
+        if client is None:
             return 0
+        try:
+            deleted = 0
+            batch = []
+            async for key in client.scan_iter(match=pattern, count=self.SCAN_BATCH):
+                batch.append(key)
+                if len(batch) >= self.SCAN_BATCH:
+                    deleted += await client.unlink(*batch)
+                    batch = []
+            if batch:
+                deleted += await client.unlink(*batch)
+            return deleted
         except Exception as e:
             logger.error(f"Cache delete pattern error: {e}")
             return 0
+        finally:
+            if namespace:
+                await invalidation_bus.publish(namespace)
     
     async def clear_all(self) -> bool:
         """Очищает весь кэш"""
+        client = self.client
+        if client is None:
+            return False
         try:
-            await asyncio.to_thread(self.client.flushdb)
+            await client.flushdb()
             return True
         except Exception as e:
             logger.error(f"Cache clear error: {e}")
@@ -88,11 +290,138 @@ class CacheManager:
 # Глобальный экземпляр
 cache_manager = CacheManager()
 
+class SingleFlight:
+    """
+    Схлопывание конкурентных промахов кэша (защита от cache stampede)
+    
+    В процессе ждущие запросы подписываются на один Future; между
+    воркерами лидера выбирает короткий Redis lock (SET NX PX), остальные
+    опрашивают кэш, пока лидер не запишет результат.
+    """
+    
+    # Снимаем lock только если он все еще наш
+    RELEASE_SCRIPT = """
+    if redis.call("get", KEYS[1]) == ARGV[1] then
+        return redis.call("del", KEYS[1])
+    end
+    return 0
+    """
+    
+    def __init__(self, lock_ttl: float = 10.0, wait_timeout: float = 5.0, poll_interval: float = 0.05):
+        self.lock_ttl = lock_ttl
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.stats = {
+            "leaders": 0,             # Запросы, выполнившие вычисление
+            "coalesced_local": 0,     # Дождались Future в этом процессе
+            "coalesced_remote": 0,    # Дождались результата другого воркера
+            "lock_timeouts": 0,       # Не дождались - посчитали сами
+            "early_refreshes": 0,     # XFetch досрочные обновления
+        }
+    
+    def in_flight(self, key: str) -> bool:
+        return key in self._inflight
+    
+    async def do(
+        self,
+        key: str,
+        compute: Callable[[], Any],
+        fetch: Callable[[], Any],
+        stale: Optional[Any] = None
+    ) -> Any:
+        """
+        Выполняет compute() один раз на ключ
+        fetch() - повторное чтение кэша, пока вычисляет другой воркер;
+        stale - значение, которое можно сразу вернуть, если lock занят.
+        """
+        future = self._inflight.get(key)
+        if future is not None:
+            self.stats["coalesced_local"] += 1
+            return await asyncio.shield(future)
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._lead(key, compute, fetch, stale)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                future.exception()  # Помечаем как полученное, если никто не ждал
+            raise
+        finally:
+            self._inflight.pop(key, None)
+    
+    async def _lead(self, key: str, compute: Callable[[], Any], fetch: Callable[[], Any], stale: Optional[Any]) -> Any:
+        client = cache_manager.client
+        if client is None:
+            self.stats["leaders"] += 1
+            return await compute()
+        
+        lock_key = f"lock:{key}"
+        token = uuid.uuid4().hex
+        try:
+            acquired = await client.set(lock_key, token, nx=True, px=int(self.lock_ttl * 1000))
+        except Exception as e:
+            logger.error(f"Single-flight lock error: {e}")
+            acquired = True  # Redis недоступен - считаем сами
+            client = None
+        
+        if acquired:
+            self.stats["leaders"] += 1
+            try:
+                return await compute()
+            finally:
+                if client is not None:
+                    try:
+                        await client.eval(self.RELEASE_SCRIPT, 1, lock_key, token)
+                    except Exception as e:
+                        logger.error(f"Single-flight unlock error: {e}")
+        
+        if stale is not None:
+            self.stats["coalesced_remote"] += 1
+            return stale
+        
+        # Другой воркер уже вычисляет: ждем, пока результат появится в кэше
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.wait_timeout
+        while loop.time() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            value = await fetch()
+            if value is not None:
+                self.stats["coalesced_remote"] += 1
+                return value
+        
+        self.stats["lock_timeouts"] += 1
+        self.stats["leaders"] += 1
+        return await compute()
+
+single_flight = SingleFlight()
+
+def _should_refresh_early(entry: Dict[str, Any], beta: float) -> bool:
+    """
+    XFetch: вероятностное досрочное обновление
+    Чем ближе истечение и дороже вычисление (x), тем выше шанс.
+    """
+    delta, expiry = entry.get("x"), entry.get("e")
+    if not delta or not expiry:
+        return False
+    return time.time() - delta * beta * math.log(1.0 - random.random()) >= expiry
+
 def cache_result(
     prefix: str,
     ttl: int = 300,
     skip_cache: bool = False,
-    cache_key_func: Optional[Callable] = None
+    cache_key_func: Optional[Callable] = None,
+    tags: Optional[Union[List[str], Callable]] = None,
+    namespace: Optional[str] = None,
+    coalesce: bool = True,
+    early_refresh: bool = False,
+    beta: float = 1.0
 ):
     """
     Декоратор для кэширования результатов функций
@@ -102,6 +431,11 @@ def cache_result(
         ttl: Время жизни кэша в секундах
         skip_cache: Пропустить кэш (для отладки)
         cache_key_func: Функция для генерации кастомного ключа
+        tags: Теги записи (список или функция от аргументов), по умолчанию [prefix]
+        namespace: Пространство имен L1 кэша
+        coalesce: Single-flight для конкурентных промахов (процесс + Redis lock)
+        early_refresh: XFetch - досрочно обновлять запись до истечения TTL
+        beta: Агрессивность XFetch (>1 - обновлять раньше)
     """
     def decorator(func: Callable):
         @wraps(func)
@@ -115,44 +449,82 @@ def cache_result(
             else:
                 cache_key = cache_manager._generate_key(prefix, *args, **kwargs)
             
-            # Пытаемся получить из кэша
-            cached_result = await cache_manager.get(cache_key)
-            if cached_result is not None:
-                logger.debug(f"Cache hit for key: {cache_key}")
-                return cached_result
+            entry_tags = tags(*args, **kwargs) if callable(tags) else (tags or [prefix])
             
-            # Выполняем функцию
-            logger.debug(f"Cache miss for key: {cache_key}")
-            result = await func(*args, **kwargs)
+            local = get_local_cache(namespace) if namespace else None
+            if local is not None:
+                cached_result = local.get(cache_key)
+                if cached_result is not None:
+                    return cached_result
             
-            # Сохраняем в кэш
-            await cache_manager.set(cache_key, result, ttl)
+            # Пытаемся получить из кэша (вместе с версиями тегов)
+            try:
+                entry, versions = await cache_manager.get_entry(cache_key, entry_tags)
+            except Exception as e:
+                logger.error(f"Cache get error: {e}")
+                entry, versions = None, None
             
-            return result
+            stale = None
+            if entry is not None:
+                if not (early_refresh and _should_refresh_early(entry, beta)):
+                    logger.debug(f"Cache hit for key: {cache_key}")
+                    if local is not None:
+                        local.set(cache_key, entry["d"], ttl)
+                    return entry["d"]
+                # Досрочное обновление: остальные пока получают текущее значение
+                if single_flight.in_flight(cache_key):
+                    return entry["d"]
+                single_flight.stats["early_refreshes"] += 1
+                stale = entry["d"]
+            
+            async def compute():
+                # Выполняем функцию
+                logger.debug(f"Cache miss for key: {cache_key}")
+                started = time.perf_counter()
+                result = await func(*args, **kwargs)
+                
+                # Сохраняем в кэш с версиями, прочитанными до вычисления
+                await cache_manager.set(
+                    cache_key, result, ttl,
+                    namespace=namespace, tags=entry_tags, versions=versions or None,
+                    compute_time=time.perf_counter() - started if early_refresh else None
+                )
+                return result
+            
+            if not coalesce:
+                return await compute()
+            
+            async def fetch():
+                try:
+                    value, _ = await cache_manager.get_with_versions(cache_key, entry_tags)
+                    return value
+                except Exception as e:
+                    logger.error(f"Cache get error: {e}")
+                    return None
+            
+            return await single_flight.do(cache_key, compute, fetch, stale=stale)
         
         return wrapper
     return decorator
 
-def invalidate_cache(patterns: Union[str, list]):
+def invalidate_cache(tags: Union[str, list], namespace: Optional[str] = None):
     """
     Декоратор для инвалидации кэша после выполнения функции
     
     Args:
-        patterns: Паттерн(ы) ключей для удаления из кэша
+        tags: Тег(и), записи с которыми станут недействительными
+        namespace: Пространство имен L1 кэша для сброса во всех воркерах
     """
     def decorator(func: Callable):
         @wraps(func)
         async def wrapper(*args, **kwargs):
             result = await func(*args, **kwargs)
             
-            # Инвалидируем кэш
-            if isinstance(patterns, str):
-                await cache_manager.delete_pattern(f"cache:{patterns}*")
-            else:
-                for pattern in patterns:
-                    await cache_manager.delete_pattern(f"cache:{pattern}*")
+            # Инвалидируем кэш: один pipeline INCR по всем тегам
+            tag_list = [tags] if isinstance(tags, str) else tags
+            await cache_manager.invalidate_tags(*tag_list, namespace=namespace)
             
-            logger.debug(f"Cache invalidated for patterns: {patterns}")
+            logger.debug(f"Cache invalidated for tags: {tags}")
             return result
         
         return wrapper
@@ -186,6 +558,19 @@ async def cache_stats() -> str:
     """Генерирует ключ кэша для статистики"""
     return "stats:general"
 
+# Теги инвалидации
+
+FLOWERS_TAG = "flowers"            # Все данные каталога
+FLOWERS_LIST_TAG = "flowers_list"  # Только списки цветов
+
+def flower_tag(flower_id: int) -> str:
+    """Тег конкретного цветка"""
+    return f"flower:{flower_id}"
+
+def user_tag(user_id: int) -> str:
+    """Тег всех данных пользователя"""
+    return f"user:{user_id}"
+
 # Функции для работы с кэшем приложения
 
 async def get_cached_flowers(
@@ -196,7 +581,9 @@ async def get_cached_flowers(
 ) -> Optional[Dict[str, Any]]:
     """Получает кэшированный список цветов"""
     cache_key = await cache_flowers_list(page, per_page, category, available_only)
-    return await cache_manager.get(f"cache:{cache_key}")
+    return await cache_manager.get(
+        f"cache:{cache_key}", namespace="flowers", tags=[FLOWERS_TAG, FLOWERS_LIST_TAG]
+    )
 
 async def set_cached_flowers(
     flowers_data: Dict[str, Any],
@@ -208,36 +595,42 @@ async def set_cached_flowers(
 ) -> bool:
     """Сохраняет список цветов в кэш"""
     cache_key = await cache_flowers_list(page, per_page, category, available_only)
-    return await cache_manager.set(f"cache:{cache_key}", flowers_data, ttl)
+    return await cache_manager.set(
+        f"cache:{cache_key}", flowers_data, ttl,
+        namespace="flowers", tags=[FLOWERS_TAG, FLOWERS_LIST_TAG]
+    )
 
 async def invalidate_flowers_cache():
     """Инвалидирует весь кэш цветов"""
-    await cache_manager.delete_pattern("cache:flowers_*")
-    await cache_manager.delete_pattern("cache:flower_detail_*")
+    await cache_manager.invalidate_tags(FLOWERS_TAG, namespace="flowers")
 
 async def get_cached_flower(flower_id: int) -> Optional[Dict[str, Any]]:
     """Получает кэшированную информацию о цветке"""
     cache_key = await cache_flower_detail(flower_id)
-    return await cache_manager.get(f"cache:{cache_key}")
+    return await cache_manager.get(
+        f"cache:{cache_key}", namespace="flowers", tags=[FLOWERS_TAG, flower_tag(flower_id)]
+    )
 
 async def set_cached_flower(flower_id: int, flower_data: Dict[str, Any], ttl: int = 600) -> bool:
     """Сохраняет информацию о цветке в кэш"""
     cache_key = await cache_flower_detail(flower_id)
-    return await cache_manager.set(f"cache:{cache_key}", flower_data, ttl)
+    return await cache_manager.set(
+        f"cache:{cache_key}", flower_data, ttl,
+        namespace="flowers", tags=[FLOWERS_TAG, flower_tag(flower_id)]
+    )
 
 async def invalidate_flower_cache(flower_id: int):
-    """Инвалидирует кэш конкретного цветка"""
-    cache_key = await cache_flower_detail(flower_id)
-    await cache_manager.delete(f"cache:{cache_key}")
-    # Также инвалидируем списки цветов
-    await cache_manager.delete_pattern("cache:flowers_list_*")
+    """Инвалидирует кэш конкретного цветка и списки цветов"""
+    await cache_manager.invalidate_tags(
+        flower_tag(flower_id), FLOWERS_LIST_TAG, namespace="flowers"
+    )
 
 # Кэширование пользовательских данных
 
 async def get_cached_user_data(user_id: int, data_type: str) -> Optional[Any]:
     """Получает кэшированные данные пользователя"""
     cache_key = f"user_data:{user_id}:{data_type}"
-    return await cache_manager.get(f"cache:{cache_key}")
+    return await cache_manager.get(f"cache:{cache_key}", tags=[user_tag(user_id)])
 
 async def set_cached_user_data(
     user_id: int, 
@@ -247,12 +640,11 @@ async def set_cached_user_data(
 ) -> bool:
     """Сохраняет данные пользователя в кэш"""
     cache_key = f"user_data:{user_id}:{data_type}"
-    return await cache_manager.set(f"cache:{cache_key}", data, ttl)
+    return await cache_manager.set(f"cache:{cache_key}", data, ttl, tags=[user_tag(user_id)])
 
 async def invalidate_user_cache(user_id: int):
-    """Инвалидирует весь кэш пользователя"""
-    await cache_manager.delete_pattern(f"cache:user_data:{user_id}:*")
-    await cache_manager.delete_pattern(f"cache:user_orders:{user_id}:*")
+    """Инвалидирует весь кэш пользователя (user_data и user_orders)"""
+    await cache_manager.invalidate_tags(user_tag(user_id))
 
 # Warming up cache (предзагрузка)
 
@@ -276,17 +668,28 @@ async def warm_up_cache():
 async def get_cache_stats() -> Dict[str, Any]:
     """Получает статистику использования кэша"""
     try:
-        info = await asyncio.to_thread(cache_manager.client.info, "memory")
-        keyspace = await asyncio.to_thread(cache_manager.client.info, "keyspace")
+        client = cache_manager.client
+        if client is None:
+            return {"error": "Redis not connected"}
+        
+        async with client.pipeline(transaction=False) as pipe:
+            pipe.info("memory")
+            pipe.info("keyspace")
+            pipe.dbsize()
+            info, keyspace, total_keys = await pipe.execute()
         
-        # Подсчитываем количество ключей кэша
-        cache_keys = await asyncio.to_thread(cache_manager.client.keys, "cache:*")
+        # Подсчитываем количество ключей кэша инкрементальным SCAN
+        cache_keys = 0
+        async for _ in client.scan_iter(match="cache:*", count=CacheManager.SCAN_BATCH):
+            cache_keys += 1
         
         return {
             "memory_usage": info.get("used_memory_human", "Unknown"),
-            "total_keys": len(cache_keys),
-            "cache_keys": len([k for k in cache_keys if k.startswith("cache:")]),
+            "total_keys": total_keys,
+            "cache_keys": cache_keys,
             "keyspace_info": keyspace,
+            "local_cache": get_local_cache_stats(),
+            "single_flight": dict(single_flight.stats),
             "connected_clients": info.get("connected_clients", 0)
         }
     except Exception as e:
@@ -313,16 +716,87 @@ async def cleanup_expired_cache():
 # Middleware для автоматического кэширования
 
 class CacheMiddleware:
-    """Middleware для автоматического кэширования GET запросов"""
+    """
+    ASGI middleware HTTP-кэша для публичных GET запросов
+    
+    - тело ответа перехватывается по чанкам (http.response.body) без
+      буферизации стриминга; в Redis хранится gzip + заголовки (HASH)
+    - strong ETag (sha256 тела), If-None-Match -> 304 без вызова роута
+    - Cache-Control запроса (no-store / no-cache) и ответа
+      (no-store / private / max-age / s-maxage) соблюдаются
+    - запросы с Authorization и ответы с Set-Cookie не кэшируются
+    - записи помечены тегами префикса; успешный POST/PUT/PATCH/DELETE
+      на префикс инкрементирует версии тегов (O(1) инвалидация)
+    - хит отдается без роутинга, поэтому зависимости приложения не
+      выполняются: лимиты запросов проверяет admission (до отдачи хита)
+    """
+    
+    # Префикс пути -> теги инвалидации
+    DEFAULT_PATH_TAGS = {
+        "/api/v1/flowers": [FLOWERS_TAG],
+        "/api/v1/reviews": ["reviews"],
+        "/api/v1/seo": [FLOWERS_TAG, "seo"],
+    }
+    # Заголовки, которые не сохраняем (пересчитываются или приватны)
+    SKIP_HEADERS = {b"content-length", b"set-cookie", b"etag", b"connection", b"transfer-encoding", b"date"}
+    MUTATING_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+    # GET-пути, которые не кэшируем (просмотры карточки считает ViewCountMiddleware снаружи)
+    DEFAULT_EXCLUDE_PATTERNS: List[str] = []
+    # Больше этого размера gzip выполняется в потоке, чтобы не блокировать loop
+    INLINE_GZIP_LIMIT = 64 * 1024
     
-    def __init__(self, app, cache_ttl: int = 300):
+    def __init__(
+        self,
+        app,
+        cache_ttl: int = 300,
+        path_tags: Optional[Dict[str, List[str]]] = None,
+        exclude_patterns: Optional[List[str]] = None,
+        max_body_size: int = 1024 * 1024,
+        admission: Optional[Callable[[dict], Awaitable[Any]]] = None
+    ):
         self.app = app
         self.cache_ttl = cache_ttl
-        self.cacheable_paths = [
-            "/api/v1/flowers",
-            "/api/v1/reviews",
-            "/api/v1/seo"
-        ]
+        self.path_tags = path_tags or self.DEFAULT_PATH_TAGS
+        self.cacheable_paths = list(self.path_tags)
+        patterns = self.DEFAULT_EXCLUDE_PATTERNS if exclude_patterns is None else exclude_patterns
+        self.exclude = [re.compile(pattern) for pattern in patterns]
+        self.max_body_size = max_body_size
+        self.admission = admission
+    
+    def _match(self, path: str) -> Optional[str]:
+        for prefix in self.cacheable_paths:
+            if path.startswith(prefix):
+                return prefix
+        return None
+    
+    @staticmethod
+    def _cache_control(value: Optional[bytes]) -> Dict[str, Optional[str]]:
+        """Разбирает Cache-Control в {директива: значение}"""
+        directives = {}
+        if not value:
+            return directives
+        for part in value.decode("latin-1").lower().split(","):
+            name, _, arg = part.strip().partition("=")
+            if name:
+                directives[name] = arg.strip('"') or None
+        return directives
+    
+    @staticmethod
+    def _etag_matches(if_none_match: Optional[bytes], etag: str) -> bool:
+        if not if_none_match:
+            return False
+        candidates = [c.strip() for c in if_none_match.decode("latin-1").split(",")]
+        return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+    
+    @staticmethod
+    def _make_etag(body: bytes) -> str:
+        return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+    
+    def _cache_key(self, scope) -> str:
+        query = scope.get("query_string", b"").decode("latin-1")
+        normalized = "&".join(sorted(query.split("&"))) if query else ""
+        digest = hashlib.md5(f"{scope['method']} {scope['path']}?{normalized}".encode()).hexdigest()
+        return f"http_cache:{digest}"
     
     async def __call__(self, scope, receive, send):
         if scope["type"] != "http":
@@ -330,29 +804,211 @@ class CacheMiddleware:
             return
         
         method = scope["method"]
-        path = scope["path"]
+        prefix = self._match(scope["path"])
+        if prefix is None:
+            await self.app(scope, receive, send)
+            return
+        
+        tags = self.path_tags[prefix]
+        if method in self.MUTATING_METHODS:
+            await self._call_and_invalidate(scope, receive, send, tags)
+            return
+        
+        client = cache_manager.binary_client
+        headers = dict(scope.get("headers") or [])
+        request_cc = self._cache_control(headers.get(b"cache-control"))
+        if (
+            method not in ("GET", "HEAD")
+            or client is None
+            or b"authorization" in headers
+            or "no-store" in request_cc
+            or any(pattern.match(scope["path"]) for pattern in self.exclude)
+        ):
+            await self.app(scope, receive, send)
+            return
+        
+        cache_key = self._cache_key(scope)
+        tag_keys = [cache_manager._tag_key(tag) for tag in tags]
+        try:
+            async with client.pipeline(transaction=False) as pipe:
+                pipe.hgetall(cache_key)
+                pipe.mget(tag_keys)
+                entry, raw_versions = await pipe.execute()
+        except Exception as e:
+            logger.error(f"HTTP cache get error: {e}")
+            await self.app(scope, receive, send)
+            return
+        versions = [int(v or 0) for v in raw_versions]
+        
+        revalidate = "no-cache" in request_cc or request_cc.get("max-age") == "0"
+        if entry and not revalidate and json.loads(entry[b"v"]) == versions:
+            if self.admission is not None:
+                rejection = await self.admission(scope)
+                if rejection is not None:
+                    await rejection(scope, receive, send)
+                    return
+            await self._send_cached(entry, headers, method, send)
+            return
+        
+        await self._call_and_store(scope, receive, send, headers, cache_key, versions)
+    
+    async def _send_cached(self, entry: Dict[bytes, bytes], request_headers, method: str, send):
+        """Отдает ответ из кэша (или 304) без вызова роута"""
+        etag = entry[b"e"].decode()
+        stored_headers = [
+            [name.encode("latin-1"), value.encode("latin-1")]
+            for name, value in json.loads(entry[b"h"])
+        ]
+        common = stored_headers + [[b"etag", etag.encode()], [b"x-cache", b"HIT"]]
         
-        # Кэшируем только GET запросы для определенных путей
-        if method == "GET" and any(path.startswith(p) for p in self.cacheable_paths):
-            # Генерируем ключ кэша на основе пути и query параметров
-            query_string = scope.get("query_string", b"").decode()
-            cache_key = f"http_cache:{path}:{query_string}"
+        if self._etag_matches(request_headers.get(b"if-none-match"), etag):
+            not_modified = [h for h in common if h[0] != b"content-type"]
+            await send({"type": "http.response.start", "status": 304, "headers": not_modified})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        
+        compressed = entry[b"b"]
+        accepts_gzip = b"gzip" in request_headers.get(b"accept-encoding", b"")
+        already_encoded = any(h[0] == b"content-encoding" for h in stored_headers)
+        if accepts_gzip and not already_encoded:
+            body = compressed
+            common += [[b"content-encoding", b"gzip"], [b"vary", b"Accept-Encoding"]]
+        elif len(compressed) > self.INLINE_GZIP_LIMIT:
+            body = await asyncio.to_thread(gzip.decompress, compressed)
+        else:
+            body = gzip.decompress(compressed)
+        
+        await send({
+            "type": "http.response.start",
+            "status": int(entry[b"s"]),
+            "headers": common + [[b"content-length", str(len(body)).encode()]]
+        })
+        await send({"type": "http.response.body", "body": b"" if method == "HEAD" else body})
+    
+    async def _call_and_store(self, scope, receive, send, request_headers, cache_key: str, versions: List[int]):
+        """
+        Вызывает роут, транслируя ответ клиенту, и сохраняет его в кэш
+        Ответ из одного чанка отдается с ETag (и может стать 304);
+        многочанковый ответ стримится сразу, чанки копятся для кэша.
+        """
+        start_message = None
+        start_sent = False
+        storable = True
+        chunks: List[bytes] = []
+        size = 0
+        ttl = self.cache_ttl
+        
+        async def send_wrapper(message):
+            nonlocal start_message, start_sent, storable, size, ttl
             
-            # Пытаемся получить из кэша
-            cached_response = await cache_manager.get(cache_key)
-            if cached_response:
-                # Возвращаем кэшированный ответ
-                response_data = cached_response
-                await send({
-                    "type": "http.response.start",
-                    "status": response_data["status"],
-                    "headers": response_data["headers"]
-                })
-                await send({
-                    "type": "http.response.body",
-                    "body": response_data["body"].encode()
-                })
+            if message["type"] == "http.response.start":
+                start_message = message
+                response_headers = message.get("headers") or []
+                response_cc = self._cache_control(
+                    next((v for k, v in response_headers if k.lower() == b"cache-control"), None)
+                )
+                if (
+                    message["status"] != 200
+                    or any(k.lower() == b"set-cookie" for k, _ in response_headers)
+                    or "no-store" in response_cc
+                    or "private" in response_cc
+                ):
+                    storable = False
+                max_age = response_cc.get("s-maxage") or response_cc.get("max-age")
+                if max_age and max_age.isdigit():
+                    ttl = min(ttl, int(max_age))
+                    if ttl <= 0:
+                        storable = False
+                return
+            
+            if message["type"] != "http.response.body":
+                await send(message)
                 return
+            
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if storable:
+                size += len(body)
+                if size > self.max_body_size:
+                    storable = False
+                    chunks.clear()
+                else:
+                    chunks.append(body)
+            
+            if not start_sent:
+                start_sent = True
+                if not more_body and storable:
+                    # Весь ответ в одном чанке: можем отдать ETag и 304 сразу
+                    etag = self._make_etag(body)
+                    if self._etag_matches(request_headers.get(b"if-none-match"), etag):
+                        passthrough = [
+                            h for h in start_message.get("headers", [])
+                            if h[0].lower() not in (b"content-length", b"content-type")
+                        ]
+                        await send({
+                            "type": "http.response.start",
+                            "status": 304,
+                            "headers": passthrough + [[b"etag", etag.encode()], [b"x-cache", b"MISS"]]
+                        })
+                        await send({"type": "http.response.body", "body": b""})
+                        await self._store(cache_key, start_message, chunks, versions, ttl)
+                        return
+                    start_message = {
+                        **start_message,
+                        "headers": list(start_message.get("headers", []))
+                        + [[b"etag", etag.encode()], [b"x-cache", b"MISS"]]
+                    }
+                await send(start_message)
+            
+            await send(message)
+            
+            if not more_body and storable:
+                await self._store(cache_key, start_message, chunks, versions, ttl)
+        
+        await self.app(scope, receive, send_wrapper)
+    
+    async def _store(self, cache_key: str, start_message, chunks: List[bytes], versions: List[int], ttl: int):
+        """Сохраняет ответ: gzip тела + заголовки + версии тегов"""
+        client = cache_manager.binary_client
+        if client is None:
+            return
+        body = b"".join(chunks)
+        headers = [
+            [name.decode("latin-1"), value.decode("latin-1")]
+            for name, value in start_message.get("headers", [])
+            if name.lower() not in self.SKIP_HEADERS and name.lower() != b"x-cache"
+        ]
+        try:
+            if len(body) > self.INLINE_GZIP_LIMIT:
+                compressed = await asyncio.to_thread(gzip.compress, body, 6)
+            else:
+                compressed = gzip.compress(body, 6)
+            async with client.pipeline(transaction=False) as pipe:
+                pipe.hset(cache_key, mapping={
+                    "s": start_message["status"],
+                    "h": json.dumps(headers),
+                    "b": compressed,
+                    "e": self._make_etag(body),
+                    "v": json.dumps(versions),
+                })
+                pipe.expire(cache_key, ttl)
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"HTTP cache set error: {e}")
+    
+    async def _call_and_invalidate(self, scope, receive, send, tags: List[str]):
+        """Мутация на кэшируемом префиксе: после 2xx инвалидируем его теги"""
+        status_code = 500
         
-        # Если не в кэше, выполняем запрос и кэшируем результат
-        await self.app(scope, receive, send) 
\ No newline at end of file
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if 200 <= status_code < 300:
+                namespace = "flowers" if FLOWERS_TAG in tags else None
+                await cache_manager.invalidate_tags(*tags, namespace=namespace)
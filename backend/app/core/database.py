@@ -1,20 +1,98 @@
-from sqlalchemy import create_engine
+import os
+import time
+from sqlalchemy import create_engine, exc
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from prometheus_client import Counter, Gauge, Histogram
 from app.core.config import settings
 
+# Connection pool metrics
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    'db_pool_checkout_wait_seconds',
+    'Time spent waiting for a pooled DB connection',
+    ['engine'],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+DB_POOL_CHECKOUT_TIMEOUTS = Counter('db_pool_checkout_timeouts_total', 'Pool checkouts that hit pool_timeout', ['engine'])
+DB_POOL_SIZE = Gauge('db_pool_size', 'Configured pool size', ['engine'], multiprocess_mode='livesum')
+DB_POOL_CHECKED_OUT = Gauge('db_pool_checked_out', 'Connections currently checked out', ['engine'], multiprocess_mode='livesum')
+DB_POOL_OVERFLOW = Gauge('db_pool_overflow', 'Overflow connections currently open', ['engine'], multiprocess_mode='livesum')
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that reports checkout wait time and utilization to Prometheus"""
+
+    metrics_label = "sync"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            DB_POOL_CHECKOUT_TIMEOUTS.labels(self.metrics_label).inc()
+            raise
+        finally:
+            DB_POOL_CHECKOUT_WAIT.labels(self.metrics_label).observe(time.perf_counter() - start)
+            self._report()
+
+    def _do_return_conn(self, record):
+        super()._do_return_conn(record)
+        self._report()
+
+    def _report(self):
+        DB_POOL_CHECKED_OUT.labels(self.metrics_label).set(self.checkedout())
+        DB_POOL_OVERFLOW.labels(self.metrics_label).set(max(self.overflow(), 0))
+
+
+class InstrumentedAsyncQueuePool(InstrumentedQueuePool, AsyncAdaptedQueuePool):
+    """Same instrumentation for the asyncpg engine (asyncio-aware queue)"""
+
+    metrics_label = "async"
+
+
 # Create database engine
+pool_options = settings.db_pool_options
 engine = create_engine(
     settings.DATABASE_URL,
-    poolclass=StaticPool,
+    poolclass=InstrumentedQueuePool,
     pool_pre_ping=True,
-    pool_recycle=300,
-    echo=settings.DEBUG
+    echo=settings.DEBUG,
+    **pool_options
 )
+DB_POOL_SIZE.labels("sync").set(pool_options["pool_size"])
 
-# Create session factory
+# Async engine (asyncpg) for endpoints that must not hold a threadpool worker
+# for the whole DB round-trip
+async_engine = create_async_engine(
+    settings.async_database_url,
+    poolclass=InstrumentedAsyncQueuePool,
+    pool_pre_ping=True,
+    echo=settings.DEBUG,
+    **pool_options
+)
+DB_POOL_SIZE.labels("async").set(pool_options["pool_size"])
+
+
+def _dispose_pools_after_fork():
+    engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
+
+
+# Each worker process gets its own pools: drop connections inherited from the parent
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_dispose_pools_after_fork)
+
+# Create session factories
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# expire_on_commit=False: attributes stay readable after commit without implicit IO
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
 
 # Create base class for models
 Base = declarative_base()
@@ -29,6 +107,21 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    """Dependency to get async database session"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 def init_db():
     """Initialize database tables"""
-    Base.metadata.create_all(bind=engine) 
\ No newline at end of file
+    from app.core.search import (
+        create_search_extensions,
+        ensure_keyset_indexes,
+        ensure_search_schema,
+    )
+
+    create_search_extensions(engine)
+    Base.metadata.create_all(bind=engine)
+    ensure_search_schema(engine)
+    ensure_keyset_indexes(engine)
@@ -0,0 +1,245 @@
+"""
+🧊 Local (L1) Cache
+In-process LRU кэш с TTL перед Redis (L2) + инвалидация между воркерами через pub/sub
+"""
+
+import json
+import time
+import uuid
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.redis import redis_manager
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+# Идентификатор процесса (pid может совпадать в разных контейнерах)
+WORKER_ID = uuid.uuid4().hex
+
+_MISSING = object()
+
+
+class LocalCache:
+    """
+    Ограниченный по размеру LRU с TTL
+    
+    Хранит уже десериализованные объекты - вызывающий код
+    должен считать их read-only. Потокобезопасен: sync-эндпоинты
+    работают в threadpool.
+    """
+    
+    def __init__(self, namespace: str, maxsize: int = 256, ttl: float = 30):
+        self.namespace = namespace
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        """Возвращает значение или default (просроченные записи удаляются)"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Сохраняет значение; TTL не больше TTL пространства имен"""
+        ttl = min(ttl, self.ttl) if ttl else self.ttl
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+    
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+_caches: Dict[str, LocalCache] = {}
+_caches_lock = threading.Lock()
+
+# Обработчики инвалидаций для in-process структур, которые не являются LocalCache
+_listeners: Dict[str, List[Callable[[Optional[str]], None]]] = {}
+
+
+def get_local_cache(namespace: str) -> Optional[LocalCache]:
+    """
+    Возвращает L1 кэш для пространства имен
+    None если L1 выключен или namespace не описан в LOCAL_CACHE_NAMESPACES
+    """
+    if not settings.LOCAL_CACHE_ENABLED:
+        return None
+    cache = _caches.get(namespace)
+    if cache is not None:
+        return cache
+    config = settings.LOCAL_CACHE_NAMESPACES.get(namespace)
+    if config is None:
+        return None
+    with _caches_lock:
+        cache = _caches.get(namespace)
+        if cache is None:
+            cache = LocalCache(namespace, **config)
+            _caches[namespace] = cache
+    return cache
+
+
+def get_local_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Счетчики hit/miss по всем пространствам имен этого воркера"""
+    return {namespace: cache.stats() for namespace, cache in _caches.items()}
+
+
+def add_invalidation_listener(namespace: str, callback: Callable[[Optional[str]], None]) -> None:
+    """
+    Подписывает callback(key) на инвалидации namespace (локальные и от других воркеров)
+    Вызывается в event loop, поэтому должен быть быстрым и не блокирующим
+    """
+    _listeners.setdefault(namespace, []).append(callback)
+
+
+def invalidate_local(namespace: str, key: Optional[str] = None) -> None:
+    """Инвалидирует L1 только в текущем процессе (key=None - весь namespace)"""
+    for callback in _listeners.get(namespace, ()):
+        try:
+            callback(key)
+        except Exception as e:
+            logger.warning(f"Invalidation listener error for {namespace}: {e}")
+    cache = _caches.get(namespace)
+    if cache is None:
+        return
+    if key is None:
+        cache.clear()
+    else:
+        cache.delete(key)
+
+
+def encode_invalidation(namespace: str, key: Optional[str] = None) -> str:
+    """Сообщение для канала инвалидации"""
+    return json.dumps({"ns": namespace, "key": key, "origin": WORKER_ID})
+
+
+class CacheInvalidationBus:
+    """
+    Рассылка инвалидаций L1 между uvicorn воркерами через Redis pub/sub
+    
+    Если подписка временно недоступна, устаревание ограничено
+    TTL пространства имен.
+    """
+    
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._connected = False
+    
+    @property
+    def connected(self) -> bool:
+        """Подписка активна: изменения других воркеров доходят сразу"""
+        return self._connected
+    
+    async def publish(self, namespace: str, key: Optional[str] = None) -> None:
+        """Инвалидирует локально и оповещает остальные воркеры"""
+        invalidate_local(namespace, key)
+        client = redis_manager.redis_client
+        if client is None:
+            return
+        try:
+            await client.publish(INVALIDATION_CHANNEL, encode_invalidation(namespace, key))
+        except Exception as e:
+            logger.warning(f"Cache invalidation publish error: {e}")
+    
+    async def start(self) -> None:
+        """
+        Запускает фоновую подписку на канал инвалидации - и при выключенном
+        L1, если есть слушатели (отзывы токенов, сезонный индекс)
+        """
+        if self._task is not None or not (settings.LOCAL_CACHE_ENABLED or _listeners):
+            return
+        self._task = asyncio.create_task(self._listen())
+    
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def _listen(self) -> None:
+        while True:
+            client = redis_manager.redis_client
+            if client is None:
+                await asyncio.sleep(1)
+                continue
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                self._connected = True
+                # После (пере)подключения могли пропустить сообщения
+                for cache in list(_caches.values()):
+                    cache.clear()
+                for namespace in list(_listeners):
+                    invalidate_local(namespace)
+                async for message in pubsub.listen():
+                    self._handle(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Cache invalidation listener error: {e}")
+                await asyncio.sleep(1)
+            finally:
+                self._connected = False
+                try:
+                    await pubsub.close()
+                except Exception:
+                    pass
+    
+    @staticmethod
+    def _handle(message: Dict[str, Any]) -> None:
+        if message.get("type") != "message":
+            return
+        try:
+            payload = json.loads(message["data"])
+        except (TypeError, ValueError):
+            return
+        if payload.get("origin") == WORKER_ID:
+            return  # Уже применено в publish()
+        invalidate_local(payload.get("ns"), payload.get("key"))
+
+
+invalidation_bus = CacheInvalidationBus()
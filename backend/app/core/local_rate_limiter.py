@@ -0,0 +1,190 @@
+"""
+🧱 Local Rate Limiting Tier
+Пре-допуск в памяти воркера перед Redis-лимитером (app.core.rate_limiter):
+
+- count-min sketch со скользящим окном - сколько запросов клиента этот
+  воркер уже отправил в Redis; память фиксирована при любом числе IP
+- список заблокированных - клиенты, которым Redis отказал, до retry_after
+
+Очевидно превысивший лимит клиент получает 429 без обращения к Redis.
+Sketch только завышает оценку (коллизии), поэтому локальный tier не строже
+общего лимита: по sketch отказ - лишь при оценке >= limit * factor (factor > 1)
+и только для лимитов от min_limit; малые лимиты (логин 5/мин) ошибка
+коллизий перекрыла бы - для них действуют только блокировки от Redis.
+Раз в RATE_LIMIT_LOCAL_SYNC_INTERVAL воркер одним pipeline отправляет
+свои новые блокировки в общий ZSET и забирает блокировки остальных
+воркеров - нагрузка на Redis при флуде не растет вместе с флудом
+"""
+
+import asyncio
+import logging
+import random
+import time
+from array import array
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+from app.core.redis import redis_manager
+
+logger = logging.getLogger(__name__)
+
+# Общий для воркеров ZSET: ключ лимита клиента -> unix-время окончания блокировки
+BLOCKED_KEY = "rate_limit:blocked"
+
+
+def _zeros(size: int) -> array:
+    return array("L", [0]) * size
+
+
+class WindowedCountMinSketch:
+    """
+    Count-min sketch со скользящим окном из двух интервалов: оценка =
+    текущий интервал + предыдущий с весом непрошедшей части окна.
+    Оценка не бывает меньше реальной (только коллизии вверх)
+    """
+    
+    def __init__(self, window: float, width: int = 4096, depth: int = 4):
+        self.window = window
+        self.width = width
+        self.depth = depth
+        self._seeds = [random.getrandbits(32) for _ in range(depth)]
+        self._current = _zeros(width * depth)
+        self._previous = _zeros(width * depth)
+        self._epoch = 0
+    
+    def _rotate(self, now: float) -> None:
+        epoch = int(now // self.window)
+        if epoch == self._epoch:
+            return
+        size = self.width * self.depth
+        self._previous = self._current if epoch == self._epoch + 1 else _zeros(size)
+        self._current = _zeros(size)
+        self._epoch = epoch
+    
+    def _cells(self, key: str) -> List[int]:
+        return [row * self.width + hash((seed, key)) % self.width for row, seed in enumerate(self._seeds)]
+    
+    def estimate(self, key: str, now: float) -> float:
+        self._rotate(now)
+        cells = self._cells(key)
+        current = min(self._current[cell] for cell in cells)
+        previous = min(self._previous[cell] for cell in cells)
+        elapsed = (now % self.window) / self.window
+        return current + previous * (1 - elapsed)
+    
+    def add(self, key: str, now: float) -> None:
+        self._rotate(now)
+        for cell in self._cells(key):
+            self._current[cell] += 1
+
+
+class LocalAdmission:
+    """
+    Локальный tier лимитера (один на воркер)
+    
+    Работает в event loop без блокировок: rejected()/record() вызываются
+    синхронно до первого await, поэтому пачка одновременных запросов одного клиента
+    отсекается на лимите, даже пока ответы Redis еще не пришли
+    """
+    
+    def __init__(
+        self,
+        sync_interval: float = 1.0,
+        factor: float = 2.0,
+        min_limit: int = 50,
+        sketch_width: int = 4096,
+        max_blocked: int = 100_000
+    ):
+        if factor <= 1:
+            raise ValueError("Local rate limit factor must be > 1: count-min sketch only overestimates")
+        self.sync_interval = sync_interval
+        self.factor = factor
+        self.min_limit = min_limit
+        self.sketch_width = sketch_width
+        self.max_blocked = max_blocked
+        self._sketches: Dict[int, WindowedCountMinSketch] = {}
+        self._blocked: Dict[str, float] = {}
+        self._pending: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+    
+    def _sketch(self, window: int) -> WindowedCountMinSketch:
+        sketch = self._sketches.get(window)
+        if sketch is None:
+            sketch = self._sketches[window] = WindowedCountMinSketch(window, width=self.sketch_width)
+        return sketch
+    
+    def rejected(self, key: str, limit: int, window: int, now: float) -> Optional[float]:
+        """Секунды до повтора, если клиента можно отклонить без Redis, иначе None"""
+        blocked_until = self._blocked.get(key)
+        if blocked_until is not None:
+            if blocked_until > now:
+                return blocked_until - now
+            del self._blocked[key]
+        
+        if limit < self.min_limit:
+            return None
+        if self._sketch(window).estimate(key, now) >= limit * self.factor:
+            # Воркер уже отправил в Redis лимит запросов за окно: ждать до
+            # смены интервала sketch, после нее вес старых запросов убывает
+            return window - now % window
+        return None
+    
+    def record(self, key: str, limit: int, window: int, now: float) -> None:
+        """Запрос клиента уходит в Redis"""
+        if limit >= self.min_limit:
+            self._sketch(window).add(key, now)
+    
+    def block(self, key: str, until: float) -> None:
+        """Redis отказал: блокируем локально и рассылаем остальным воркерам при синхронизации"""
+        if len(self._blocked) >= self.max_blocked:
+            return
+        self._blocked[key] = until
+        self._pending[key] = until
+    
+    async def sync(self) -> None:
+        """Новые блокировки -> общий ZSET, блокировки всех воркеров <- ZSET"""
+        client = redis_manager.redis_client
+        if client is None:
+            return
+        pending, self._pending = self._pending, {}
+        now = time.time()
+        try:
+            pipe = client.pipeline(transaction=False)
+            if pending:
+                pipe.zadd(BLOCKED_KEY, pending)
+            pipe.zremrangebyscore(BLOCKED_KEY, "-inf", now)
+            pipe.zrangebyscore(BLOCKED_KEY, now, "+inf", start=0, num=self.max_blocked, withscores=True)
+            results = await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Rate limit sync error: {e}")
+            return
+        
+        blocked = {key: until for key, until in self._blocked.items() if until > now}
+        blocked.update(results[-1])
+        self._blocked = blocked
+    
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            await self.sync()
+
+
+local_admission = LocalAdmission(
+    sync_interval=settings.RATE_LIMIT_LOCAL_SYNC_INTERVAL,
+    factor=settings.RATE_LIMIT_LOCAL_FACTOR,
+    min_limit=settings.RATE_LIMIT_LOCAL_MIN_LIMIT,
+    sketch_width=settings.RATE_LIMIT_SKETCH_WIDTH
+)
@@ -0,0 +1,296 @@
+"""
+📈 Request Metrics
+Метрики HTTP-запросов без сетевых вызовов на пути запроса:
+
+- MetricsMiddleware пишет только в память воркера (счетчики и
+  гистограмма задержек с фиксированными логарифмическими бакетами,
+  как в HDR Histogram) и в Prometheus
+- метки Prometheus ограничены: шаблон маршрута (/api/v1/orders/{order_id}),
+  класс статуса (2xx..5xx) и известный HTTP-метод - число рядов не растет
+  вместе с числом id в URL
+- при PROMETHEUS_MULTIPROC_DIR (gunicorn/uvicorn с несколькими воркерами)
+  /metrics отдает сумму по всем процессам (metrics_payload)
+- раз в METRICS_FLUSH_INTERVAL накопленное уходит в Redis одним pipeline:
+  общие счетчики и поминутные гистограммы всех воркеров
+- MetricsCollector читает p50/p95/p99 из суммы поминутных гистограмм
+"""
+
+import asyncio
+import logging
+import math
+import os
+import time
+from typing import Dict, List, Optional
+
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+    multiprocess,
+)
+from starlette.routing import Match
+
+from app.core.config import settings
+from app.core.redis import redis_manager
+from app.core.sql_instrumentation import UNMATCHED_ROUTE, route_template
+
+logger = logging.getLogger(__name__)
+
+# Prometheus metrics
+REQUEST_COUNT = Counter('http_requests_total', 'Total HTTP requests', ['method', 'route', 'status'])
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds',
+    'HTTP request latency',
+    ['method', 'route'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+
+# Прочие методы (в т.ч. мусорные от сканеров) - одна метка
+KNOWN_METHODS = frozenset({"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"})
+OTHER_METHOD = "OTHER"
+
+REQUESTS_TOTAL_KEY = "metrics:requests_total"
+REQUESTS_ERRORS_KEY = "metrics:requests_errors"
+RPM_KEY = "metrics:rpm:{minute}"
+LATENCY_KEY = "metrics:latency:{minute}"
+
+# Бакеты задержки: от 0.05 мс, каждый следующий на 5% шире - ~300 бакетов до 2 минут,
+# относительная ошибка перцентиля не больше 2.5%
+LATENCY_MIN_MS = 0.05
+LATENCY_GROWTH = 1.05
+LATENCY_BUCKETS = int(math.log(120_000 / LATENCY_MIN_MS) / math.log(LATENCY_GROWTH)) + 1
+_INV_LOG_GROWTH = 1 / math.log(LATENCY_GROWTH)
+
+
+def status_class(status_code: int) -> str:
+    return f"{status_code // 100}xx"
+
+
+def route_label(scope) -> str:
+    """
+    Шаблон маршрута запроса. Если роутер не вызывался (ответ из
+    CacheMiddleware), маршрут ищется по таблице приложения так же, как его
+    нашел бы роутер; 404 - UNMATCHED_ROUTE
+    """
+    template = route_template(scope)
+    if template != UNMATCHED_ROUTE:
+        return template
+    router = getattr(scope.get("app"), "router", None)
+    for route in getattr(router, "routes", ()):
+        match, child_scope = route.matches(scope)
+        if match == Match.FULL:
+            return route_template({**scope, **child_scope})
+    return UNMATCHED_ROUTE
+
+
+def metrics_payload() -> bytes:
+    """
+    Текст для /metrics: в multiprocess-режиме - сумма файлов всех воркеров
+    из PROMETHEUS_MULTIPROC_DIR, иначе - реестр текущего процесса
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+def bucket_index(ms: float) -> int:
+    if ms <= LATENCY_MIN_MS:
+        return 0
+    return min(LATENCY_BUCKETS - 1, int(math.log(ms / LATENCY_MIN_MS) * _INV_LOG_GROWTH))
+
+
+def bucket_value(index: int) -> float:
+    """Середина бакета (геометрическая), мс"""
+    return LATENCY_MIN_MS * LATENCY_GROWTH ** (index + 0.5)
+
+
+class LatencyHistogram:
+    """Гистограмма задержек с фиксированными бакетами (сливается сложением)"""
+    
+    __slots__ = ("counts", "count", "total_ms")
+    
+    def __init__(self):
+        self.counts: List[int] = [0] * LATENCY_BUCKETS
+        self.count = 0
+        self.total_ms = 0.0
+    
+    def record(self, ms: float) -> None:
+        self.counts[bucket_index(ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+    
+    def add_bucket(self, index: int, count: int) -> None:
+        self.counts[index] += count
+        self.count += count
+    
+    def merge(self, other: "LatencyHistogram") -> None:
+        for index, count in enumerate(other.counts):
+            if count:
+                self.counts[index] += count
+        self.count += other.count
+        self.total_ms += other.total_ms
+    
+    def percentile(self, pct: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(pct / 100 * self.count))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return bucket_value(index)
+        return bucket_value(LATENCY_BUCKETS - 1)
+    
+    def mean(self) -> float:
+        return self.total_ms / self.count if self.count else 0.0
+
+
+class RequestMetrics:
+    """
+    Агрегатор воркера: record() - только арифметика в event loop (без
+    блокировок и await), flush() - один pipeline в Redis
+    """
+    
+    def __init__(self, flush_interval: float = 1.0, retention_minutes: int = 10):
+        self.flush_interval = flush_interval
+        self.retention_minutes = retention_minutes
+        self._requests = 0
+        self._errors = 0
+        self._latency = LatencyHistogram()
+        self._task: Optional[asyncio.Task] = None
+    
+    def record(self, method: str, route: str, status_code: int, duration: float) -> None:
+        self._requests += 1
+        if status_code >= 400:
+            self._errors += 1
+        self._latency.record(duration * 1000)
+        
+        if method not in KNOWN_METHODS:
+            method = OTHER_METHOD
+        REQUEST_COUNT.labels(method=method, route=route, status=status_class(status_code)).inc()
+        REQUEST_LATENCY.labels(method=method, route=route).observe(duration)
+    
+    async def flush(self) -> None:
+        if not self._requests:
+            return
+        client = redis_manager.redis_client
+        if client is None:
+            return
+        
+        requests, errors, latency = self._requests, self._errors, self._latency
+        self._requests, self._errors, self._latency = 0, 0, LatencyHistogram()
+        
+        minute = int(time.time() // 60)
+        rpm_key = RPM_KEY.format(minute=minute)
+        latency_key = LATENCY_KEY.format(minute=minute)
+        ttl = self.retention_minutes * 60
+        try:
+            pipe = client.pipeline(transaction=False)
+            pipe.incrby(REQUESTS_TOTAL_KEY, requests)
+            if errors:
+                pipe.incrby(REQUESTS_ERRORS_KEY, errors)
+            pipe.incrby(rpm_key, requests)
+            pipe.expire(rpm_key, ttl)
+            for index, count in enumerate(latency.counts):
+                if count:
+                    pipe.hincrby(latency_key, index, count)
+            pipe.hincrbyfloat(latency_key, "sum", latency.total_ms)
+            pipe.expire(latency_key, ttl)
+            await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Metrics flush error: {e}")
+            # Не теряем накопленное - уйдет со следующим flush
+            self._requests += requests
+            self._errors += errors
+            self._latency.merge(latency)
+    
+    async def read(self, minutes: int = 5) -> Dict[str, float]:
+        """Сводка всех воркеров: перцентили за последние minutes минут, RPM за прошлую минуту"""
+        client = redis_manager.redis_client
+        if client is None:
+            return {}
+        
+        minute = int(time.time() // 60)
+        pipe = client.pipeline(transaction=False)
+        pipe.get(REQUESTS_TOTAL_KEY)
+        pipe.get(REQUESTS_ERRORS_KEY)
+        pipe.get(RPM_KEY.format(minute=minute - 1))
+        for offset in range(minutes):
+            pipe.hgetall(LATENCY_KEY.format(minute=minute - offset))
+        total, errors, rpm, *minute_histograms = await pipe.execute()
+        
+        latency = LatencyHistogram()
+        for buckets in minute_histograms:
+            for field, value in buckets.items():
+                if field == "sum":
+                    latency.total_ms += float(value)
+                else:
+                    latency.add_bucket(int(field), int(value))
+        
+        total = int(total or 0)
+        return {
+            "response_time_avg": latency.mean(),
+            "response_time_p50": latency.percentile(50),
+            "response_time_p95": latency.percentile(95),
+            "response_time_p99": latency.percentile(99),
+            "error_rate": int(errors or 0) / total * 100 if total else 0.0,
+            "requests_per_minute": int(rpm or 0),
+        }
+    
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+    
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+
+request_metrics = RequestMetrics(flush_interval=settings.METRICS_FLUSH_INTERVAL)
+
+
+class MetricsMiddleware:
+    """Middleware для сбора метрик HTTP запросов (без I/O на пути запроса)"""
+    
+    def __init__(self, app, metrics: RequestMetrics = request_metrics):
+        self.app = app
+        self.metrics = metrics
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        start_time = time.perf_counter()
+        status_code = 500
+        
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.metrics.record(
+                scope["method"],
+                route_label(scope),
+                status_code,
+                time.perf_counter() - start_time
+            )
@@ -18,10 +18,13 @@ from sqlalchemy.orm import Session
 
 from app.core.config import settings
 from app.core.database import get_db
-from app.core.redis import redis_client
+from app.core.metrics import request_metrics
 
 logger = logging.getLogger(__name__)
 
+# Sync-клиент для проверок здоровья и алертов (вызовы через asyncio.to_thread)
+redis_client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+
 class AlertLevel(Enum):
     INFO = "info"
     WARNING = "warning"
@@ -37,6 +40,9 @@ class SystemMetrics:
     disk_percent: float
     active_connections: int
     response_time_avg: float
+    response_time_p50: float
+    response_time_p95: float
+    response_time_p99: float
     error_rate: float
     requests_per_minute: int
 
@@ -277,11 +283,9 @@ class MetricsCollector:
             memory = psutil.virtual_memory()
             disk = psutil.disk_usage('/')
             
-            # Метрики из Redis
+            # Метрики запросов всех воркеров (агрегатор app.core.metrics)
             active_connections = await self._get_active_connections()
-            response_time_avg = await self._get_avg_response_time()
-            error_rate = await self._get_error_rate()
-            requests_per_minute = await self._get_requests_per_minute()
+            requests = await self._get_request_metrics()
             
             return SystemMetrics(
                 timestamp=datetime.utcnow(),
@@ -289,9 +293,12 @@ class MetricsCollector:
                 memory_percent=memory.percent,
                 disk_percent=(disk.used / disk.total) * 100,
                 active_connections=active_connections,
-                response_time_avg=response_time_avg,
-                error_rate=error_rate,
-                requests_per_minute=requests_per_minute
+                response_time_avg=requests.get("response_time_avg", 0.0),
+                response_time_p50=requests.get("response_time_p50", 0.0),
+                response_time_p95=requests.get("response_time_p95", 0.0),
+                response_time_p99=requests.get("response_time_p99", 0.0),
+                error_rate=requests.get("error_rate", 0.0),
+                requests_per_minute=requests.get("requests_per_minute", 0)
             )
         except Exception as e:
             logger.error(f"Failed to collect metrics: {e}")
@@ -302,6 +309,9 @@ class MetricsCollector:
                 disk_percent=0,
                 active_connections=0,
                 response_time_avg=0,
+                response_time_p50=0,
+                response_time_p95=0,
+                response_time_p99=0,
                 error_rate=0,
                 requests_per_minute=0
             )
@@ -309,49 +319,21 @@ class MetricsCollector:
     async def _get_active_connections(self) -> int:
         """Получает количество активных подключений"""
         try:
-            # Подсчитываем активные сессии в Redis
+            # Подсчитываем активные сессии в Redis инкрементальным SCAN
             pattern = "session:*"
-            keys = await asyncio.to_thread(self.redis_client.keys, pattern)
-            return len(keys)
+            return await asyncio.to_thread(
+                lambda: sum(1 for _ in self.redis_client.scan_iter(match=pattern, count=500))
+            )
         except:
             return 0
     
-    async def _get_avg_response_time(self) -> float:
-        """Получает среднее время ответа за последние 5 минут"""
-        try:
-            key = "metrics:response_times"
-            times = await asyncio.to_thread(self.redis_client.lrange, key, 0, -1)
-            if times:
-                avg_time = sum(float(t) for t in times) / len(times)
-                return avg_time
-            return 0.0
-        except:
-            return 0.0
-    
-    async def _get_error_rate(self) -> float:
-        """Получает процент ошибок за последние 5 минут"""
+    async def _get_request_metrics(self) -> Dict[str, float]:
+        """Перцентили задержки за 5 минут, процент ошибок и запросы за прошлую минуту"""
         try:
-            total_key = "metrics:requests_total"
-            error_key = "metrics:requests_errors"
-            
-            total = await asyncio.to_thread(self.redis_client.get, total_key)
-            errors = await asyncio.to_thread(self.redis_client.get, error_key)
-            
-            if total and int(total) > 0:
-                error_rate = (int(errors or 0) / int(total)) * 100
-                return error_rate
-            return 0.0
-        except:
-            return 0.0
-    
-    async def _get_requests_per_minute(self) -> int:
-        """Получает количество запросов в минуту"""
-        try:
-            key = "metrics:requests_per_minute"
-            rpm = await asyncio.to_thread(self.redis_client.get, key)
-            return int(rpm) if rpm else 0
-        except:
-            return 0
+            return await request_metrics.read(minutes=5)
+        except Exception as e:
+            logger.error(f"Failed to read request metrics: {e}")
+            return {}
 
 class AlertManager:
     """Управление алертами"""
@@ -507,65 +489,6 @@ health_checker = HealthChecker()
 metrics_collector = MetricsCollector()
 alert_manager = AlertManager()
 
-# Middleware для сбора метрик запросов
-class MetricsMiddleware:
-    """Middleware для сбора метрик HTTP запросов"""
-    
-    def __init__(self, app):
-        self.app = app
-    
-    async def __call__(self, scope, receive, send):
-        if scope["type"] != "http":
-            await self.app(scope, receive, send)
-            return
-        
-        start_time = time.time()
-        
-        # Обертываем send для перехвата статуса ответа
-        status_code = 200
-        
-        async def send_wrapper(message):
-            nonlocal status_code
-            if message["type"] == "http.response.start":
-                status_code = message["status"]
-            await send(message)
-        
-        try:
-            await self.app(scope, receive, send_wrapper)
-        finally:
-            # Записываем метрики
-            response_time = (time.time() - start_time) * 1000
-            await self._record_metrics(response_time, status_code)
-    
-    async def _record_metrics(self, response_time: float, status_code: int):
-        """Записывает метрики запроса"""
-        try:
-            # Время ответа
-            await asyncio.to_thread(
-                redis_client.lpush,
-                "metrics:response_times",
-                response_time
-            )
-            await asyncio.to_thread(
-                redis_client.ltrim,
-                "metrics:response_times",
-                0, 999  # Храним последние 1000 значений
-            )
-            
-            # Счетчики запросов
-            await asyncio.to_thread(redis_client.incr, "metrics:requests_total")
-            
-            if status_code >= 400:
-                await asyncio.to_thread(redis_client.incr, "metrics:requests_errors")
-            
-            # Запросы в минуту (с TTL)
-            minute_key = f"metrics:rpm:{int(time.time() // 60)}"
-            await asyncio.to_thread(redis_client.incr, minute_key)
-            await asyncio.to_thread(redis_client.expire, minute_key, 300)  # 5 минут
-            
-        except Exception as e:
-            logger.error(f"Failed to record metrics: {e}")
-
 # Функции для использования в приложении
 async def get_system_health() -> Dict[str, Any]:
     """Получает состояние системы"""
@@ -0,0 +1,262 @@
+"""
+📑 Keyset Pagination
+Курсорная пагинация (seek method) вместо OFFSET + опциональные total
+(точные, кэшированные или оценочные по pg_class.reltuples)
+"""
+
+import enum
+import json
+import base64
+import hashlib
+import logging
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from fastapi import HTTPException, Response, status
+from sqlalchemy import func, select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.local_cache import get_local_cache
+
+logger = logging.getLogger(__name__)
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+TOTAL_COUNT_HEADER = "X-Total-Count"
+
+COUNTS_NAMESPACE = "counts"
+
+# -1 - таблица еще ни разу не анализировалась (PG14+), 0 - возможно пустая/не анализирована
+ESTIMATE_SQL = text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table)")
+
+
+class PaginationMode(str, enum.Enum):
+    PAGE = "page"      # page/per_page или skip/limit (OFFSET)
+    CURSOR = "cursor"  # keyset: WHERE (sort, id) > (:last_sort, :last_id)
+
+
+class CountMode(str, enum.Enum):
+    EXACT = "exact"          # COUNT(*) на каждый запрос
+    CACHED = "cached"        # COUNT(*) с кэшем в L1 воркера
+    ESTIMATED = "estimated"  # pg_class.reltuples без фильтров, иначе cached
+    NONE = "none"            # без total
+
+
+class Keyset:
+    """
+    Ключ сортировки для курсорной пагинации: колонка + id как tie-breaker
+    
+    Для быстрого seek нужен составной индекс (column, id).
+    Колонка сортировки должна быть NOT NULL.
+    """
+    
+    def __init__(self, name: str, column, id_column, descending: bool = False):
+        self.name = name
+        self.column = column
+        self.id_column = id_column
+        self.descending = descending
+    
+    @property
+    def order_by(self) -> Tuple[Any, Any]:
+        if self.descending:
+            return self.column.desc(), self.id_column.desc()
+        return self.column.asc(), self.id_column.asc()
+    
+    def apply(self, query, cursor: Optional[str], limit: int):
+        """
+        Добавляет seek-условие, сортировку и LIMIT limit + 1
+        (лишняя строка показывает, есть ли следующая страница)
+        Работает и с select(), и с legacy Query
+        """
+        if cursor:
+            value, last_id = self.decode(cursor)
+            row = tuple_(self.column, self.id_column)
+            bound = tuple_(value, last_id)
+            query = query.where(row < bound if self.descending else row > bound)
+        return query.order_by(None).order_by(*self.order_by).limit(limit + 1)
+    
+    def split(self, rows: List[Any], limit: int) -> Tuple[List[Any], Optional[str]]:
+        """Отрезает лишнюю строку и строит курсор следующей страницы"""
+        rows = list(rows)
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        last = rows[-1]
+        return rows, self.encode(getattr(last, self.column.key), getattr(last, self.id_column.key))
+    
+    def encode(self, value: Any, last_id: Any) -> str:
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        elif isinstance(value, enum.Enum):
+            value = value.value
+        payload = json.dumps({"k": self.name, "v": value, "i": last_id}, separators=(",", ":"))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+    
+    def decode(self, cursor: str) -> Tuple[Any, Any]:
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            if payload["k"] != self.name:
+                raise ValueError("cursor was issued for another sort order")
+            value = payload["v"]
+            python_type = self.column.type.python_type
+            if python_type is datetime:
+                value = datetime.fromisoformat(value)
+            elif not isinstance(value, python_type):
+                value = python_type(value)
+            return value, payload["i"]
+        except (KeyError, TypeError, ValueError, NotImplementedError) as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid cursor: {e}"
+            )
+
+
+def _statement(query):
+    """select() из legacy Query или select()"""
+    return getattr(query, "statement", query)
+
+
+def _count_statement(query):
+    stmt = _statement(query).order_by(None).limit(None).offset(None)
+    return select(func.count()).select_from(stmt.subquery())
+
+
+def _unfiltered_table(query) -> Optional[str]:
+    """Имя таблицы, если запрос без WHERE по одной таблице (тогда total = размер таблицы)"""
+    stmt = _statement(query)
+    froms = stmt.get_final_froms()
+    if stmt.whereclause is not None or len(froms) != 1:
+        return None
+    return getattr(froms[0], "name", None)
+
+
+def _count_cache_key(count_stmt) -> str:
+    compiled = count_stmt.compile()
+    params = sorted((key, repr(value)) for key, value in compiled.params.items())
+    return hashlib.sha1(f"{compiled}|{params}".encode()).hexdigest()
+
+
+def _usable_estimate(estimate: Optional[float]) -> bool:
+    return estimate is not None and estimate > 0
+
+
+def total_count(db: Session, query, mode: CountMode = CountMode.EXACT) -> Optional[int]:
+    """Total для sync сессии согласно CountMode"""
+    if mode == CountMode.NONE:
+        return None
+    if mode == CountMode.ESTIMATED:
+        table = _unfiltered_table(query)
+        if table is not None:
+            estimate = db.execute(ESTIMATE_SQL, {"table": table}).scalar()
+            if _usable_estimate(estimate):
+                return int(estimate)
+    count_stmt = _count_statement(query)
+    if mode == CountMode.EXACT:
+        return db.execute(count_stmt).scalar()
+    
+    cache = get_local_cache(COUNTS_NAMESPACE)
+    key = _count_cache_key(count_stmt)
+    cached = cache.get(key) if cache is not None else None
+    if cached is not None:
+        return cached
+    total = db.execute(count_stmt).scalar()
+    if cache is not None:
+        cache.set(key, total)
+    return total
+
+
+async def total_count_async(db: AsyncSession, query, mode: CountMode = CountMode.EXACT) -> Optional[int]:
+    """Total для AsyncSession согласно CountMode"""
+    if mode == CountMode.NONE:
+        return None
+    if mode == CountMode.ESTIMATED:
+        table = _unfiltered_table(query)
+        if table is not None:
+            estimate = await db.scalar(ESTIMATE_SQL, {"table": table})
+            if _usable_estimate(estimate):
+                return int(estimate)
+    count_stmt = _count_statement(query)
+    if mode == CountMode.EXACT:
+        return await db.scalar(count_stmt)
+    
+    cache = get_local_cache(COUNTS_NAMESPACE)
+    key = _count_cache_key(count_stmt)
+    cached = cache.get(key) if cache is not None else None
+    if cached is not None:
+        return cached
+    total = await db.scalar(count_stmt)
+    if cache is not None:
+        cache.set(key, total)
+    return total
+
+
+def _set_headers(response: Optional[Response], next_cursor: Optional[str], total: Optional[int]) -> None:
+    if response is None:
+        return
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    if total is not None:
+        response.headers[TOTAL_COUNT_HEADER] = str(total)
+
+
+def paginate(
+    db: Session,
+    query,
+    keyset: Keyset,
+    limit: int,
+    skip: int = 0,
+    cursor: Optional[str] = None,
+    mode: PaginationMode = PaginationMode.PAGE,
+    count: CountMode = CountMode.NONE,
+    response: Optional[Response] = None
+) -> List[Any]:
+    """
+    Страница legacy Query для списков с response_model=List[...]
+    Курсор следующей страницы и total отдаются заголовками X-Next-Cursor / X-Total-Count
+    """
+    total = total_count(db, query, count)
+    if cursor or mode == PaginationMode.CURSOR:
+        items, next_cursor = keyset.split(keyset.apply(query, cursor, limit).all(), limit)
+    else:
+        items = query.order_by(None).order_by(*keyset.order_by).offset(skip).limit(limit).all()
+        next_cursor = None
+    _set_headers(response, next_cursor, total)
+    return items
+
+
+def _selects_entity(stmt) -> bool:
+    descriptions = stmt.column_descriptions
+    return len(descriptions) == 1 and descriptions[0]["expr"] is descriptions[0]["entity"]
+
+
+async def _fetch_async(db: AsyncSession, stmt) -> List[Any]:
+    result = await db.execute(stmt)
+    return result.scalars().all() if _selects_entity(stmt) else result.all()
+
+
+async def paginate_async(
+    db: AsyncSession,
+    query,
+    keyset: Keyset,
+    limit: int,
+    skip: int = 0,
+    cursor: Optional[str] = None,
+    mode: PaginationMode = PaginationMode.PAGE,
+    count: CountMode = CountMode.NONE,
+    response: Optional[Response] = None
+) -> List[Any]:
+    """
+    paginate() для select() и AsyncSession
+    select(Model) отдает ORM-объекты, select(*columns) - Row проекции
+    """
+    total = await total_count_async(db, query, count)
+    if cursor or mode == PaginationMode.CURSOR:
+        rows = await _fetch_async(db, keyset.apply(query, cursor, limit))
+        items, next_cursor = keyset.split(rows, limit)
+    else:
+        stmt = query.order_by(None).order_by(*keyset.order_by).offset(skip).limit(limit)
+        items = await _fetch_async(db, stmt)
+        next_cursor = None
+    _set_headers(response, next_cursor, total)
+    return items
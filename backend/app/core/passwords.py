@@ -0,0 +1,132 @@
+"""
+🔑 Password Hashing
+bcrypt вне event loop и вне GIL воркера: ограниченный пул процессов
+с async API. Очередь ограничена - при штурме логина лишние запросы сразу
+получают 503 с Retry-After, а не копятся в памяти и таймаутах
+"""
+
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from passlib.context import CryptContext
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Хэши с меньшим числом раундов (или другой схемой) пересчитываются при входе
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.BCRYPT_ROUNDS
+)
+
+
+class PasswordHasherBusy(HTTPException):
+    """Очередь хэширования переполнена"""
+    def __init__(self, retry_after: int = 1):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Authentication service is busy. Try again later.",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+
+# Функции пула - на уровне модуля, чтобы их можно было передать в процесс
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify_and_update(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    try:
+        return pwd_context.verify_and_update(password, hashed_password)
+    except (ValueError, TypeError):
+        # Битый или пустой хэш в БД - неверный пароль, а не 500
+        return False, None
+
+
+def _warmup() -> None:
+    pass
+
+
+class PasswordHasher:
+    """
+    Async-фасад над ProcessPoolExecutor
+    
+    max_pending - запросов в работе и в очереди на процесс воркера;
+    workers=0 - без процессов, bcrypt в threadpool (разработка, отладка)
+    """
+    
+    def __init__(self, workers: int = 2, max_pending: int = 64):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+    
+    @property
+    def pending(self) -> int:
+        return self._pending
+    
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: fork процесса с потоками (Redis, пул БД) небезопасен
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+    
+    async def _run(self, fn, *args):
+        if self._pending >= self.max_pending:
+            logger.warning(f"Password hashing queue is full ({self._pending} pending), rejecting request")
+            raise PasswordHasherBusy()
+        
+        self._pending += 1
+        try:
+            if self.workers <= 0:
+                return await run_in_threadpool(fn, *args)
+            loop = asyncio.get_running_loop()
+            try:
+                return await loop.run_in_executor(self._get_executor(), fn, *args)
+            except BrokenProcessPool:
+                # Процесс пула убит (OOM и т.п.) - следующий запрос создаст новый пул
+                logger.error("Password hashing pool is broken, recreating")
+                self._executor = None
+                raise PasswordHasherBusy()
+        finally:
+            self._pending -= 1
+    
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password)
+    
+    async def verify(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """
+        (пароль верен, новый хэш или None)
+        Новый хэш - если сохраненный устарел (раунды, схема); его нужно записать в БД
+        """
+        return await self._run(_verify_and_update, password, hashed_password)
+    
+    async def start(self) -> None:
+        """Запуск процессов заранее, чтобы первый логин не ждал spawn"""
+        if self.workers <= 0:
+            return
+        executor = self._get_executor()
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(executor, _warmup) for _ in range(self.workers)))
+    
+    async def stop(self) -> None:
+        if self._executor is not None:
+            executor, self._executor = self._executor, None
+            await asyncio.get_running_loop().run_in_executor(None, executor.shutdown)
+
+
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING
+)
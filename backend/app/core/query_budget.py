@@ -0,0 +1,51 @@
+"""
+🧮 Query Budget
+Ограничение числа SQL-запросов на блок кода (для тестов и отладки N+1):
+
+    with statement_budget(3) as statements:
+        client.get("/api/v1/orders/admin/all")
+
+Превышение бюджета - StatementBudgetExceeded (AssertionError) со списком запросов
+"""
+
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Sequence
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.database import async_engine, engine
+
+
+class StatementBudgetExceeded(AssertionError):
+    """Блок выполнил больше SQL-запросов, чем разрешено"""
+    
+    def __init__(self, budget: int, statements: List[str]):
+        self.budget = budget
+        self.statements = statements
+        listing = "\n".join(f"  {index}. {statement}" for index, statement in enumerate(statements, 1))
+        super().__init__(f"{len(statements)} SQL statements executed, budget is {budget}:\n{listing}")
+
+
+@contextmanager
+def statement_budget(max_statements: int, engines: Optional[Sequence[Engine]] = None) -> Iterator[List[str]]:
+    """
+    Считает запросы всех соединений движков (по умолчанию sync и async) внутри блока
+    Счетчик общий для процесса: рассчитан на тесты, а не на боевой трафик
+    """
+    engines = engines or (engine, async_engine.sync_engine)
+    statements: List[str] = []
+    
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    
+    for target in engines:
+        event.listen(target, "before_cursor_execute", _record)
+    try:
+        yield statements
+    finally:
+        for target in engines:
+            event.remove(target, "before_cursor_execute", _record)
+    
+    if len(statements) > max_statements:
+        raise StatementBudgetExceeded(max_statements, statements)
@@ -1,38 +1,133 @@
 """
 🛡️ Rate Limiting System
 Защита API от DDoS и злоупотреблений с использованием Redis
+
+Проверка лимита - один атомарный Lua-скрипт (EVALSHA, один round-trip),
+время берется из Redis (TIME), так что часы воркеров не влияют на окно:
+
+- SLIDING_WINDOW - точный лог запросов в ZSET (память O(limit) на клиента)
+- GCRA - token bucket на одном ключе с TAT (theoretical arrival time)
 """
 
+import enum
+import math
+import secrets
 import time
 import hashlib
-from typing import Optional, Dict, Any
-from functools import wraps
-from fastapi import Request, HTTPException, status
-from fastapi.responses import JSONResponse
+from typing import Optional, Dict, Any, List, Sequence, Tuple
+from fastapi import Request, Response, HTTPException, status
+from fastapi.responses import ORJSONResponse
+from starlette.datastructures import MutableHeaders
 import redis
+from redis.exceptions import NoScriptError
 import logging
-import asyncio
-import inspect
 
 from app.core.config import settings
+from app.core.redis import redis_manager
+from app.core.auth import decode_token_cached
+from app.core.revocation import token_hash
+from app.core.local_rate_limiter import local_admission
 
 logger = logging.getLogger(__name__)
 
-# Redis connection
+# Sync-клиент - только для админских утилит (статус, сброс); проверки идут через async-пул
 redis_client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
 
 class RateLimitExceeded(HTTPException):
     """Custom exception for rate limit exceeded"""
-    def __init__(self, retry_after: int):
+    def __init__(self, retry_after: int, limit: Optional[int] = None, reset: Optional[int] = None):
+        headers = {"Retry-After": str(retry_after)}
+        if limit is not None:
+            headers["X-RateLimit-Limit"] = str(limit)
+            headers["X-RateLimit-Remaining"] = "0"
+            headers["X-RateLimit-Reset"] = str(reset if reset is not None else retry_after)
         super().__init__(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
             detail=f"Rate limit exceeded. Try again in {retry_after} seconds.",
-            headers={"Retry-After": str(retry_after)}
+            headers=headers
         )
 
+
+class RateLimitAlgorithm(str, enum.Enum):
+    SLIDING_WINDOW = "sliding_window"
+    GCRA = "gcra"
+
+
+# Оба скрипта: KEYS[1] - ключ клиента, ARGV[1] - лимит, ARGV[2] - окно (мс)
+# Ответ: {allowed, remaining, reset_ms, retry_after_ms}
+# reset_ms - через сколько квота полностью восстановится,
+# retry_after_ms - через сколько освободится место (0, если запрос пропущен)
+# replicate_commands - для TIME в скрипте на Redis < 5 (в 7+ это поведение по умолчанию)
+_LUA_NOW = """
+if redis.replicate_commands then
+    redis.replicate_commands()
+end
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+"""
+
+# ARGV[3] - уникальный member (запросы одной миллисекунды не схлопываются)
+SLIDING_WINDOW_LUA = _LUA_NOW + """
+local key = KEYS[1]
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+
+redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+local count = redis.call('ZCARD', key)
+local allowed = 0
+if count < limit then
+    redis.call('ZADD', key, now, ARGV[3])
+    redis.call('PEXPIRE', key, window)
+    count = count + 1
+    allowed = 1
+end
+
+local retry_after = 0
+if allowed == 0 then
+    local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+    retry_after = math.max(1, tonumber(oldest[2]) + window - now)
+end
+local newest = redis.call('ZRANGE', key, -1, -1, 'WITHSCORES')
+local reset = 0
+if newest[2] then
+    reset = tonumber(newest[2]) + window - now
+end
+return {allowed, limit - count, reset, retry_after}
+"""
+
+# Интервал между запросами T = window / limit, допустимый всплеск - limit запросов
+GCRA_LUA = _LUA_NOW + """
+local key = KEYS[1]
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local interval = window / limit
+
+local tat = tonumber(redis.call('GET', key))
+if not tat or tat < now then
+    tat = now
+end
+local new_tat = tat + interval
+local allow_at = new_tat - window
+
+if allow_at > now then
+    return {0, 0, math.ceil(tat - now), math.ceil(allow_at - now)}
+end
+
+redis.call('SET', key, string.format('%.3f', new_tat), 'PX', math.ceil(new_tat - now))
+local remaining = math.floor((now + window - new_tat) / interval)
+return {1, remaining, math.ceil(new_tat - now), 0}
+"""
+
+_SCRIPTS = {
+    RateLimitAlgorithm.SLIDING_WINDOW: SLIDING_WINDOW_LUA,
+    RateLimitAlgorithm.GCRA: GCRA_LUA,
+}
+_SCRIPT_SHAS = {algorithm: hashlib.sha1(script.encode()).hexdigest() for algorithm, script in _SCRIPTS.items()}
+
+
 class RateLimiter:
     """
-    Sliding Window Rate Limiter using Redis
+    Redis Rate Limiter: sliding window log или GCRA (см. RateLimitAlgorithm)
     """
     
     def __init__(
@@ -40,12 +135,18 @@ class RateLimiter:
         requests: int,
         window: int,  # seconds
         per: str = "ip",  # "ip", "user", "endpoint"
-        key_func: Optional[callable] = None
+        key_func: Optional[callable] = None,
+        algorithm: RateLimitAlgorithm = RateLimitAlgorithm.SLIDING_WINDOW
     ):
         self.requests = requests
         self.window = window
         self.per = per
         self.key_func = key_func
+        self.algorithm = algorithm
+    
+    def key(self, identifier: str) -> str:
+        """Ключ зависит от параметров лимита: разные лимиты не делят счетчик одного клиента"""
+        return f"rate_limit:{self.algorithm.value}:{self.requests}:{self.window}:{identifier}"
 
     def get_identifier(self, request: Request, user_id: Optional[int] = None) -> str:
         """Get unique identifier for rate limiting"""
@@ -73,72 +174,61 @@ class RateLimiter:
         ip = request.client.host if request.client else "unknown"
         return f"fallback:{ip}"
 
-    async def is_allowed(self, request: Request, user_id: Optional[int] = None) -> tuple[bool, Dict[str, Any]]:
-        """
-        Check if request is allowed using sliding window algorithm
-        Returns: (is_allowed, info_dict)
-        """
-        try:
-            identifier = self.get_identifier(request, user_id)
-            key = f"rate_limit:{identifier}"
-            
-            current_time = int(time.time())
-            window_start = current_time - self.window
-            
-            # Use Redis pipeline for atomic operations
-            pipe = redis_client.pipeline()
-            
-            # Remove old entries
-            pipe.zremrangebyscore(key, 0, window_start)
-            
-            # Count current requests in window
-            pipe.zcard(key)
-            
-            # Add current request
-            pipe.zadd(key, {str(current_time): current_time})
-            
-            # Set expiration
-            pipe.expire(key, self.window + 1)
-            
-            results = pipe.execute()
-            current_requests = results[1]
-            
-            # Check if limit exceeded
-            if current_requests >= self.requests:
-                # Get oldest request time to calculate retry_after
-                oldest_requests = redis_client.zrange(key, 0, 0, withscores=True)
-                if oldest_requests:
-                    oldest_time = int(oldest_requests[0][1])
-                    retry_after = max(1, oldest_time + self.window - current_time)
-                else:
-                    retry_after = self.window
-                
-                return False, {
-                    "requests_made": current_requests,
-                    "requests_limit": self.requests,
-                    "window_seconds": self.window,
-                    "retry_after": retry_after,
-                    "identifier": identifier
-                }
-            
-            return True, {
-                "requests_made": current_requests + 1,
-                "requests_limit": self.requests,
-                "window_seconds": self.window,
-                "requests_remaining": self.requests - current_requests - 1,
-                "identifier": identifier
-            }
-            
-        except Exception as e:
-            logger.error(f"Rate limiter error: {e}")
-            # Fail open - allow request if Redis is down
-            return True, {"error": "Rate limiter unavailable"}
+    def script_args(self) -> List:
+        args = [self.requests, self.window * 1000]
+        if self.algorithm == RateLimitAlgorithm.SLIDING_WINDOW:
+            args.append(secrets.token_hex(8))
+        return args
+    
+    def info(self, identifier: str, result: Sequence[int]) -> Tuple[bool, Dict[str, Any]]:
+        """Решение и остаток квоты из ответа Lua-скрипта"""
+        allowed, remaining, reset_ms, retry_after_ms = result
+        info = {
+            "requests_made": self.requests - remaining,
+            "requests_limit": self.requests,
+            "requests_remaining": remaining,
+            "window_seconds": self.window,
+            "reset_time": math.ceil(reset_ms / 1000),
+            "identifier": identifier
+        }
+        if not allowed:
+            info["retry_after"] = max(1, math.ceil(retry_after_ms / 1000))
+        return bool(allowed), info
+    
+    def local_denial(self, identifier: str, retry_after: float) -> Dict[str, Any]:
+        """info отказа локального tier (без ответа Redis)"""
+        return {
+            "requests_made": self.requests,
+            "requests_limit": self.requests,
+            "requests_remaining": 0,
+            "window_seconds": self.window,
+            "reset_time": math.ceil(retry_after),
+            "retry_after": max(1, math.ceil(retry_after)),
+            "identifier": identifier
+        }
+    
+    async def hit(self, identifier: str) -> Tuple[bool, Dict[str, Any]]:
+        """Учитывает запрос identifier и возвращает решение с остатком квоты"""
+        (result,) = await _run_scripts([(self, identifier)])
+        return self.info(identifier, result)
+    
+    def remaining(self, identifier: str) -> int:
+        """Остаток квоты без учета запроса (для статуса в админке)"""
+        key = self.key(identifier)
+        now_ms = time.time() * 1000
+        window_ms = self.window * 1000
+        if self.algorithm == RateLimitAlgorithm.SLIDING_WINDOW:
+            used = redis_client.zcount(key, now_ms - window_ms, "+inf")
+            return max(0, self.requests - used)
+        tat = float(redis_client.get(key) or 0)
+        interval = window_ms / self.requests
+        return max(0, min(self.requests, math.floor((now_ms + window_ms - max(tat, now_ms)) / interval)))
 
 # Predefined rate limiters
 RATE_LIMITS = {
-    # General API limits
-    "api_general": RateLimiter(requests=100, window=60, per="ip"),  # 100 req/min per IP
-    "api_strict": RateLimiter(requests=20, window=60, per="ip"),    # 20 req/min per IP
+    # General API limits (GCRA: один ключ на IP вместо ZSET на каждый запрос)
+    "api_general": RateLimiter(requests=100, window=60, per="ip", algorithm=RateLimitAlgorithm.GCRA),  # 100 req/min per IP
+    "api_strict": RateLimiter(requests=20, window=60, per="ip", algorithm=RateLimitAlgorithm.GCRA),    # 20 req/min per IP
     
     # Authentication limits
     "auth_login": RateLimiter(requests=5, window=300, per="ip"),    # 5 attempts per 5 min
@@ -150,182 +240,234 @@ RATE_LIMITS = {
     
     # Admin limits (more lenient)
     "admin_actions": RateLimiter(requests=1000, window=3600, per="user"), # 1000 req/hour for admins
+    
+    # Telegram Mini App diagnostics reports
+    "diagnostics": RateLimiter(requests=30, window=60, per="ip", algorithm=RateLimitAlgorithm.GCRA),
 }
 
-def rate_limit(limit_name: str = "api_general"):
-    """
-    Decorator for rate limiting endpoints
+# Лимиты маршрутов: "METHOD шаблон пути" -> имена из RATE_LIMITS
+# Общий лимит (RATE_LIMIT_DEFAULT) добавляется ко всем маршрутам, кроме RATE_LIMIT_EXEMPT
+ROUTE_LIMITS: Dict[str, Tuple[str, ...]] = {
+    f"POST {settings.API_V1_STR}/auth/register": ("auth_register",),
+    f"POST {settings.API_V1_STR}/auth/login": ("auth_login",),
+    f"POST {settings.API_V1_STR}/auth/telegram-miniapp": ("auth_login",),
+    f"POST {settings.API_V1_STR}/auth/telegram-website": ("auth_login",),
+    f"POST {settings.API_V1_STR}/orders/": ("user_orders",),
+    f"POST {settings.API_V1_STR}/monitoring/telegram-diagnostics": ("diagnostics",),
+}
+
+RATE_LIMIT_EXEMPT = {"/health", "/metrics"}
+
+
+async def _run_scripts(calls: Sequence[Tuple[RateLimiter, str]]) -> List:
+    """Все проверки запроса - один pipeline из EVALSHA (один round-trip)"""
+    client = redis_manager.redis_client
+    if client is None:
+        raise RuntimeError("Redis is not connected")
     
-    Usage:
-    @rate_limit("auth_login")
-    async def login_endpoint(...):
-        ...
+    async def execute():
+        pipe = client.pipeline(transaction=False)
+        for limiter, identifier in calls:
+            pipe.evalsha(
+                _SCRIPT_SHAS[limiter.algorithm],
+                1,
+                limiter.key(identifier),
+                *limiter.script_args()
+            )
+        return await pipe.execute(raise_on_error=False)
     
-    Also supports sync functions:
-    @rate_limit("auth_login") 
-    def sync_endpoint(...):
-        ...
+    results = await execute()
+    if any(isinstance(result, NoScriptError) for result in results):
+        # Кэш скриптов пуст (рестарт Redis, SCRIPT FLUSH) - загружаем и повторяем
+        for script in _SCRIPTS.values():
+            await client.script_load(script)
+        results = await execute()
+    for result in results:
+        if isinstance(result, Exception):
+            raise result
+    return results
+
+
+async def evaluate(
+    request: Request,
+    limit_names: Sequence[str],
+    user_id: Optional[int] = None
+) -> Tuple[bool, Optional[Dict[str, Any]]]:
     """
-    def decorator(func):
-        # Check if function is async or sync
-        is_async = inspect.iscoroutinefunction(func)
-        
-        if is_async:
-            @wraps(func)
-            async def async_wrapper(*args, **kwargs):
-                # Extract request and user from function arguments
-                request = None
-                user_id = None
-                
-                for arg in args:
-                    if isinstance(arg, Request):
-                        request = arg
-                        break
-                
-                # Try to get user from kwargs
-                if "current_user" in kwargs and kwargs["current_user"]:
-                    user_id = kwargs["current_user"].id
-                
-                if not request:
-                    logger.warning("Rate limiter: Request object not found")
-                    return await func(*args, **kwargs)
-                
-                limiter = RATE_LIMITS.get(limit_name)
-                if not limiter:
-                    logger.warning(f"Rate limiter '{limit_name}' not found")
-                    return await func(*args, **kwargs)
-                
-                is_allowed, info = await limiter.is_allowed(request, user_id)
-                
-                if not is_allowed:
-                    logger.warning(
-                        f"Rate limit exceeded for {info.get('identifier', 'unknown')} "
-                        f"on {request.method} {request.url.path}"
-                    )
-                    raise RateLimitExceeded(retry_after=info.get("retry_after", 60))
-                
-                # Call the original async function
-                response = await func(*args, **kwargs)
-                
-                # Add rate limit headers to response
-                if hasattr(response, "headers"):
-                    response.headers["X-RateLimit-Limit"] = str(info.get("requests_limit", "unknown"))
-                    response.headers["X-RateLimit-Remaining"] = str(info.get("requests_remaining", "unknown"))
-                    response.headers["X-RateLimit-Reset"] = str(info.get("reset_time", "unknown"))
-                
-                return response
-            
-            return async_wrapper
-            
-        else:
-            @wraps(func)
-            def sync_wrapper(*args, **kwargs):
-                # Extract request and user from function arguments
-                request = None
-                user_id = None
-                
-                for arg in args:
-                    if isinstance(arg, Request):
-                        request = arg
-                        break
-                
-                # Try to get user from kwargs
-                if "current_user" in kwargs and kwargs["current_user"]:
-                    user_id = kwargs["current_user"].id
-                
-                if not request:
-                    logger.warning("Rate limiter: Request object not found")
-                    return func(*args, **kwargs)
-                
-                limiter = RATE_LIMITS.get(limit_name)
-                if not limiter:
-                    logger.warning(f"Rate limiter '{limit_name}' not found")
-                    return func(*args, **kwargs)
-                
-                # Run async rate limiting in sync context
-                loop = None
-                try:
-                    loop = asyncio.get_event_loop()
-                except RuntimeError:
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                
-                is_allowed, info = loop.run_until_complete(limiter.is_allowed(request, user_id))
-                
-                if not is_allowed:
-                    logger.warning(
-                        f"Rate limit exceeded for {info.get('identifier', 'unknown')} "
-                        f"on {request.method} {request.url.path}"
-                    )
-                    raise RateLimitExceeded(retry_after=info.get("retry_after", 60))
-                
-                # Call the original sync function
-                response = func(*args, **kwargs)
-                
-                # Add rate limit headers to response
-                if hasattr(response, "headers"):
-                    response.headers["X-RateLimit-Limit"] = str(info.get("requests_limit", "unknown"))
-                    response.headers["X-RateLimit-Remaining"] = str(info.get("requests_remaining", "unknown"))
-                    response.headers["X-RateLimit-Reset"] = str(info.get("reset_time", "unknown"))
-                
-                return response
-            
-            return sync_wrapper
+    Проверяет все лимиты запроса: сначала локальный tier воркера, затем
+    Redis за один round-trip
+    Returns: (is_allowed, info самого строгого лимита - отказавшего или с наименьшим остатком)
+    """
+    limiters = []
+    for name in limit_names:
+        limiter = RATE_LIMITS.get(name)
+        if limiter is None:
+            logger.warning(f"Rate limiter '{name}' not found")
+            continue
+        limiters.append((limiter, limiter.get_identifier(request, user_id)))
+    if not limiters:
+        return True, None
     
-    return decorator
+    now = time.time()
+    if settings.RATE_LIMIT_LOCAL_ENABLED:
+        local_denied = []
+        for limiter, identifier in limiters:
+            retry_after = local_admission.rejected(limiter.key(identifier), limiter.requests, limiter.window, now)
+            if retry_after is not None:
+                local_denied.append(limiter.local_denial(identifier, retry_after))
+        if local_denied:
+            return False, max(local_denied, key=lambda info: info["retry_after"])
+        # Учет до await: одновременные запросы клиента видят друг друга
+        for limiter, identifier in limiters:
+            local_admission.record(limiter.key(identifier), limiter.requests, limiter.window, now)
+    
+    try:
+        results = await _run_scripts(limiters)
+    except Exception as e:
+        logger.error(f"Rate limiter error: {e}")
+        # Fail open - allow request if Redis is down
+        return True, None
+    
+    decisions = [limiter.info(identifier, result) for (limiter, identifier), result in zip(limiters, results)]
+    denied = [info for allowed, info in decisions if not allowed]
+    if settings.RATE_LIMIT_LOCAL_ENABLED:
+        for (limiter, identifier), (allowed, info) in zip(limiters, decisions):
+            if not allowed:
+                local_admission.block(limiter.key(identifier), now + info["retry_after"])
+    if denied:
+        return False, max(denied, key=lambda info: info["retry_after"])
+    return True, min((info for _, info in decisions), key=lambda info: info["requests_remaining"])
 
-async def check_rate_limit(request: Request, limit_name: str = "api_general", user_id: Optional[int] = None):
+
+def route_limits(request: Request) -> Tuple[str, ...]:
+    """Имена лимитов для маршрута запроса (по шаблону пути, а не сырому URL)"""
+    route = request.scope.get("route")
+    path = getattr(route, "path_format", None) or request.url.path
+    if path in RATE_LIMIT_EXEMPT:
+        return ()
+    limits = ROUTE_LIMITS.get(f"{request.method} {path}", ())
+    if settings.RATE_LIMIT_DEFAULT:
+        limits = (settings.RATE_LIMIT_DEFAULT,) + limits
+    return limits
+
+
+def _request_user_id(request: Request) -> Optional[int]:
+    """user_id из Bearer-токена (кэш claims app.core.auth), без обращения к БД"""
+    authorization = request.headers.get("Authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        user_id, _ = decode_token_cached(token, token_hash(token))
+    except HTTPException:
+        return None
+    return user_id
+
+
+async def check_request(request: Request) -> Optional[Dict[str, Any]]:
     """
-    Manual rate limit check (for use in dependencies)
+    Проверяет лимиты маршрута запроса; info пропущенного запроса кладется
+    в request.state.rate_limit (заголовки ставит RateLimitHeadersMiddleware)
+    Returns: info самого строгого лимита (None, если лимитов нет или Redis недоступен)
+    Raises: RateLimitExceeded
     """
-    limiter = RATE_LIMITS.get(limit_name)
-    if not limiter:
-        return
+    limit_names = route_limits(request)
+    if not limit_names:
+        return None
+    
+    user_id = None
+    if any(RATE_LIMITS[name].per == "user" for name in limit_names if name in RATE_LIMITS):
+        user_id = _request_user_id(request)
     
-    is_allowed, info = await limiter.is_allowed(request, user_id)
+    is_allowed, info = await evaluate(request, limit_names, user_id)
+    if info is None:
+        return None
     
     if not is_allowed:
         logger.warning(
             f"Rate limit exceeded for {info.get('identifier', 'unknown')} "
             f"on {request.method} {request.url.path}"
         )
-        raise RateLimitExceeded(retry_after=info.get("retry_after", 60))
+        raise RateLimitExceeded(
+            retry_after=info["retry_after"],
+            limit=info["requests_limit"],
+            reset=info["reset_time"]
+        )
+    
+    request.state.rate_limit = info
+    return info
+
 
-# Middleware for global rate limiting
-class RateLimitMiddleware:
+async def enforce_rate_limits(request: Request) -> None:
     """
-    Global rate limiting middleware
+    Зависимость уровня приложения: одинаково для sync и async маршрутов,
+    выполняется в event loop до зависимостей эндпоинта (сессии БД и т.п.)
     """
+    await check_request(request)
+
+
+class RateLimitHeadersMiddleware:
+    """
+    ASGI-обертка: X-RateLimit-* из request.state.rate_limit в заголовки ответа
     
-    def __init__(self, app, default_limit: str = "api_general"):
+    Работает для любого ответа - render(), Response из роута, хиты HTTP-кэша:
+    заголовки Response, внедренного в зависимость, такие роуты теряют.
+    Должна стоять снаружи CacheMiddleware, чтобы заголовки не попадали в кэш.
+    """
+    
+    def __init__(self, app):
         self.app = app
-        self.default_limit = default_limit
-
+    
     async def __call__(self, scope, receive, send):
         if scope["type"] != "http":
             await self.app(scope, receive, send)
             return
-
-        request = Request(scope, receive)
         
-        # Skip rate limiting for health checks and static files
-        if request.url.path in ["/health", "/docs", "/redoc", "/openapi.json"] or \
-           request.url.path.startswith("/static"):
-            await self.app(scope, receive, send)
-            return
+        # Тот же dict, что и request.state внутри приложения
+        state = scope.setdefault("state", {})
+        
+        async def send_wrapper(message):
+            info = state.get("rate_limit")
+            if message["type"] == "http.response.start" and info is not None:
+                message["headers"] = list(message.get("headers") or [])
+                headers = MutableHeaders(scope=message)
+                headers["X-RateLimit-Limit"] = str(info["requests_limit"])
+                headers["X-RateLimit-Remaining"] = str(info["requests_remaining"])
+                headers["X-RateLimit-Reset"] = str(info["reset_time"])
+            await send(message)
+        
+        await self.app(scope, receive, send_wrapper)
 
-        try:
-            await check_rate_limit(request, self.default_limit)
-        except RateLimitExceeded as e:
-            response = JSONResponse(
-                status_code=e.status_code,
-                content={"detail": e.detail},
-                headers=e.headers
-            )
-            await response(scope, receive, send)
-            return
 
-        await self.app(scope, receive, send)
+async def admit_cached_request(scope) -> Optional[Response]:
+    """
+    Лимиты для хитов HTTP-кэша (CacheMiddleware): такой ответ отдается
+    без роутинга, и enforce_rate_limits не выполняется
+    Returns: готовый ответ 429 или None, если запрос пропущен
+    """
+    try:
+        await check_request(Request(scope))
+    except RateLimitExceeded as exc:
+        return ORJSONResponse({"detail": exc.detail}, status_code=exc.status_code, headers=exc.headers)
+    return None
+
+
+async def check_rate_limit(request: Request, limit_name: str = "api_general", user_id: Optional[int] = None):
+    """
+    Manual rate limit check (for limits that depend on request data)
+    """
+    is_allowed, info = await evaluate(request, (limit_name,), user_id)
+    
+    if not is_allowed:
+        logger.warning(
+            f"Rate limit exceeded for {info.get('identifier', 'unknown')} "
+            f"on {request.method} {request.url.path}"
+        )
+        raise RateLimitExceeded(
+            retry_after=info["retry_after"],
+            limit=info["requests_limit"],
+            reset=info["reset_time"]
+        )
 
 # Utility functions
 def get_rate_limit_status(identifier: str, limit_name: str = "api_general") -> Dict[str, Any]:
@@ -335,17 +477,12 @@ def get_rate_limit_status(identifier: str, limit_name: str = "api_general") -> D
         return {"error": "Rate limiter not found"}
     
     try:
-        key = f"rate_limit:{identifier}"
-        current_time = int(time.time())
-        window_start = current_time - limiter.window
-        
-        # Count requests in current window
-        current_requests = redis_client.zcount(key, window_start, current_time)
+        remaining = limiter.remaining(identifier)
         
         return {
-            "requests_made": current_requests,
+            "requests_made": limiter.requests - remaining,
             "requests_limit": limiter.requests,
-            "requests_remaining": max(0, limiter.requests - current_requests),
+            "requests_remaining": remaining,
             "window_seconds": limiter.window,
             "identifier": identifier
         }
@@ -355,9 +492,12 @@ def get_rate_limit_status(identifier: str, limit_name: str = "api_general") -> D
 
 def clear_rate_limit(identifier: str, limit_name: str = "api_general") -> bool:
     """Clear rate limit for specific identifier (admin function)"""
+    limiter = RATE_LIMITS.get(limit_name)
+    if not limiter:
+        return False
+    
     try:
-        key = f"rate_limit:{identifier}"
-        redis_client.delete(key)
+        redis_client.delete(limiter.key(identifier))
         logger.info(f"Cleared rate limit for {identifier} ({limit_name})")
         return True
     except Exception as e:
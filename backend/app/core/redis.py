@@ -4,21 +4,40 @@ from app.core.config import settings
 
 class RedisManager:
     def __init__(self):
+        self.pool = None
         self.redis_client = None
+        self.binary_pool = None
+        self.binary_client = None
     
     async def connect(self):
         """Connect to Redis"""
-        self.redis_client = redis.from_url(
+        self.pool = redis.ConnectionPool.from_url(
             settings.REDIS_URL,
             encoding="utf-8",
-            decode_responses=True
+            decode_responses=True,
+            max_connections=settings.REDIS_MAX_CONNECTIONS
         )
+        self.redis_client = redis.Redis(connection_pool=self.pool)
         await self.redis_client.ping()
+        
+        # Raw bytes (gzip bodies of the HTTP cache)
+        self.binary_pool = redis.ConnectionPool.from_url(
+            settings.REDIS_URL,
+            decode_responses=False,
+            max_connections=settings.REDIS_MAX_CONNECTIONS
+        )
+        self.binary_client = redis.Redis(connection_pool=self.binary_pool)
     
     async def disconnect(self):
         """Disconnect from Redis"""
         if self.redis_client:
             await self.redis_client.close()
+        if self.pool:
+            await self.pool.disconnect()
+        if self.binary_client:
+            await self.binary_client.close()
+        if self.binary_pool:
+            await self.binary_pool.disconnect()
     
     async def get(self, key: str):
         """Get value from cache"""
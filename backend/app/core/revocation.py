@@ -0,0 +1,181 @@
+"""
+🚫 Token Revocation
+Отзыв токенов без обращения к Redis на каждом запросе:
+
+- версия токенов пользователя (claim tv): "отозвать все" - HINCRBY, O(1);
+  токен с tv меньше текущей версии отклоняется
+- отдельные отозванные токены (logout) - ZSET sha256(token) -> exp
+
+Каждый воркер держит локальную реплику обоих наборов: полная загрузка
+при старте и периодически, точечные изменения - через шину инвалидации L1.
+Записи прежнего blacklist (token_blacklist:*, user_blacklist:*) переносятся
+при старте (migrate_legacy)
+"""
+
+import asyncio
+import hashlib
+import logging
+import time
+from typing import Dict, Optional
+
+from app.core.config import settings
+from app.core.redis import redis_manager
+from app.core.local_cache import (
+    add_invalidation_listener,
+    encode_invalidation,
+    invalidate_local,
+    INVALIDATION_CHANNEL
+)
+
+logger = logging.getLogger(__name__)
+
+TOKEN_VERSIONS_KEY = "auth:token_versions"
+REVOKED_TOKENS_KEY = "auth:revoked_tokens"
+REVOCATION_NAMESPACE = "revocations"
+
+LEGACY_TOKEN_PREFIX = "token_blacklist:"
+LEGACY_USER_PREFIX = "user_blacklist:"
+
+
+def token_hash(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class TokenRevocation:
+    """
+    Локальная реплика отзывов
+    
+    Проверки (is_user_revoked / is_token_revoked) - только память процесса. Пока реплика не
+    загружена или Redis недоступен, действует fail-open, как и прежний
+    blacklist. Полная перезагрузка раз в refresh_interval ограничивает
+    устаревание, если pub/sub пропустил сообщение.
+    """
+    
+    def __init__(self, refresh_interval: float = 60.0):
+        self.refresh_interval = refresh_interval
+        self._versions: Dict[int, int] = {}
+        self._revoked: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._reload_task: Optional[asyncio.Task] = None
+        add_invalidation_listener(REVOCATION_NAMESPACE, self._on_message)
+    
+    
+    def version(self, user_id: int) -> int:
+        return self._versions.get(user_id, 0)
+    
+    def is_user_revoked(self, user_id: int, token_version: Optional[int]) -> bool:
+        """Токен выпущен до последнего "отозвать все" (токены без tv - версия 0)"""
+        return (token_version or 0) < self._versions.get(user_id, 0)
+    
+    def is_token_revoked(self, token_digest: str) -> bool:
+        expires_at = self._revoked.get(token_digest)
+        return expires_at is not None and expires_at > time.time()
+    
+    
+    def apply_user(self, user_id: int, version: int) -> None:
+        if version > self._versions.get(user_id, 0):
+            self._versions[user_id] = version
+    
+    def apply_token(self, token_digest: str, expires_at: float) -> None:
+        self._revoked[token_digest] = expires_at
+    
+    def _on_message(self, key: Optional[str]) -> None:
+        if key is None:
+            # Переподключение шины - могли пропустить сообщения
+            self._schedule_reload()
+            return
+        kind, ident, value = key.split(":", 2)
+        if kind == "user":
+            self.apply_user(int(ident), int(value))
+        elif kind == "token":
+            self.apply_token(ident, float(value))
+    
+    def _schedule_reload(self) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._reload_task is None or self._reload_task.done():
+            self._reload_task = loop.create_task(self.reload())
+    
+    @staticmethod
+    def publish_sync(client, key: str) -> None:
+        """Применяет изменение в этом процессе и рассылает остальным (sync redis клиент)"""
+        invalidate_local(REVOCATION_NAMESPACE, key)
+        try:
+            client.publish(INVALIDATION_CHANNEL, encode_invalidation(REVOCATION_NAMESPACE, key))
+        except Exception as e:
+            logger.warning(f"Revocation publish error: {e}")
+    
+    
+    async def migrate_legacy(self) -> None:
+        """
+        Переносит прежний blacklist: token_blacklist:{token} -> ZSET (exp по TTL
+        ключа), user_blacklist:{id} -> повышение версии. Старый ключ удаляется
+        до HINCRBY: из параллельно стартующих воркеров версию повысит один
+        """
+        client = redis_manager.redis_client
+        if client is None:
+            return
+        try:
+            now = time.time()
+            async for key in client.scan_iter(match=f"{LEGACY_TOKEN_PREFIX}*", count=1000):
+                ttl = await client.ttl(key)
+                if ttl > 0:
+                    digest = token_hash(key[len(LEGACY_TOKEN_PREFIX):])
+                    await client.zadd(REVOKED_TOKENS_KEY, {digest: now + ttl})
+                await client.delete(key)
+            async for key in client.scan_iter(match=f"{LEGACY_USER_PREFIX}*", count=1000):
+                if await client.delete(key):
+                    await client.hincrby(TOKEN_VERSIONS_KEY, key[len(LEGACY_USER_PREFIX):], 1)
+        except Exception as e:
+            logger.warning(f"Legacy blacklist migration error: {e}")
+    
+    async def reload(self) -> None:
+        """Полная загрузка версий и неистекших отозванных токенов"""
+        client = redis_manager.redis_client
+        if client is None:
+            return
+        try:
+            now = time.time()
+            pipe = client.pipeline(transaction=False)
+            pipe.zremrangebyscore(REVOKED_TOKENS_KEY, "-inf", now)
+            pipe.hgetall(TOKEN_VERSIONS_KEY)
+            pipe.zrangebyscore(REVOKED_TOKENS_KEY, now, "+inf", withscores=True)
+            _, versions, revoked = await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Revocation reload error: {e}")
+            return
+        # Версии только растут: слияние не откатывает изменения, пришедшие во время загрузки
+        loaded = {int(user_id): int(version) for user_id, version in versions.items()}
+        for user_id, version in self._versions.items():
+            if version > loaded.get(user_id, 0):
+                loaded[user_id] = version
+        self._versions = loaded
+        revoked_tokens = {digest: expires_at for digest, expires_at in self._revoked.items() if expires_at > now}
+        revoked_tokens.update((digest, float(expires_at)) for digest, expires_at in revoked)
+        self._revoked = revoked_tokens
+    
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        await self.migrate_legacy()
+        await self.reload()
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            await self.reload()
+
+
+token_revocation = TokenRevocation(refresh_interval=settings.REVOCATION_REFRESH_INTERVAL)
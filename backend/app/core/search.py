@@ -0,0 +1,147 @@
+"""
+🔎 Flower Search
+Полнотекстовый поиск по каталогу: tsvector (русский стемминг) + GIN,
+pg_trgm для опечаток и префиксный индекс для автодополнения
+"""
+
+import logging
+from typing import Any, Dict, List
+
+from sqlalchemy import Float, cast, func, literal, literal_column, or_, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.schema import CreateIndex
+
+from app.core.serializers import FLOWER_LIST_COLUMNS
+from app.models.flower import Flower, SEARCH_CONFIG, SEARCH_VECTOR_SQL, FLOWER_SEARCH_INDEXES
+from app.models.notification import Notification
+from app.models.order import Order
+from app.models.payment import Payment
+
+logger = logging.getLogger(__name__)
+
+# Верхняя граница диапазона для префикса (максимальный code point)
+PREFIX_UPPER_BOUND = "\U0010ffff"
+
+# Составные индексы (sort_key, id) для keyset-пагинации списков
+KEYSET_INDEXES = tuple(
+    index
+    for model in (Flower, Order, Notification, Payment)
+    for index in model.__table__.indexes
+    if len(index.columns) == 2 and index.columns.keys()[-1] == "id"
+)
+
+
+class FlowerSearchEngine:
+    """
+    Поиск цветов поверх индексов Postgres
+    
+    Индексы обновляются самим Postgres при INSERT/UPDATE/DELETE
+    (search_vector - генерируемая колонка), поэтому отдельной
+    переиндексации при изменении каталога не требуется.
+    """
+    
+    def __init__(self, config: str = SEARCH_CONFIG, trigram_weight: float = 0.5):
+        self.config = literal_column(f"'{config}'::regconfig")
+        self.trigram_weight = trigram_weight
+    
+    def tsquery(self, query: str):
+        # websearch_to_tsquery не падает на пользовательском вводе (кавычки, "-", or)
+        return func.websearch_to_tsquery(self.config, query)
+    
+    def match(self, query: str):
+        """Условие WHERE: полнотекстовое совпадение или похожее по триграммам название"""
+        return or_(
+            Flower.search_vector.op("@@")(self.tsquery(query)),
+            Flower.name.op("%>")(query)
+        )
+    
+    def rank(self, query: str):
+        """Релевантность: ts_rank_cd по весам A/B/C + близость названия (опечатки)"""
+        return (
+            func.ts_rank_cd(Flower.search_vector, self.tsquery(query))
+            + cast(literal(self.trigram_weight), Float) * func.word_similarity(query, Flower.name)
+        )
+    
+    async def search(
+        self,
+        db: AsyncSession,
+        query: str,
+        limit: int = 10,
+        available_only: bool = False
+    ) -> List[Any]:
+        """Ранжированный поиск (Row проекции FLOWER_LIST_COLUMNS)"""
+        stmt = select(*FLOWER_LIST_COLUMNS).where(self.match(query))
+        if available_only:
+            stmt = stmt.where(Flower.is_available == True)
+        stmt = stmt.order_by(self.rank(query).desc(), Flower.orders_count.desc(), Flower.id).limit(limit)
+        return (await db.execute(stmt)).all()
+    
+    async def autocomplete(self, db: AsyncSession, prefix: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Подсказки по началу названия
+        Диапазон lower(name) COLLATE "C" в [prefix, prefix + U+10FFFF) идет
+        по ix_flowers_name_prefix и, в отличие от LIKE с параметром,
+        использует индекс и в generic-плане prepared statement
+        """
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return []
+        name_key = func.lower(Flower.name).collate("C")
+        stmt = (
+            select(Flower.id, Flower.name, Flower.category)
+            .where(
+                name_key >= prefix,
+                name_key < prefix + PREFIX_UPPER_BOUND,
+                Flower.is_available == True
+            )
+            .order_by(Flower.orders_count.desc(), Flower.name)
+            .limit(limit)
+        )
+        rows = (await db.execute(stmt)).all()
+        return [
+            {
+                "id": row.id,
+                "name": row.name,
+                "category": row.category.value if row.category else None
+            }
+            for row in rows
+        ]
+
+
+def create_search_extensions(engine) -> None:
+    """pg_trgm нужен до create_all (gin_trgm_ops в ix_flowers_name_trgm)"""
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
+
+def ensure_search_schema(engine) -> None:
+    """
+    Идемпотентно достраивает поисковую схему в уже существующей БД
+    (create_all не добавляет колонки и индексы в существующие таблицы)
+    """
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as conn:
+        conn.execute(text(
+            "ALTER TABLE flowers ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            f"GENERATED ALWAYS AS ({SEARCH_VECTOR_SQL}) STORED"
+        ))
+        for index in FLOWER_SEARCH_INDEXES:
+            index.create(conn, checkfirst=True)
+    logger.info("Flower search schema is up to date")
+
+
+def ensure_keyset_indexes(engine) -> None:
+    """
+    Идемпотентно создает индексы keyset-пагинации в уже существующей БД
+    (CREATE INDEX IF NOT EXISTS, create_all пропускает существующие таблицы)
+    """
+    with engine.begin() as conn:
+        for index in KEYSET_INDEXES:
+            conn.execute(CreateIndex(index, if_not_exists=True))
+    logger.info("Keyset pagination indexes are up to date")
+
+
+flower_search = FlowerSearchEngine()
@@ -1,11 +1,15 @@
 from datetime import datetime, timedelta
 from typing import Optional, Union
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from app.core.config import settings
-
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.core.passwords import pwd_context
+from app.core.redis import redis_manager
+from app.core.revocation import (
+    token_revocation,
+    token_hash,
+    TOKEN_VERSIONS_KEY,
+    REVOKED_TOKENS_KEY
+)
 
 # ✅ НОВАЯ ФУНКЦИОНАЛЬНОСТЬ: Redis для blacklist токенов
 try:
@@ -15,12 +19,37 @@ except ImportError:
     redis_client = None
 
 
+async def current_token_version(user_id: int) -> int:
+    """
+    Версия токенов пользователя для claim tv при выпуске токена (login/refresh):
+    один HGET на async-пуле - реплика воркера может отставать от Redis, и
+    токен со старой tv отклонили бы воркеры с актуальной репликой.
+    Без Redis - локальная реплика
+    """
+    client = redis_manager.redis_client
+    if client is not None:
+        try:
+            version = int(await client.hget(TOKEN_VERSIONS_KEY, user_id) or 0)
+            token_revocation.apply_user(user_id, version)
+            return version
+        except Exception:
+            pass
+    return token_revocation.version(user_id)
+
+
+def _with_token_version(to_encode: dict) -> dict:
+    """tv передает вызывающий (await current_token_version); иначе - локальная реплика"""
+    if "tv" not in to_encode and to_encode.get("sub") is not None:
+        to_encode["tv"] = token_revocation.version(int(to_encode["sub"]))
+    return to_encode
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create JWT access token"""
     import logging
     logger = logging.getLogger(__name__)
     
-    to_encode = data.copy()
+    to_encode = _with_token_version(data.copy())
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
@@ -40,7 +69,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 
 def create_refresh_token(data: dict) -> str:
     """Create JWT refresh token"""
-    to_encode = data.copy()
+    to_encode = _with_token_version(data.copy())
     expire = datetime.utcnow() + timedelta(days=30)  # ✅ ИСПРАВЛЕНО: 30 дней вместо 7 для лучшего UX
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
@@ -63,9 +92,13 @@ def verify_token(token: str) -> Optional[dict]:
         
         logger.info(f"🔐 verify_token: decoding with SECRET_KEY len={len(settings.SECRET_KEY)}, algorithm={settings.ALGORITHM}")
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        # "Отозвать все": токен выпущен до последнего повышения версии пользователя
+        if token_revocation.is_user_revoked(int(payload.get("sub")), payload.get("tv")):
+            logger.warning(f"❌ verify_token: token {token_preview}... revoked by token version")
+            return None
         logger.info(f"✅ verify_token: token valid, payload={payload}")
         return payload
-    except JWTError as e:
+    except (JWTError, TypeError, ValueError) as e:
         logger.warning(f"❌ verify_token: JWTError for token {token_preview}...: {e}")
         return None
     except Exception as e:
@@ -91,8 +124,10 @@ def revoke_token(token: str) -> bool:
             ttl = exp - current_time
             
             if ttl > 0:
-                # Добавляем в blacklist до времени истечения
-                redis_client.setex(f"token_blacklist:{token}", ttl, "revoked")
+                # Хэш токена в ZSET до времени истечения (score = exp) + рассылка репликам
+                digest = token_hash(token)
+                redis_client.zadd(REVOKED_TOKENS_KEY, {digest: exp})
+                token_revocation.publish_sync(redis_client, f"token:{digest}:{exp}")
                 return True
                 
     except Exception as e:
@@ -105,64 +140,36 @@ def revoke_token(token: str) -> bool:
 def is_token_blacklisted(token: str) -> bool:
     """
     ✅ НОВАЯ ФУНКЦИЯ: Проверить находится ли токен в blacklist
+    Локальная реплика отзывов, без обращения к Redis
     """
-    if not redis_client:
-        return False
-        
-    try:
-        return redis_client.exists(f"token_blacklist:{token}") > 0
-    except Exception:
-        # При ошибке Redis считаем токен валидным (fail-open)
-        return False
+    return token_revocation.is_token_revoked(token_hash(token))
 
 
 def revoke_all_user_tokens(user_id: int) -> int:
     """
     ✅ НОВАЯ ФУНКЦИЯ: Отозвать все токены пользователя
-    Возвращает количество отозванных токенов
+    O(1): повышает версию токенов, все выпущенные ранее (tv меньше) отклоняются.
+    Возвращает новую версию (0 - отзыв не удался)
     """
     if not redis_client:
         return 0
         
     try:
-        # Находим все активные токены пользователя
-        pattern = f"token_blacklist:*"
-        keys = redis_client.keys(pattern)
-        
-        revoked_count = 0
-        for key in keys:
-            try:
-                token = key.replace("token_blacklist:", "")
-                payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-                
-                if payload.get("sub") == user_id:
-                    # Этот токен уже в blacklist, пропускаем
-                    continue
-                    
-            except JWTError:
-                continue
-        
-        # Альтернативный подход: добавляем user_id в blacklist пользователей
-        # Это проще но менее гранулярно
-        redis_client.setex(f"user_blacklist:{user_id}", 3600 * 24 * 7, "all_tokens_revoked")
-        return 1
+        version = redis_client.hincrby(TOKEN_VERSIONS_KEY, user_id, 1)
+        token_revocation.publish_sync(redis_client, f"user:{user_id}:{version}")
+        return version
         
     except Exception as e:
         print(f"Error revoking user tokens: {e}")
         return 0
 
 
-def is_user_blacklisted(user_id: int) -> bool:
+def is_token_version_revoked(user_id: int, token_version: Optional[int]) -> bool:
     """
-    ✅ НОВАЯ ФУНКЦИЯ: Проверить заблокирован ли пользователь
+    Токен выпущен до последнего revoke_all_user_tokens (claim tv меньше версии)
+    Локальная реплика отзывов, без обращения к Redis
     """
-    if not redis_client:
-        return False
-        
-    try:
-        return redis_client.exists(f"user_blacklist:{user_id}") > 0
-    except Exception:
-        return False
+    return token_revocation.is_user_revoked(user_id, token_version)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
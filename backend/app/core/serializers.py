@@ -0,0 +1,91 @@
+"""
+⚡ Serializers
+Общие проекции Flower (список / карточка) и быстрый JSON-ответ через orjson.
+Проекции выбирают только нужные колонки - без гидрации ORM-объектов
+"""
+
+from typing import Any, Dict
+
+from fastapi.responses import ORJSONResponse
+
+from app.models.flower import Flower
+
+# Компактная проекция для списков (каталог, поиск, популярные, сезонные)
+FLOWER_LIST_COLUMNS = (
+    Flower.id,
+    Flower.name,
+    Flower.category,
+    Flower.price,
+    Flower.image_url,
+    Flower.is_available,
+    Flower.views_count,
+    Flower.orders_count,
+)
+
+# Полная карточка цветка
+FLOWER_DETAIL_COLUMNS = FLOWER_LIST_COLUMNS + (
+    Flower.description,
+    Flower.is_seasonal,
+    Flower.season_start,
+    Flower.season_end,
+    Flower.stock_quantity,
+    Flower.min_order_quantity,
+    Flower.max_order_quantity,
+    Flower.meta_title,
+    Flower.meta_description,
+    Flower.tags,
+    Flower.created_at,
+    Flower.updated_at,
+)
+
+
+def flower_list_item(row: Any) -> Dict[str, Any]:
+    """Элемент списка из Row проекции FLOWER_LIST_COLUMNS (или ORM-объекта)"""
+    category = row.category
+    return {
+        "id": row.id,
+        "name": row.name,
+        "category": category.value if category else None,
+        "price": row.price,
+        "image_url": row.image_url,
+        "is_available": row.is_available,
+        "views_count": row.views_count,
+        "orders_count": row.orders_count
+    }
+
+
+def flower_detail(row: Any) -> Dict[str, Any]:
+    """Карточка из Row проекции FLOWER_DETAIL_COLUMNS (или ORM-объекта)"""
+    category = row.category
+    created_at = row.created_at
+    updated_at = row.updated_at
+    return {
+        "id": row.id,
+        "name": row.name,
+        "description": row.description,
+        "category": category.value if category else None,
+        "price": row.price,
+        "image_url": row.image_url,
+        "is_available": row.is_available,
+        "is_seasonal": row.is_seasonal,
+        "season_start": row.season_start,
+        "season_end": row.season_end,
+        "stock_quantity": row.stock_quantity,
+        "min_order_quantity": row.min_order_quantity,
+        "max_order_quantity": row.max_order_quantity,
+        "meta_title": row.meta_title,
+        "meta_description": row.meta_description,
+        "tags": row.tags,
+        "views_count": row.views_count,
+        "orders_count": row.orders_count,
+        "created_at": created_at.isoformat() if created_at else None,
+        "updated_at": updated_at.isoformat() if updated_at else None
+    }
+
+
+def render(payload: Any, status_code: int = 200) -> ORJSONResponse:
+    """
+    Готовый ответ из примитивов (dict/list/str/числа)
+    Возврат Response из роута минует jsonable_encoder FastAPI
+    """
+    return ORJSONResponse(payload, status_code=status_code)
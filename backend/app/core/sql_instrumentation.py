@@ -0,0 +1,198 @@
+"""
+🛢️ SQL Instrumentation
+Учет SQL в рамках HTTP-запроса: число запросов и время в БД по шаблону
+маршрута (Prometheus), поиск N+1 по отпечаткам нормализованного SQL,
+опциональный заголовок Server-Timing
+"""
+
+import re
+import time
+import hashlib
+import logging
+from collections import Counter as CallCounter
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Optional
+
+from prometheus_client import Counter, Histogram
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+SQL_STATEMENTS_PER_REQUEST = Histogram(
+    'http_request_sql_statements',
+    'SQL statements executed per HTTP request',
+    ['route'],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+)
+SQL_TIME_PER_REQUEST = Histogram(
+    'http_request_sql_seconds',
+    'Time spent in SQL per HTTP request',
+    ['route'],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+SQL_N_PLUS_ONE = Counter(
+    'http_request_sql_n_plus_one_total',
+    'HTTP requests that repeated one SQL fingerprint above the threshold',
+    ['route']
+)
+
+# Маршрут без совпадения (404) - одна метка, чтобы сырые пути не раздували кардинальность
+UNMATCHED_ROUTE = "unmatched"
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_PLACEHOLDER = re.compile(r"\$\d+|%\(\w+\)s|%s|(?<!:):\w+|\?")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_CAST = re.compile(r"::[\w\[\]]+")
+_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_ROWS = re.compile(r"\(\?\.\.\.\)(?:\s*,\s*\(\?\.\.\.\))+")
+_SPACES = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(statement: str) -> str:
+    """
+    Нормализованный SQL: литералы и параметры -> ?, списки IN/VALUES
+    схлопнуты, так что запросы с разными id дают один отпечаток
+    """
+    sql = _STRING_LITERAL.sub("?", statement)
+    sql = _CAST.sub("", sql)
+    sql = _PLACEHOLDER.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _LIST.sub("(?...)", sql)
+    sql = _ROWS.sub("(?...)", sql)
+    return _SPACES.sub(" ", sql).strip()
+
+
+def fingerprint_id(normalized: str) -> str:
+    """Короткий id отпечатка для логов и поиска по ним"""
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12]
+
+
+class SqlStats:
+    """SQL одного HTTP-запроса (общий объект для корутин и потоков запроса)"""
+    
+    __slots__ = ("statements", "duration", "fingerprints")
+    
+    def __init__(self):
+        self.statements = 0
+        self.duration = 0.0
+        self.fingerprints: CallCounter = CallCounter()
+    
+    def record(self, statement: str, duration: float) -> None:
+        self.statements += 1
+        self.duration += duration
+        self.fingerprints[fingerprint(statement)] += 1
+    
+    def repeated(self, threshold: int):
+        """Отпечатки, повторенные больше threshold раз (кандидаты в N+1)"""
+        return [(sql, count) for sql, count in self.fingerprints.most_common() if count > threshold]
+
+
+# contextvar копируется в дочерние задачи, greenlet'ы asyncpg и threadpool -
+# все видят один и тот же SqlStats запроса
+_current_stats: ContextVar[Optional[SqlStats]] = ContextVar("sql_stats", default=None)
+
+
+def current_stats() -> Optional[SqlStats]:
+    return _current_stats.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_stats.get() is not None:
+        conn.info.setdefault("sql_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats.get()
+    if stats is None:
+        return
+    starts = conn.info.get("sql_query_start")
+    if not starts:
+        return
+    stats.record(statement, time.perf_counter() - starts.pop())
+
+
+def _handle_error(exception_context):
+    # Упавший запрос не доходит до after_cursor_execute - снимаем его отметку
+    connection = exception_context.connection
+    if connection is not None:
+        starts = connection.info.get("sql_query_start")
+        if starts:
+            starts.pop()
+
+
+def install(*engines: Engine) -> None:
+    """Подключает учет к движкам (для async - engine.sync_engine)"""
+    for target in engines:
+        if event.contains(target, "before_cursor_execute", _before_cursor_execute):
+            continue
+        event.listen(target, "before_cursor_execute", _before_cursor_execute)
+        event.listen(target, "after_cursor_execute", _after_cursor_execute)
+        event.listen(target, "handle_error", _handle_error)
+
+
+def route_template(scope) -> str:
+    """Шаблон пути FastAPI (/api/v1/orders/{order_id}) вместо сырого URL"""
+    route = scope.get("route")
+    path = getattr(route, "path_format", None) or getattr(route, "path", None)
+    if not path:
+        return UNMATCHED_ROUTE
+    return scope.get("root_path", "") + path
+
+
+class SqlInstrumentationMiddleware:
+    """
+    Собирает SQL-статистику запроса (включая BackgroundTasks) и экспортирует
+    ее в Prometheus по шаблону маршрута. Регистрируется снаружи
+    CacheMiddleware: ответ из кэша честно показывает 0 запросов.
+    """
+    
+    def __init__(
+        self,
+        app,
+        n_plus_one_threshold: int = 10,
+        server_timing: bool = False
+    ):
+        self.app = app
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.server_timing = server_timing
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        stats = SqlStats()
+        token = _current_stats.set(stats)
+        
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and self.server_timing:
+                # Запросы до начала ответа; BackgroundTasks в заголовок не попадают
+                headers = list(message.get("headers", []))
+                headers.append((
+                    b"server-timing",
+                    f'db;dur={stats.duration * 1000:.2f};desc="{stats.statements} queries"'.encode()
+                ))
+                message = {**message, "headers": headers}
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_stats.reset(token)
+            self._report(route_template(scope), scope, stats)
+    
+    def _report(self, route: str, scope, stats: SqlStats) -> None:
+        SQL_STATEMENTS_PER_REQUEST.labels(route).observe(stats.statements)
+        SQL_TIME_PER_REQUEST.labels(route).observe(stats.duration)
+        repeated = stats.repeated(self.n_plus_one_threshold)
+        if not repeated:
+            return
+        SQL_N_PLUS_ONE.labels(route).inc()
+        for sql, count in repeated:
+            logger.warning(
+                f"Possible N+1 on {scope['method']} {route}: {count} x "
+                f"[{fingerprint_id(sql)}] {sql[:300]}"
+            )
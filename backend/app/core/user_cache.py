@@ -8,6 +8,12 @@ import logging
 from typing import Optional
 from app.core.config import settings
 from app.models.user import User
+from app.core.local_cache import (
+    get_local_cache,
+    invalidate_local,
+    encode_invalidation,
+    INVALIDATION_CHANNEL
+)
 
 logger = logging.getLogger(__name__)
 
@@ -21,9 +27,46 @@ except ImportError:
 
 
 class UserCache:
-    """Система кеширования пользователей"""
+    """Система кеширования пользователей (L1 namespace "users" -> Redis)"""
     
     DEFAULT_TTL = 300  # 5 минут
+    NAMESPACE = "users"
+    SCAN_BATCH = 500
+    
+    @staticmethod
+    def _publish_invalidation(key: Optional[str] = None) -> None:
+        """Сбрасывает L1 пользователей во всех воркерах"""
+        invalidate_local(UserCache.NAMESPACE, key)
+        try:
+            redis_client.publish(
+                INVALIDATION_CHANNEL,
+                encode_invalidation(UserCache.NAMESPACE, key)
+            )
+        except Exception as e:
+            logger.warning(f"Error publishing user cache invalidation: {e}")
+    
+    @staticmethod
+    def key(user_id: int) -> str:
+        return f"user_cache:{user_id}"
+    
+    @staticmethod
+    def snapshot(user: User) -> dict:
+        """Снимок пользователя для кэша (JSON-совместимый dict)"""
+        return {
+            "id": user.id,
+            "email": user.email,
+            "full_name": user.full_name,
+            "phone": user.phone,
+            "telegram_id": user.telegram_id,
+            "role": user.role.value if user.role else "client",
+            "is_active": user.is_active,
+            "is_verified": user.is_verified,
+            "bonus_points": user.bonus_points,
+            "address": user.address,
+            "preferences": user.preferences,
+            "created_at": user.created_at.isoformat() if user.created_at else None,
+            "updated_at": user.updated_at.isoformat() if user.updated_at else None
+        }
     
     @staticmethod
     def get_user(user_id: int) -> Optional[dict]:
@@ -33,11 +76,20 @@ class UserCache:
         """
         if not redis_client:
             return None
+        
+        key = UserCache.key(user_id)
+        local = get_local_cache(UserCache.NAMESPACE)
+        if local is not None:
+            user_dict = local.get(key)
+            if user_dict is not None:
+                return user_dict
             
         try:
-            cached_data = redis_client.get(f"user_cache:{user_id}")
+            cached_data = redis_client.get(key)
             if cached_data:
                 user_dict = json.loads(cached_data)
+                if local is not None:
+                    local.set(key, user_dict)
                 logger.debug(f"User {user_id} found in cache")
                 return user_dict
         except Exception as e:
@@ -56,21 +108,7 @@ class UserCache:
             
         try:
             # Преобразуем SQLAlchemy объект в dict для JSON сериализации
-            user_dict = {
-                "id": user.id,
-                "email": user.email,
-                "full_name": user.full_name,
-                "phone": user.phone,
-                "telegram_id": user.telegram_id,
-                "role": user.role.value if user.role else "client",
-                "is_active": user.is_active,
-                "is_verified": user.is_verified,
-                "bonus_points": user.bonus_points,
-                "address": user.address,
-                "preferences": user.preferences,
-                "created_at": user.created_at.isoformat() if user.created_at else None,
-                "updated_at": user.updated_at.isoformat() if user.updated_at else None
-            }
+            user_dict = UserCache.snapshot(user)
             
             # Сохраняем в Redis с TTL
             redis_client.setex(
@@ -79,6 +117,10 @@ class UserCache:
                 json.dumps(user_dict, ensure_ascii=False)
             )
             
+            local = get_local_cache(UserCache.NAMESPACE)
+            if local is not None:
+                local.set(f"user_cache:{user.id}", user_dict, ttl)
+            
             logger.debug(f"User {user.id} cached for {ttl} seconds")
             return True
             
@@ -103,6 +145,8 @@ class UserCache:
         except Exception as e:
             logger.warning(f"Error invalidating user {user_id} cache: {e}")
             return False
+        finally:
+            UserCache._publish_invalidation(f"user_cache:{user_id}")
     
     @staticmethod
     def invalidate_all() -> int:
@@ -114,13 +158,23 @@ class UserCache:
             return 0
             
         try:
-            keys = redis_client.keys("user_cache:*")
-            if keys:
-                deleted = redis_client.delete(*keys)
+            # Инкрементальный SCAN + UNLINK пачками вместо блокирующего KEYS
+            deleted = 0
+            batch = []
+            for key in redis_client.scan_iter(match="user_cache:*", count=UserCache.SCAN_BATCH):
+                batch.append(key)
+                if len(batch) >= UserCache.SCAN_BATCH:
+                    deleted += redis_client.unlink(*batch)
+                    batch = []
+            if batch:
+                deleted += redis_client.unlink(*batch)
+            if deleted:
                 logger.info(f"Invalidated {deleted} user cache entries")
                 return deleted
         except Exception as e:
             logger.warning(f"Error invalidating all user cache: {e}")
+        finally:
+            UserCache._publish_invalidation()
             
         return 0
     
@@ -150,11 +204,15 @@ class UserCache:
             return {"status": "disabled", "keys": 0}
             
         try:
-            keys = redis_client.keys("user_cache:*")
+            keys = sum(
+                1 for _ in redis_client.scan_iter(match="user_cache:*", count=UserCache.SCAN_BATCH)
+            )
+            local = get_local_cache(UserCache.NAMESPACE)
             return {
                 "status": "active",
-                "keys": len(keys),
-                "redis_connected": True
+                "keys": keys,
+                "redis_connected": True,
+                "local_cache": local.stats() if local is not None else None
             }
         except Exception as e:
             return {
@@ -0,0 +1,232 @@
+"""
+👁️ View Counter
+Write-behind счетчик просмотров карточек цветов: инкремент в памяти воркера,
+агрегация в Redis (HINCRBY) и периодический сброс в flowers.views_count
+одним батчевым UPDATE
+"""
+
+import re
+import asyncio
+import logging
+from collections import Counter
+from typing import Dict, Optional
+
+from sqlalchemy import Integer, column, update, values
+
+from app.core.config import settings
+from app.core.redis import redis_manager
+from app.core.local_cache import WORKER_ID
+from app.core.database import AsyncSessionLocal
+from app.models.flower import Flower
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = "views:pending"
+# Общий ключ: RENAME pending -> flushing атомарно забирает накопленное. Пачку,
+# оставшуюся от упавшего посреди сброса воркера, подберет следующий сброс
+FLUSHING_KEY = "views:flushing"
+# Сбрасывает один воркер за раз; аренда истекает, если держатель упал
+FLUSH_LOCK_KEY = "views:flush_lock"
+FLUSH_LEASE_SECONDS = 60
+
+RELEASE_LOCK_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# Пачка прежнего ключа views:flushing:{worker} - обратно в pending одним
+# атомарным вызовом: одновременно стартовавшие воркеры не засчитают ее дважды
+ADOPT_BATCH_LUA = """
+local batch = redis.call('HGETALL', KEYS[1])
+for i = 1, #batch, 2 do
+    redis.call('HINCRBY', KEYS[2], batch[i], batch[i + 1])
+end
+return redis.call('DEL', KEYS[1])
+"""
+
+
+class ViewCounter:
+    """
+    Просмотры не трогают БД на горячем пути
+    
+    record() - O(1) в памяти. Раз в VIEW_COUNTER_FLUSH_INTERVAL секунд
+    дельты воркера уходят в Redis (общий HASH всех воркеров), затем
+    накопленный HASH забирается RENAME'ом и применяется одним UPDATE.
+    Без Redis дельты сбрасываются в БД напрямую из памяти воркера.
+    Если UPDATE не прошел или воркер упал до DELETE, забранный HASH
+    остается под общим ключом и повторяется следующим сбросом любого
+    воркера (at-least-once).
+    """
+    
+    def __init__(self, flush_interval: float = 10.0):
+        self.flush_interval = flush_interval
+        self._deltas: Counter = Counter()
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+    
+    def record(self, flower_id: int, count: int = 1) -> None:
+        self._deltas[flower_id] += count
+    
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        await self._adopt_legacy_batches()
+        self._task = asyncio.create_task(self._run())
+    
+    @staticmethod
+    async def _adopt_legacy_batches() -> None:
+        """Пачки прежних ключей views:flushing:{worker} - обратно в pending"""
+        client = redis_manager.redis_client
+        if client is None:
+            return
+        try:
+            async for key in client.scan_iter(match=f"{FLUSHING_KEY}:*", count=1000):
+                await client.eval(ADOPT_BATCH_LUA, 2, key, PENDING_KEY)
+        except Exception as e:
+            logger.warning(f"View counter legacy batch adoption error: {e}")
+    
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Последний сброс, чтобы не терять просмотры при рестарте
+        await self.flush()
+    
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning(f"View counter flush error: {e}")
+    
+    def _take_local(self) -> Dict[int, int]:
+        deltas, self._deltas = self._deltas, Counter()
+        return dict(deltas)
+    
+    def _restore_local(self, deltas: Dict[int, int]) -> None:
+        self._deltas.update(deltas)
+    
+    async def flush(self) -> int:
+        """Сбрасывает накопленные просмотры в БД, возвращает число обновленных цветов"""
+        async with self._lock:
+            deltas = self._take_local()
+            client = redis_manager.redis_client
+            if client is None:
+                return await self._apply_local(deltas)
+            
+            if deltas:
+                try:
+                    pipe = client.pipeline(transaction=False)
+                    for flower_id, delta in deltas.items():
+                        pipe.hincrby(PENDING_KEY, flower_id, delta)
+                    await pipe.execute()
+                except Exception as e:
+                    # Redis недоступен - пишем дельты воркера напрямую
+                    logger.warning(f"View counter Redis error: {e}")
+                    return await self._apply_local(deltas)
+            
+            try:
+                if not await client.set(FLUSH_LOCK_KEY, WORKER_ID, nx=True, ex=FLUSH_LEASE_SECONDS):
+                    # Сбрасывает другой воркер - дельты уже в Redis
+                    return 0
+            except Exception as e:
+                logger.debug(f"View counter batch skipped: {e}")
+                return 0
+            
+            try:
+                return await self._flush_batch(client)
+            finally:
+                try:
+                    await client.eval(RELEASE_LOCK_LUA, 1, FLUSH_LOCK_KEY, WORKER_ID)
+                except Exception as e:
+                    logger.debug(f"View counter lock release error: {e}")
+    
+    async def _flush_batch(self, client) -> int:
+        """Под арендой: остаток прошлого сброса (неудачный UPDATE, упавший воркер) - до новых дельт"""
+        try:
+            if not await client.exists(FLUSHING_KEY):
+                if not await client.exists(PENDING_KEY):
+                    return 0
+                await client.rename(PENDING_KEY, FLUSHING_KEY)
+            batch = await client.hgetall(FLUSHING_KEY)
+        except Exception as e:
+            # Redis отвалился - дельты уже в Redis, уйдут следующим сбросом
+            logger.debug(f"View counter batch skipped: {e}")
+            return 0
+        
+        updated = await self._apply({int(key): int(value) for key, value in batch.items()})
+        await client.delete(FLUSHING_KEY)
+        return updated
+    
+    async def _apply_local(self, deltas: Dict[int, int]) -> int:
+        try:
+            return await self._apply(deltas)
+        except Exception:
+            self._restore_local(deltas)
+            raise
+    
+    @staticmethod
+    async def _apply(deltas: Dict[int, int]) -> int:
+        """UPDATE flowers SET views_count = views_count + v.delta FROM (VALUES ...) v WHERE id = v.id"""
+        deltas = {flower_id: delta for flower_id, delta in deltas.items() if delta}
+        if not deltas:
+            return 0
+        batch = values(
+            column("id", Integer),
+            column("delta", Integer),
+            name="view_deltas"
+        ).data(sorted(deltas.items()))
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(Flower)
+                .where(Flower.id == batch.c.id)
+                # updated_at не трогаем: просмотр - не изменение карточки (onupdate)
+                .values(views_count=Flower.views_count + batch.c.delta, updated_at=Flower.updated_at)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+        logger.debug(f"Flushed views for {len(deltas)} flowers")
+        return len(deltas)
+
+
+class ViewCountMiddleware:
+    """
+    Считает просмотры карточки до HTTP-кэша: регистрируется снаружи
+    CacheMiddleware, поэтому просмотр засчитывается и при ответе из кэша
+    (200 или 304), а сам GET /flowers/{id} остается кэшируемым
+    """
+    
+    PATH_PATTERN = re.compile(rf"^{re.escape(settings.API_V1_STR)}/flowers/(\d+)/?$")
+    COUNTED_STATUSES = {200, 304}
+    
+    def __init__(self, app, counter: Optional[ViewCounter] = None):
+        self.app = app
+        self.counter = counter or view_counter
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+        match = self.PATH_PATTERN.match(scope["path"])
+        if match is None:
+            await self.app(scope, receive, send)
+            return
+        
+        flower_id = int(match.group(1))
+        
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] in self.COUNTED_STATUSES:
+                self.counter.record(flower_id)
+            await send(message)
+        
+        await self.app(scope, receive, send_wrapper)
+
+
+view_counter = ViewCounter(flush_interval=settings.VIEW_COUNTER_FLUSH_INTERVAL)
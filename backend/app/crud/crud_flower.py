@@ -1,7 +1,17 @@
+from sqlalchemy import Row, Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Sequence
+from app.core.search import flower_search
+from app.core.serializers import FLOWER_LIST_COLUMNS, FLOWER_DETAIL_COLUMNS
 from app.models.flower import Flower, FlowerCategory
 
+# Кнопки меню Telegram-бота: только id, название и цена
+FLOWER_MENU_COLUMNS = (Flower.id, Flower.name, Flower.price)
+
+# Индекс сезонности: карточка списка + границы сезона
+FLOWER_SEASON_COLUMNS = FLOWER_LIST_COLUMNS + (Flower.season_start, Flower.season_end)
+
 class CRUDFlower:
     def get(self, db: Session, flower_id: int) -> Optional[Flower]:
         """Получить цветок по ID"""
@@ -20,5 +30,70 @@ class CRUDFlower:
     def get_all(self, db: Session, skip: int = 0, limit: int = 10) -> List[Flower]:
         """Получить все цветы"""
         return db.query(Flower).offset(skip).limit(limit).all()
+    
+    def get_menu_by_category(self, db: Session, category: str, limit: int = 10) -> List[Row]:
+        """Цветы категории для меню бота (проекция FLOWER_MENU_COLUMNS)"""
+        try:
+            category = FlowerCategory(category)
+        except ValueError:
+            pass
+        return db.execute(
+            select(*FLOWER_MENU_COLUMNS).where(Flower.category == category).limit(limit)
+        ).all()
+    
+    # Проекции для API: строки без гидрации ORM и без Text-колонок в списках
+    
+    def list_query(
+        self,
+        category: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        available_only: bool = True,
+        search: Optional[str] = None
+    ) -> Select:
+        """select() проекции FLOWER_LIST_COLUMNS с фильтрами каталога (сортировку задает вызывающий)"""
+        query = select(*FLOWER_LIST_COLUMNS)
+        if category:
+            query = query.where(Flower.category == FlowerCategory(category))
+        if min_price is not None:
+            query = query.where(Flower.price >= min_price)
+        if max_price is not None:
+            query = query.where(Flower.price <= max_price)
+        if available_only:
+            query = query.where(Flower.is_available == True)
+        if search:
+            # tsvector + GIN (стемминг) или триграммы по названию (опечатки)
+            query = query.where(flower_search.match(search))
+        return query
+    
+    async def list_by_ids(self, db: AsyncSession, flower_ids: Sequence[int]) -> List[Row]:
+        """Строки списка по id (порядок не гарантирован)"""
+        if not flower_ids:
+            return []
+        return (await db.execute(
+            select(*FLOWER_LIST_COLUMNS).where(Flower.id.in_(flower_ids))
+        )).all()
+    
+    async def list_popular(self, db: AsyncSession, limit: int = 10) -> List[Row]:
+        """Доступные цветы по orders_count"""
+        return (await db.execute(
+            select(*FLOWER_LIST_COLUMNS)
+            .where(Flower.is_available == True)
+            .order_by(Flower.orders_count.desc(), Flower.id)
+            .limit(limit)
+        )).all()
+    
+    async def list_seasonal(self, db: AsyncSession, flower_ids: Optional[Sequence[int]] = None) -> List[Row]:
+        """Сезонные цветы с границами сезона (все или только flower_ids)"""
+        query = select(*FLOWER_SEASON_COLUMNS).where(Flower.is_seasonal == True)
+        if flower_ids is not None:
+            query = query.where(Flower.id.in_(flower_ids))
+        return (await db.execute(query)).all()
+    
+    async def get_detail(self, db: AsyncSession, flower_id: int) -> Optional[Row]:
+        """Полная карточка (проекция FLOWER_DETAIL_COLUMNS, без search_vector)"""
+        return (await db.execute(
+            select(*FLOWER_DETAIL_COLUMNS).where(Flower.id == flower_id)
+        )).first()
 
 crud_flower = CRUDFlower() 
\ No newline at end of file
@@ -1,6 +1,19 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload, selectinload
 from typing import List, Optional
-from app.models.order import Order
+from app.models.order import Order, OrderItem, OrderStatus, PaymentStatus
+
+# Проекция для списка заказов (схема OrderList) - без адресов, заметок и позиций
+ORDER_LIST_COLUMNS = (
+    Order.id,
+    Order.order_number,
+    Order.status,
+    Order.payment_status,
+    Order.total_amount,
+    Order.delivery_date,
+    Order.created_at,
+)
 
 class CRUDOrder:
     def get(self, db: Session, order_id: int) -> Optional[Order]:
@@ -10,5 +23,46 @@ class CRUDOrder:
     def get_by_user(self, db: Session, user_id: int, limit: int = 10) -> List[Order]:
         """Получить заказы пользователя"""
         return db.query(Order).filter(Order.user_id == user_id).limit(limit).all()
+    
+    def select_orders(self, items: bool = False, flowers: bool = False, user: bool = False) -> Select:
+        """
+        select(Order) с явной загрузкой связей - в AsyncSession lazy load недоступен
+        items: позиции (selectin - один IN-запрос на всю страницу, как нужно OrderSchema)
+        flowers: позиции + их цветы (JOIN внутри того же IN-запроса)
+        user: покупатель (JOIN в основном запросе, many-to-one)
+        """
+        query = select(Order)
+        if items or flowers:
+            loader = selectinload(Order.order_items)
+            if flowers:
+                loader = loader.joinedload(OrderItem.flower)
+            query = query.options(loader)
+        if user:
+            query = query.options(joinedload(Order.user))
+        return query
+    
+    async def reload(self, db: AsyncSession, order: Order, **loaders) -> Order:
+        """Перечитывает заказ после COMMIT вместе со связями (вместо refresh + lazy load)"""
+        return await db.scalar(
+            self.select_orders(**loaders)
+            .where(Order.id == order.id)
+            .execution_options(populate_existing=True)
+        )
+    
+    def list_query(
+        self,
+        user_id: Optional[int] = None,
+        status: Optional[OrderStatus] = None,
+        payment_status: Optional[PaymentStatus] = None
+    ) -> Select:
+        """select() проекции ORDER_LIST_COLUMNS с фильтрами (сортировку задает вызывающий)"""
+        query = select(*ORDER_LIST_COLUMNS)
+        if user_id is not None:
+            query = query.where(Order.user_id == user_id)
+        if status:
+            query = query.where(Order.status == status)
+        if payment_status:
+            query = query.where(Order.payment_status == payment_status)
+        return query
 
 crud_order = CRUDOrder() 
\ No newline at end of file
@@ -6,7 +6,7 @@ from jose import JWTError, jwt
 
 from app.core.config import settings
 from app.core.database import get_db
-from app.core.security import verify_token, is_user_blacklisted
+from app.core.security import verify_token, is_token_version_revoked
 from app.core.user_cache import UserCache
 from app.models.user import User, UserRole
 
@@ -37,7 +37,7 @@ def get_current_user(
             raise credentials_exception
             
         # ✅ НОВАЯ ПРОВЕРКА: User blacklist
-        if is_user_blacklisted(user_id):
+        if is_token_version_revoked(int(user_id), payload.get("tv")):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="User access revoked"
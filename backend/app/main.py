@@ -1,15 +1,26 @@
-from fastapi import FastAPI, Request
+from fastapi import Depends, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
 import structlog
 import time
-from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
-from prometheus_client import REGISTRY
+from prometheus_client import CONTENT_TYPE_LATEST
 
 from app.core.config import settings
-from app.core.database import init_db
+from app.core.database import init_db, engine, async_engine
 from app.core.redis import redis_manager
+from app.core.local_cache import invalidation_bus
+from app.core.revocation import token_revocation
+from app.core.passwords import password_hasher
+from app.core.cache import CacheMiddleware
+from app.core.rate_limiter import RateLimitHeadersMiddleware, admit_cached_request, enforce_rate_limits
+from app.core.local_rate_limiter import local_admission
+from app.core.view_counter import ViewCountMiddleware, view_counter
+from app.core import sql_instrumentation
+from app.core.sql_instrumentation import SqlInstrumentationMiddleware
+from app.core.metrics import MetricsMiddleware, metrics_payload, request_metrics
+from app.services.popularity import popularity_engine
+from app.services.seasonal import seasonal_index
 from app.api.v1.api import api_router
 
 # Configure structured logging
@@ -33,10 +44,6 @@ structlog.configure(
 
 logger = structlog.get_logger()
 
-# Prometheus metrics
-REQUEST_COUNT = Counter('http_requests_total', 'Total HTTP requests', ['method', 'endpoint', 'status'])
-REQUEST_LATENCY = Histogram('http_request_duration_seconds', 'HTTP request latency')
-
 # Create FastAPI app
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -44,8 +51,37 @@ app = FastAPI(
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
     docs_url=f"{settings.API_V1_STR}/docs",
     redoc_url=f"{settings.API_V1_STR}/redoc",
+    default_response_class=ORJSONResponse,
+    # Route-template rate limits (ROUTE_LIMITS): one async check before endpoint dependencies
+    dependencies=[Depends(enforce_rate_limits)],
 )
 
+# HTTP response cache for public catalog endpoints (innermost, behind CORS).
+# Hits never reach the router, so rate limits are checked by the middleware itself
+if settings.HTTP_CACHE_ENABLED:
+    app.add_middleware(
+        CacheMiddleware,
+        cache_ttl=settings.HTTP_CACHE_TTL,
+        max_body_size=settings.HTTP_CACHE_MAX_BODY,
+        admission=admit_cached_request
+    )
+
+# X-RateLimit-* headers from request.state on every response (outside the cache, so never stored)
+app.add_middleware(RateLimitHeadersMiddleware)
+
+# Flower view counting in front of the HTTP cache (cache hits are counted too)
+if settings.VIEW_COUNTER_ENABLED:
+    app.add_middleware(ViewCountMiddleware)
+
+# SQL statements / DB time per route; outside the HTTP cache (hits record 0 queries)
+if settings.SQL_INSTRUMENTATION_ENABLED:
+    sql_instrumentation.install(engine, async_engine.sync_engine)
+    app.add_middleware(
+        SqlInstrumentationMiddleware,
+        n_plus_one_threshold=settings.SQL_N_PLUS_ONE_THRESHOLD,
+        server_timing=settings.SQL_SERVER_TIMING
+    )
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -53,6 +89,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "X-RateLimit-Limit", "X-RateLimit-Remaining", "X-RateLimit-Reset"],
 )
 
 # Add trusted host middleware
@@ -61,6 +98,9 @@ app.add_middleware(
     allowed_hosts=["*"]  # Configure properly for production
 )
 
+# Request counters and latency histograms (Prometheus + per-worker aggregator flushed to Redis)
+app.add_middleware(MetricsMiddleware)
+
 # Request logging middleware
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
@@ -83,14 +123,6 @@ async def log_requests(request: Request, call_next):
         user_agent=request.headers.get("user-agent"),
     )
     
-    # Update metrics
-    REQUEST_COUNT.labels(
-        method=request.method,
-        endpoint=request.url.path,
-        status=response.status_code
-    ).inc()
-    REQUEST_LATENCY.observe(latency)
-    
     return response
 
 
@@ -115,10 +147,11 @@ async def health_check():
     return {"status": "healthy", "timestamp": time.time()}
 
 
-# Metrics endpoint for Prometheus
+# Metrics endpoint for Prometheus (text format; sums all workers in multiprocess mode).
+# Sync on purpose: collecting from multiprocess files is disk I/O, so it runs in the threadpool
 @app.get("/metrics")
-async def metrics():
-    return generate_latest(REGISTRY)
+def metrics():
+    return Response(metrics_payload(), headers={"Content-Type": CONTENT_TYPE_LATEST})
 
 
 # Include API router
@@ -138,6 +171,32 @@ async def startup_event():
     await redis_manager.connect()
     logger.info("Redis connected")
     
+    # Subscribe to L1 cache invalidations from other workers
+    await invalidation_bus.start()
+    
+    # Local replica of token revocations (updates arrive over the invalidation bus)
+    await token_revocation.start()
+    
+    # Batched flush of request metrics to Redis
+    await request_metrics.start()
+    
+    # Rate limit blocks shared between workers (local pre-admission tier)
+    if settings.RATE_LIMIT_LOCAL_ENABLED:
+        await local_admission.start()
+    
+    # bcrypt process pool (spawned up front so the first login does not wait)
+    await password_hasher.start()
+    
+    # Popularity ranking (rebuilt only when missing in Redis)
+    await popularity_engine.ensure_ranking()
+    
+    # Seasonal index (day of year -> flowers), rebuilt daily
+    await seasonal_index.start()
+    
+    # Periodic batched flush of flower views
+    if settings.VIEW_COUNTER_ENABLED:
+        await view_counter.start()
+    
     logger.info("Application startup complete")
 
 
@@ -146,10 +205,25 @@ async def startup_event():
 async def shutdown_event():
     logger.info("Shutting down Flower Subscription Service")
     
+    await invalidation_bus.stop()
+    await token_revocation.stop()
+    await password_hasher.stop()
+    await local_admission.stop()
+    await seasonal_index.stop()
+    
+    # Final flush of buffered views (needs Redis and DB, so before disconnect)
+    if settings.VIEW_COUNTER_ENABLED:
+        await view_counter.stop()
+    
+    # Final flush of request metrics (needs Redis, so before disconnect)
+    await request_metrics.stop()
+    
     # Disconnect from Redis
     await redis_manager.disconnect()
     logger.info("Redis disconnected")
     
+    await async_engine.dispose()
+    
     logger.info("Application shutdown complete")
 
 
@@ -1,4 +1,6 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, Text, Enum
+from sqlalchemy import Column, Index, Integer, String, Boolean, DateTime, Float, Text, Enum, Computed
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred
 from sqlalchemy.sql import func
 from app.core.database import Base
 import enum
@@ -15,8 +17,25 @@ class FlowerCategory(str, enum.Enum):
     OTHER = "other"
 
 
+# Конфигурация полнотекстового поиска (стемминг русского языка)
+SEARCH_CONFIG = "russian"
+
+# Вес A - название, B - теги, C - описание
+SEARCH_VECTOR_SQL = (
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(name, '')), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(tags, '')), 'B') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(description, '')), 'C')"
+)
+
+
 class Flower(Base):
     __tablename__ = "flowers"
+    # Составные индексы для keyset-пагинации (seek по (sort, id))
+    __table_args__ = (
+        Index("ix_flowers_name_id", "name", "id"),
+        Index("ix_flowers_price_id", "price", "id"),
+        Index("ix_flowers_orders_count_id", "orders_count", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), nullable=False, index=True)
@@ -44,5 +63,26 @@ class Flower(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), onupdate=func.now(), nullable=True)
     
+    # Full-text search: генерируемая колонка, Postgres пересчитывает ее при INSERT/UPDATE
+    # (deferred - не грузится вместе с обычными запросами)
+    search_vector = deferred(Column(TSVECTOR, Computed(SEARCH_VECTOR_SQL, persisted=True)))
+    
     def __repr__(self):
-        return f"<Flower(id={self.id}, name='{self.name}', price={self.price})>" 
\ No newline at end of file
+        return f"<Flower(id={self.id}, name='{self.name}', price={self.price})>" 
+
+
+# Поисковые индексы (обновляются Postgres инкрементально при каждой записи)
+# ddl_if: GIN, триграммы и COLLATE "C" есть только в Postgres - другие диалекты их пропускают
+FLOWER_SEARCH_INDEXES = tuple(index.ddl_if(dialect="postgresql") for index in (
+    # Ранжированный полнотекстовый поиск: search_vector @@ tsquery
+    Index("ix_flowers_search_vector", Flower.search_vector, postgresql_using="gin"),
+    # Опечатки: word_similarity по триграммам (name %> :query), нужен pg_trgm
+    Index(
+        "ix_flowers_name_trgm",
+        Flower.name,
+        postgresql_using="gin",
+        postgresql_ops={"name": "gin_trgm_ops"}
+    ),
+    # Автодополнение: диапазон по lower(name) в побайтовом порядке (COLLATE "C")
+    Index("ix_flowers_name_prefix", func.lower(Flower.name).collate("C")),
+))
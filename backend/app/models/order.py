@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, Text, Enum, ForeignKey
+from sqlalchemy import Column, Index, Integer, String, Boolean, DateTime, Float, Text, Enum, ForeignKey
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.core.database import Base
@@ -29,6 +29,10 @@ class DeliverySlot(str, enum.Enum):
 
 class Order(Base):
     __tablename__ = "orders"
+    # Составные индексы для keyset-пагинации (seek по (sort, id))
+    __table_args__ = (
+        Index("ix_orders_created_at_id", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     order_number = Column(String(50), unique=True, index=True, nullable=False)
@@ -1,5 +1,5 @@
 from typing import Optional, List
-from pydantic import BaseModel
+from pydantic import AliasChoices, BaseModel, Field
 from datetime import datetime
 from app.models.order import OrderStatus, PaymentStatus, DeliverySlot
 
@@ -79,7 +79,8 @@ class OrderInDB(OrderBase):
 
 
 class Order(OrderInDB):
-    items: List[OrderItem] = []
+    # ORM-связь называется order_items; загружается явно (crud_order.select_orders)
+    items: List[OrderItem] = Field(default=[], validation_alias=AliasChoices("items", "order_items"))
 
 
 class OrderList(BaseModel):
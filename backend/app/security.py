@@ -7,13 +7,6 @@ from app.core.config import settings
 # Password hashing context
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-# ✅ НОВАЯ ФУНКЦИОНАЛЬНОСТЬ: Redis для blacklist токенов
-try:
-    import redis
-    redis_client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
-except ImportError:
-    redis_client = None
-
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create JWT access token"""
@@ -55,94 +48,29 @@ def verify_token(token: str) -> Optional[dict]:
 
 def revoke_token(token: str) -> bool:
     """
-    ✅ НОВАЯ ФУНКЦИЯ: Добавить токен в blacklist
-    Возвращает True если успешно добавлен в blacklist
+    Добавить токен в blacklist
+    Общий ZSET отозванных токенов (app.core.security), а не token_blacklist:*
     """
-    if not redis_client:
-        return False
-        
-    try:
-        # Декодируем токен чтобы получить exp время
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        exp = payload.get('exp')
-        
-        if exp:
-            current_time = int(datetime.utcnow().timestamp())
-            ttl = exp - current_time
-            
-            if ttl > 0:
-                # Добавляем в blacklist до времени истечения
-                redis_client.setex(f"token_blacklist:{token}", ttl, "revoked")
-                return True
-                
-    except Exception as e:
-        # Логируем ошибку но не прерываем выполнение
-        print(f"Error revoking token: {e}")
-        
-    return False
+    from app.core.security import revoke_token as revoke_by_digest
+    return revoke_by_digest(token)
 
 
 def is_token_blacklisted(token: str) -> bool:
     """
-    ✅ НОВАЯ ФУНКЦИЯ: Проверить находится ли токен в blacklist
+    Проверить находится ли токен в blacklist
+    Локальная реплика отзывов (app.core.security), без обращения к Redis
     """
-    if not redis_client:
-        return False
-        
-    try:
-        return redis_client.exists(f"token_blacklist:{token}") > 0
-    except Exception:
-        # При ошибке Redis считаем токен валидным (fail-open)
-        return False
+    from app.core.security import is_token_blacklisted as is_revoked
+    return is_revoked(token)
 
 
 def revoke_all_user_tokens(user_id: int) -> int:
     """
-    ✅ НОВАЯ ФУНКЦИЯ: Отозвать все токены пользователя
-    Возвращает количество отозванных токенов
+    Отозвать все токены пользователя
+    O(1) через версию токенов (app.core.security), без обхода KEYS token_blacklist:*
     """
-    if not redis_client:
-        return 0
-        
-    try:
-        # Находим все активные токены пользователя
-        pattern = f"token_blacklist:*"
-        keys = redis_client.keys(pattern)
-        
-        revoked_count = 0
-        for key in keys:
-            try:
-                token = key.replace("token_blacklist:", "")
-                payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-                
-                if payload.get("sub") == user_id:
-                    # Этот токен уже в blacklist, пропускаем
-                    continue
-                    
-            except JWTError:
-                continue
-        
-        # Альтернативный подход: добавляем user_id в blacklist пользователей
-        # Это проще но менее гранулярно
-        redis_client.setex(f"user_blacklist:{user_id}", 3600 * 24 * 7, "all_tokens_revoked")
-        return 1
-        
-    except Exception as e:
-        print(f"Error revoking user tokens: {e}")
-        return 0
-
-
-def is_user_blacklisted(user_id: int) -> bool:
-    """
-    ✅ НОВАЯ ФУНКЦИЯ: Проверить заблокирован ли пользователь
-    """
-    if not redis_client:
-        return False
-        
-    try:
-        return redis_client.exists(f"user_blacklist:{user_id}") > 0
-    except Exception:
-        return False
+    from app.core.security import revoke_all_user_tokens as revoke_by_version
+    return revoke_by_version(user_id)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
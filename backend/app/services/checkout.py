@@ -0,0 +1,229 @@
+"""
+🛒 Checkout
+Оформление заказа одной транзакцией: все цветы одним IN-запросом под
+SELECT ... FOR UPDATE, проверка и списание остатков, заказ + bulk insert позиций.
+Любая отмена заказа (клиент, админ, доставка, webhook) идет через
+cancel_order() - остатки возвращаются ровно один раз; возврат из отмены -
+через reopen_order(), остатки списываются заново
+"""
+
+import uuid
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.auth import Principal
+from app.crud.crud_order import crud_order
+from app.models.flower import Flower
+from app.models.order import Order, OrderItem, OrderStatus
+from app.schemas.order import OrderCreate
+from app.services.popularity import PopularityChange, popularity_engine
+
+logger = logging.getLogger(__name__)
+
+FREE_DELIVERY_THRESHOLD = 1000
+DELIVERY_FEE = 200
+
+# Товар еще на складе: отмена возвращает остатки. Отгруженный заказ
+# (DELIVERING, DELIVERED) админ отменить не может
+CANCELLABLE_STATUSES = frozenset({OrderStatus.PENDING, OrderStatus.CONFIRMED, OrderStatus.PREPARING})
+
+
+def generate_order_number() -> str:
+    return f"FL-{datetime.now().strftime('%Y%m%d')}-{str(uuid.uuid4())[:8].upper()}"
+
+
+class CheckoutService:
+    """
+    Размещение заказов без overselling
+    
+    Строки flowers блокируются в порядке id, поэтому параллельные
+    checkout'ы с пересекающимися корзинами ждут друг друга, а не
+    взаимоблокируются. Остаток проверяется уже под блокировкой.
+    """
+    
+    @staticmethod
+    def _requested_quantities(order_in: OrderCreate) -> Dict[int, int]:
+        """Суммарное количество по каждому цветку (одна позиция может повторяться)"""
+        quantities: Dict[int, int] = OrderedDict()
+        for item in order_in.items:
+            quantities[item.flower_id] = quantities.get(item.flower_id, 0) + item.quantity
+        return quantities
+    
+    async def _lock_flowers(self, db: AsyncSession, flower_ids: List[int]) -> Dict[int, Flower]:
+        rows = (await db.scalars(
+            select(Flower)
+            .where(Flower.id.in_(flower_ids))
+            .order_by(Flower.id)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        )).all()
+        return {flower.id: flower for flower in rows}
+    
+    @staticmethod
+    def _validate(order_in: OrderCreate, flowers: Dict[int, Flower], quantities: Dict[int, int]) -> None:
+        for item in order_in.items:
+            flower = flowers.get(item.flower_id)
+            if not flower:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Flower {item.flower_id} not found"
+                )
+            
+            if not flower.is_available:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Flower {flower.name} is not available"
+                )
+            
+            if item.quantity < flower.min_order_quantity:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Minimum quantity for {flower.name} is {flower.min_order_quantity}"
+                )
+            
+            if item.quantity > flower.max_order_quantity:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Maximum quantity for {flower.name} is {flower.max_order_quantity}"
+                )
+        
+        for flower_id, quantity in quantities.items():
+            flower = flowers[flower_id]
+            if flower.stock_quantity < quantity:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail=f"Not enough {flower.name} in stock: {flower.stock_quantity} left"
+                )
+    
+    async def place_order(self, db: AsyncSession, user: Principal, order_in: OrderCreate) -> Order:
+        """Создает заказ и списывает остатки атомарно (один COMMIT)"""
+        quantities = self._requested_quantities(order_in)
+        if not quantities:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Order has no items"
+            )
+        
+        try:
+            flowers = await self._lock_flowers(db, sorted(quantities))
+            self._validate(order_in, flowers, quantities)
+            
+            subtotal = 0
+            item_rows = []
+            for item in order_in.items:
+                flower = flowers[item.flower_id]
+                item_total = flower.price * item.quantity
+                subtotal += item_total
+                item_rows.append({
+                    "flower_id": item.flower_id,
+                    "quantity": item.quantity,
+                    "unit_price": flower.price,
+                    "total_price": item_total,
+                    "notes": item.notes
+                })
+            
+            # Списание под блокировкой; flush отправит UPDATE пачкой (executemany)
+            for flower_id, quantity in quantities.items():
+                flowers[flower_id].stock_quantity -= quantity
+            
+            delivery_fee = 0 if subtotal > FREE_DELIVERY_THRESHOLD else DELIVERY_FEE
+            order = Order(
+                order_number=generate_order_number(),
+                user_id=user.id,
+                subscription_id=order_in.subscription_id,
+                delivery_address=order_in.delivery_address,
+                delivery_date=order_in.delivery_date,
+                delivery_slot=order_in.delivery_slot,
+                delivery_instructions=order_in.delivery_instructions,
+                customer_notes=order_in.customer_notes,
+                subtotal=subtotal,
+                delivery_fee=delivery_fee,
+                total_amount=subtotal + delivery_fee
+            )
+            db.add(order)
+            await db.flush()
+            
+            for row in item_rows:
+                row["order_id"] = order.id
+            await db.execute(insert(OrderItem), item_rows)
+            
+            await db.commit()
+        except Exception:
+            # Отпускаем блокировки сразу, не дожидаясь закрытия сессии
+            await db.rollback()
+            raise
+        
+        # Позиции и серверные default'ы (created_at) - одним перечитыванием
+        return await crud_order.reload(db, order, items=True)
+    
+    @staticmethod
+    async def _order_quantities(db: AsyncSession, order: Order) -> Dict[int, int]:
+        rows = (await db.execute(
+            select(OrderItem.flower_id, OrderItem.quantity).where(OrderItem.order_id == order.id)
+        )).all()
+        quantities: Dict[int, int] = {}
+        for flower_id, quantity in rows:
+            quantities[flower_id] = quantities.get(flower_id, 0) + quantity
+        return quantities
+    
+    async def release_stock(self, db: AsyncSession, order: Order) -> None:
+        """Возвращает остатки отмененного заказа (в транзакции вызывающего)"""
+        quantities = await self._order_quantities(db, order)
+        for flower_id in sorted(quantities):
+            await db.execute(
+                update(Flower)
+                .where(Flower.id == flower_id)
+                .values(stock_quantity=Flower.stock_quantity + quantities[flower_id])
+                .execution_options(synchronize_session=False)
+            )
+    
+    async def cancel_order(self, db: AsyncSession, order: Order) -> Optional[PopularityChange]:
+        """
+        Переводит заказ в CANCELLED в транзакции вызывающего
+        
+        Строка заказа блокируется FOR UPDATE, старый статус читается уже под
+        блокировкой: из параллельных отмен остатки вернет только первая.
+        Результат передается в popularity_engine.publish() после COMMIT
+        """
+        old_status = await db.scalar(
+            select(Order.status).where(Order.id == order.id).with_for_update()
+        )
+        order.status = OrderStatus.CANCELLED
+        if old_status != OrderStatus.CANCELLED:
+            await self.release_stock(db, order)
+        return await popularity_engine.apply_status_change(db, order, old_status)
+    
+    async def reopen_order(
+        self,
+        db: AsyncSession,
+        order: Order,
+        new_status: OrderStatus
+    ) -> Optional[PopularityChange]:
+        """
+        CANCELLED -> new_status в транзакции вызывающего (заказ уже под FOR UPDATE):
+        остатки списываются заново под блокировкой цветов, 409 - если их не хватает
+        """
+        quantities = await self._order_quantities(db, order)
+        flowers = await self._lock_flowers(db, sorted(quantities))
+        for flower_id, quantity in quantities.items():
+            flower = flowers.get(flower_id)
+            if flower is None or flower.stock_quantity < quantity:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail=f"Not enough stock to reopen order: flower {flower_id}"
+                )
+        for flower_id, quantity in quantities.items():
+            flowers[flower_id].stock_quantity -= quantity
+        
+        old_status = order.status
+        order.status = new_status
+        return await popularity_engine.apply_status_change(db, order, old_status)
+
+
+checkout_service = CheckoutService()
@@ -0,0 +1,293 @@
+"""
+🔥 Popularity
+Инкрементальные orders_count и рейтинг популярности в Redis sorted sets:
+за все время и с экспоненциальным затуханием (окна 7d / 30d)
+"""
+
+import enum
+import json
+import math
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import Integer, column, distinct, extract, func, select, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.redis import redis_manager
+from app.core.database import AsyncSessionLocal
+from app.core.serializers import flower_list_item
+from app.crud.crud_flower import crud_flower
+from app.models.flower import Flower
+from app.models.order import Order, OrderItem, OrderStatus
+
+logger = logging.getLogger(__name__)
+
+# Статусы, в которых заказ учитывается в популярности (подтвержден и дальше)
+COUNTED_STATUSES = {
+    OrderStatus.CONFIRMED,
+    OrderStatus.PREPARING,
+    OrderStatus.DELIVERING,
+    OrderStatus.DELIVERED,
+}
+
+
+class PopularityWindow(str, enum.Enum):
+    ALL = "all"    # orders_count за все время
+    WEEK = "7d"    # затухание с tau = 7 дней
+    MONTH = "30d"  # затухание с tau = 30 дней
+
+
+ALL_TIME = PopularityWindow.ALL.value
+
+# Окно -> постоянная затухания tau (секунды); вклад заказа ~ exp(-(now - t) / tau)
+DECAY_WINDOWS = {
+    PopularityWindow.WEEK.value: 7 * 86400,
+    PopularityWindow.MONTH.value: 30 * 86400,
+}
+
+# Forward decay: храним exp((t - EPOCH) / tau), порядок в ZSET тот же, что у
+# exp(-(now - t) / tau), но старые очки не нужно пересчитывать. Запаса double
+# хватает на ~13 лет для tau=7d, потом EPOCH надо сдвинуть и сделать rebuild().
+DECAY_EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp()
+
+RANKING_KEY = "popularity:{window}"
+# Карточка на ключ с TTL: поля, меняющиеся мимо drop_card (views_count из
+# сброса просмотров, остатки и доступность из checkout), устаревают не дольше TTL
+CARD_KEY = "popularity:card:{flower_id}"
+CARD_TTL = 60
+# Прежний HASH карточек без TTL (удаляется при старте)
+LEGACY_CARDS_KEY = "popularity:cards"
+REBUILD_LOCK_KEY = "popularity:rebuild:lock"
+
+
+@dataclass
+class PopularityChange:
+    """Изменение, которое публикуется в Redis после COMMIT"""
+    flower_ids: List[int]
+    sign: int
+    ordered_at: float
+
+
+def _decay_weight(timestamp: float, tau: int) -> float:
+    return math.exp((timestamp - DECAY_EPOCH) / tau)
+
+
+def _as_timestamp(value: Optional[datetime]) -> float:
+    if value is None:
+        return datetime.now(timezone.utc).timestamp()
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class PopularityEngine:
+    """
+    Счетчики обновляются на переходах статуса заказа, без GROUP BY
+    
+    Заказ засчитывается (+1 к orders_count каждого цветка в нем), когда
+    переходит из PENDING/CANCELLED в подтвержденный статус, и снимается (-1)
+    при отмене уже засчитанного. Вклад в окна 7d/30d считается от
+    created_at заказа, поэтому отмена вычитает ровно то, что было добавлено.
+    """
+    
+    @staticmethod
+    def transition_sign(old_status: Optional[OrderStatus], new_status: OrderStatus) -> int:
+        # Статус может прийти строкой (webhook доставки)
+        was_counted = old_status is not None and OrderStatus(old_status) in COUNTED_STATUSES
+        is_counted = OrderStatus(new_status) in COUNTED_STATUSES
+        if is_counted and not was_counted:
+            return 1
+        if was_counted and not is_counted:
+            return -1
+        return 0
+    
+    async def apply_status_change(
+        self,
+        db: AsyncSession,
+        order: Order,
+        old_status: Optional[OrderStatus]
+    ) -> Optional[PopularityChange]:
+        """
+        Обновляет flowers.orders_count в транзакции вызывающего
+        Результат передается в publish() после COMMIT
+        """
+        sign = self.transition_sign(old_status, order.status)
+        if not sign:
+            return None
+        flower_ids = sorted((await db.scalars(
+            select(distinct(OrderItem.flower_id)).where(OrderItem.order_id == order.id)
+        )).all())
+        if not flower_ids:
+            return None
+        await db.execute(
+            update(Flower)
+            .where(Flower.id.in_(flower_ids))
+            .values(orders_count=Flower.orders_count + sign, updated_at=Flower.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+        return PopularityChange(flower_ids, sign, _as_timestamp(order.created_at))
+    
+    async def publish(self, change: Optional[PopularityChange]) -> None:
+        """ZINCRBY в рейтинги; ошибки Redis не ломают смену статуса (rebuild() все выровняет)"""
+        client = redis_manager.redis_client
+        if change is None or client is None:
+            return
+        try:
+            pipe = client.pipeline(transaction=True)
+            for flower_id in change.flower_ids:
+                pipe.zincrby(RANKING_KEY.format(window=ALL_TIME), change.sign, flower_id)
+                for window, tau in DECAY_WINDOWS.items():
+                    weight = change.sign * _decay_weight(change.ordered_at, tau)
+                    pipe.zincrby(RANKING_KEY.format(window=window), weight, flower_id)
+            # orders_count в карточках изменился
+            pipe.delete(*(CARD_KEY.format(flower_id=flower_id) for flower_id in change.flower_ids))
+            await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Popularity publish error: {e}")
+    
+    async def add_flower(self, flower_id: int) -> None:
+        """Новый цветок попадает в рейтинг за все время с нулем"""
+        client = redis_manager.redis_client
+        if client is None:
+            return
+        try:
+            await client.zadd(RANKING_KEY.format(window=ALL_TIME), {flower_id: 0}, nx=True)
+        except Exception as e:
+            logger.warning(f"Popularity add error: {e}")
+    
+    async def drop_card(self, flower_id: int, remove: bool = False) -> None:
+        """Сбрасывает карточку после изменения цветка (remove - и из рейтингов)"""
+        client = redis_manager.redis_client
+        if client is None:
+            return
+        try:
+            pipe = client.pipeline(transaction=False)
+            pipe.delete(CARD_KEY.format(flower_id=flower_id))
+            if remove:
+                for window in [ALL_TIME, *DECAY_WINDOWS]:
+                    pipe.zrem(RANKING_KEY.format(window=window), flower_id)
+            await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Popularity card drop error: {e}")
+    
+    async def top(self, limit: int, window: str = ALL_TIME) -> Optional[List[Dict[str, Any]]]:
+        """
+        Топ доступных цветов: ZREVRANGE + HMGET карточек (O(log n + limit))
+        None - Redis недоступен или рейтинг не построен, нужен fallback на БД
+        """
+        client = redis_manager.redis_client
+        if client is None:
+            return None
+        try:
+            if not await client.exists(RANKING_KEY.format(window=ALL_TIME)):
+                return None
+            # Запас на недоступные цветы
+            fetch = limit * 2
+            ids = await client.zrevrange(RANKING_KEY.format(window=window), 0, fetch - 1)
+            if window != ALL_TIME and len(ids) < fetch:
+                # В окне мало заказов - добираем из рейтинга за все время
+                extra = await client.zrevrange(RANKING_KEY.format(window=ALL_TIME), 0, fetch - 1)
+                seen = set(ids)
+                ids += [flower_id for flower_id in extra if flower_id not in seen]
+            cards = await self._cards(client, [int(flower_id) for flower_id in ids])
+        except Exception as e:
+            logger.warning(f"Popularity read error: {e}")
+            return None
+        return [card for card in cards if card["is_available"]][:limit]
+    
+    async def _cards(self, client, flower_ids: Sequence[int]) -> List[Dict[str, Any]]:
+        if not flower_ids:
+            return []
+        raw = await client.mget([CARD_KEY.format(flower_id=flower_id) for flower_id in flower_ids])
+        cards = {flower_id: json.loads(data) for flower_id, data in zip(flower_ids, raw) if data}
+        missing = [flower_id for flower_id in flower_ids if flower_id not in cards]
+        if missing:
+            # Карточки заполняются лениво одним IN-запросом
+            async with AsyncSessionLocal() as db:
+                rows = await crud_flower.list_by_ids(db, missing)
+            fresh = {row.id: flower_list_item(row) for row in rows}
+            if fresh:
+                pipe = client.pipeline(transaction=False)
+                for flower_id, card in fresh.items():
+                    pipe.setex(CARD_KEY.format(flower_id=flower_id), CARD_TTL, json.dumps(card, ensure_ascii=False))
+                await pipe.execute()
+            cards.update(fresh)
+        return [cards[flower_id] for flower_id in flower_ids if flower_id in cards]
+    
+    async def ensure_ranking(self) -> None:
+        """При старте: строит рейтинги, если их нет в Redis (один воркер под локом)"""
+        client = redis_manager.redis_client
+        if client is None:
+            return
+        try:
+            await client.delete(LEGACY_CARDS_KEY)
+            if await client.exists(RANKING_KEY.format(window=ALL_TIME)):
+                return
+            if not await client.set(REBUILD_LOCK_KEY, "1", nx=True, ex=300):
+                return
+            try:
+                await self.rebuild()
+            finally:
+                await client.delete(REBUILD_LOCK_KEY)
+        except Exception as e:
+            logger.warning(f"Popularity rebuild error: {e}")
+    
+    async def rebuild(self) -> None:
+        """
+        Полный пересчет (дорогой GROUP BY, только при холодном старте):
+        выравнивает flowers.orders_count и заново заполняет рейтинги
+        """
+        async with AsyncSessionLocal() as db:
+            pairs = (
+                select(OrderItem.flower_id, Order.id.label("order_id"), Order.created_at)
+                .join(Order, Order.id == OrderItem.order_id)
+                .where(Order.status.in_(list(COUNTED_STATUSES)))
+                .distinct()
+                .subquery()
+            )
+            epoch_seconds = extract("epoch", pairs.c.created_at)
+            decayed = [
+                func.sum(func.exp((epoch_seconds - DECAY_EPOCH) / tau)).label(window)
+                for window, tau in DECAY_WINDOWS.items()
+            ]
+            rows = (await db.execute(
+                select(pairs.c.flower_id, func.count().label("orders"), *decayed).group_by(pairs.c.flower_id)
+            )).all()
+            counts = {row.flower_id: row.orders for row in rows}
+            catalog = (await db.scalars(select(Flower.id))).all()
+            
+            await db.execute(update(Flower).values(orders_count=0, updated_at=Flower.updated_at))
+            if counts:
+                batch = values(
+                    column("id", Integer),
+                    column("orders", Integer),
+                    name="popularity_counts"
+                ).data(sorted(counts.items()))
+                await db.execute(
+                    update(Flower)
+                    .where(Flower.id == batch.c.id)
+                    .values(orders_count=batch.c.orders, updated_at=Flower.updated_at)
+                    .execution_options(synchronize_session=False)
+                )
+            await db.commit()
+        
+        client = redis_manager.redis_client
+        pipe = client.pipeline(transaction=True)
+        for window in [ALL_TIME, *DECAY_WINDOWS]:
+            pipe.delete(RANKING_KEY.format(window=window))
+        if catalog:
+            # orders_count в карточках изменился
+            pipe.delete(*(CARD_KEY.format(flower_id=flower_id) for flower_id in catalog))
+            pipe.zadd(RANKING_KEY.format(window=ALL_TIME), {flower_id: counts.get(flower_id, 0) for flower_id in catalog})
+        for window in DECAY_WINDOWS:
+            # EXTRACT -> numeric, redis-py не принимает Decimal
+            scores = {row.flower_id: float(row._mapping[window]) for row in rows}
+            if scores:
+                pipe.zadd(RANKING_KEY.format(window=window), scores)
+        await pipe.execute()
+        logger.info(f"Popularity ranking rebuilt: {len(catalog)} flowers, {len(rows)} ordered")
+
+
+popularity_engine = PopularityEngine()
@@ -0,0 +1,186 @@
+"""
+🌷 Seasonal Index
+Предрасчитанный индекс сезонных цветов: день года -> множество id цветов.
+Перестраивается раз в сутки, точечно обновляется при изменении цветка
+"""
+
+import asyncio
+import logging
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.core.database import AsyncSessionLocal
+from app.core.local_cache import add_invalidation_listener, invalidation_bus
+from app.core.serializers import flower_list_item
+from app.crud.crud_flower import crud_flower
+
+logger = logging.getLogger(__name__)
+
+SEASONAL_NAMESPACE = "seasonal"
+
+# Пока шина инвалидации не подключена, изменения других воркеров не приходят:
+# индекс перестраивается не реже, чем раз в столько секунд
+REBUILD_WITHOUT_BUS_INTERVAL = 60.0
+
+# Високосный год: в индексе есть 29 февраля
+_LEAP_YEAR = 2000
+DAYS_IN_INDEX = 366
+
+
+def day_of_year(value: str) -> int:
+    """MM-DD -> индекс дня 0..365 (ValueError на некорректной дате)"""
+    month, day = value.strip().split("-")
+    return date(_LEAP_YEAR, int(month), int(day)).timetuple().tm_yday - 1
+
+
+def today_index(today: Optional[date] = None) -> int:
+    today = today or date.today()
+    return date(_LEAP_YEAR, today.month, today.day).timetuple().tm_yday - 1
+
+
+def season_days(season_start: Optional[str], season_end: Optional[str]) -> Tuple[int, ...]:
+    """Дни сезона; сезон через Новый год (12-01 .. 02-28) разворачивается в два отрезка"""
+    if not season_start or not season_end:
+        return ()
+    start, end = day_of_year(season_start), day_of_year(season_end)
+    if start <= end:
+        return tuple(range(start, end + 1))
+    return tuple(range(start, DAYS_IN_INDEX)) + tuple(range(0, end + 1))
+
+
+class SeasonalIndex:
+    """
+    Индекс сезонности в памяти воркера
+    
+    Запрос сезонных цветов - lookup по дню года без обращения к БД.
+    Изменения цветов рассылаются через шину инвалидации L1: каждый
+    воркер помечает цветок грязным и перечитывает только его. Без
+    подписки на шину - периодическая перестройка при обращении.
+    """
+    
+    def __init__(self):
+        self._days: List[Set[int]] = [set() for _ in range(DAYS_IN_INDEX)]
+        self._flower_days: Dict[int, Tuple[int, ...]] = {}
+        self._cards: Dict[int, Dict[str, Any]] = {}
+        self._rendered: Dict[int, List[Dict[str, Any]]] = {}
+        self._dirty: Set[int] = set()
+        self._needs_rebuild = True
+        self._built_at = 0.0
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        add_invalidation_listener(SEASONAL_NAMESPACE, self._on_invalidate)
+    
+    def _on_invalidate(self, key: Optional[str]) -> None:
+        if key is None:
+            self._needs_rebuild = True
+        else:
+            self._dirty.add(int(key))
+    
+    def _remove(self, flower_id: int) -> None:
+        for day in self._flower_days.pop(flower_id, ()):
+            self._days[day].discard(flower_id)
+            self._rendered.pop(day, None)
+        self._cards.pop(flower_id, None)
+    
+    def _add(self, row) -> None:
+        if not row.is_available:
+            return
+        try:
+            days = season_days(row.season_start, row.season_end)
+        except ValueError:
+            logger.warning(f"Invalid season for flower {row.id}: {row.season_start}..{row.season_end}")
+            return
+        if not days:
+            return
+        self._flower_days[row.id] = days
+        self._cards[row.id] = flower_list_item(row)
+        for day in days:
+            self._days[day].add(row.id)
+            self._rendered.pop(day, None)
+    
+    async def rebuild(self) -> None:
+        """Полная перестройка (при старте и раз в сутки)"""
+        async with self._lock:
+            self._needs_rebuild = False
+            self._built_at = time.monotonic()
+            self._dirty.clear()
+            async with AsyncSessionLocal() as db:
+                rows = await crud_flower.list_seasonal(db)
+            self._days = [set() for _ in range(DAYS_IN_INDEX)]
+            self._flower_days = {}
+            self._cards = {}
+            self._rendered = {}
+            for row in rows:
+                self._add(row)
+            logger.info(f"Seasonal index rebuilt: {len(self._cards)} seasonal flowers")
+    
+    async def _refresh_dirty(self) -> None:
+        async with self._lock:
+            if not self._dirty:
+                return
+            flower_ids, self._dirty = sorted(self._dirty), set()
+            async with AsyncSessionLocal() as db:
+                rows = await crud_flower.list_seasonal(db, flower_ids)
+            for flower_id in flower_ids:
+                self._remove(flower_id)
+            for row in rows:
+                self._add(row)
+    
+    def _stale(self) -> bool:
+        return (
+            not invalidation_bus.connected
+            and time.monotonic() - self._built_at > REBUILD_WITHOUT_BUS_INTERVAL
+        )
+    
+    async def for_day(self, today: Optional[date] = None) -> List[Dict[str, Any]]:
+        """Сезонные доступные цветы на дату (по умолчанию - сегодня)"""
+        if self._needs_rebuild:
+            await self.rebuild()
+        elif self._stale():
+            # Одна перестройка: параллельные запросы пока отдают текущий индекс
+            self._built_at = time.monotonic()
+            await self.rebuild()
+        elif self._dirty:
+            await self._refresh_dirty()
+        day = today_index(today)
+        rendered = self._rendered.get(day)
+        if rendered is None:
+            cards = (self._cards[flower_id] for flower_id in self._days[day])
+            rendered = sorted(cards, key=lambda card: (card["name"], card["id"]))
+            self._rendered[day] = rendered
+        return rendered
+    
+    async def flower_changed(self, flower_id: int) -> None:
+        """Точечное обновление на всех воркерах (после create/update/delete цветка)"""
+        await invalidation_bus.publish(SEASONAL_NAMESPACE, str(flower_id))
+    
+    async def start(self) -> None:
+        """Строит индекс и запускает ежесуточную перестройку"""
+        if self._task is not None:
+            return
+        await self.rebuild()
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def _run(self) -> None:
+        while True:
+            now = datetime.now()
+            next_midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+            await asyncio.sleep((next_midnight - now).total_seconds() + 1)
+            try:
+                await self.rebuild()
+            except Exception as e:
+                logger.warning(f"Seasonal index rebuild error: {e}")
+                self._needs_rebuild = True
+
+
+seasonal_index = SeasonalIndex()
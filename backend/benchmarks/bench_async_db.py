@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+⚡ Sync vs async DB endpoints
+Сравнивает req/s и задержки двух развернутых версий API (например, сборка до
+перехода на AsyncSession и после) на одних и тех же DB-эндпоинтах.
+
+Запуск:
+    python -m benchmarks.bench_async_db --baseline http://localhost:8001 --candidate http://localhost:8000
+Без --baseline меряется только --candidate.
+"""
+
+import argparse
+import asyncio
+from typing import List, Optional
+
+import httpx
+
+from benchmarks.bench_db_pool import run_level
+
+# Эндпоинты, которые идут в Postgres мимо HTTP/Redis кэша
+DEFAULT_PATHS = [
+    "/api/v1/flowers/search?query=роза&limit=10",
+    "/api/v1/flowers/popular?limit=10",
+    "/api/v1/flowers/seasonal",
+]
+
+
+async def measure(url: str, paths: List[str], concurrency: int, duration: float):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    # no-cache: CacheMiddleware не отвечает из Redis
+    headers = {"Cache-Control": "no-cache"}
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30, headers=headers) as client:
+        results = {}
+        for path in paths:
+            await client.get(path)  # Прогрев
+            results[path] = await run_level(client, path, concurrency, duration)
+        return results
+
+
+async def main(baseline: Optional[str], candidate: str, paths: List[str], concurrency: int, duration: float):
+    runs = [("candidate", candidate)]
+    if baseline:
+        runs.insert(0, ("baseline", baseline))
+    
+    measured = {}
+    for label, url in runs:
+        measured[label] = await measure(url, paths, concurrency, duration)
+    
+    print(f"concurrency={concurrency}, duration={duration}s per endpoint")
+    print(f"{'endpoint':<45} {'run':<10} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for path in paths:
+        for label, _ in runs:
+            rps, p50, p99, errors = measured[label][path]
+            print(f"{path[:45]:<45} {label:<10} {rps:>9.0f} {p50:>9.2f} {p99:>9.2f} {errors:>7}")
+        if baseline:
+            speedup = measured["candidate"][path][0] / max(measured["baseline"][path][0], 1e-9)
+            print(f"{'':<45} {'speedup':<10} {speedup:>8.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--baseline", default=None, help="URL сборки с sync Session")
+    parser.add_argument("--candidate", default="http://localhost:8000", help="URL сборки с AsyncSession")
+    parser.add_argument("--paths", default=",".join(DEFAULT_PATHS))
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.baseline, args.candidate, args.paths.split(","), args.concurrency, args.duration))
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+⚡ Authenticated request benchmark
+Пропускная способность эндпоинта за авторизацией: прежний get_current_user
+(sync в threadpool, jwt.decode + 3 обращения к Redis + гидрация User через
+setattr) против быстрого пути app.core.auth (кэш claims, локальная реплика
+отзывов, снимок из L1/Redis, Principal).
+
+Запуск (из каталога backend, нужен доступный REDIS_URL; БД не нужна -
+снимок пользователя кладется в Redis заранее):
+    python -m benchmarks.bench_auth --requests 5000 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+import httpx
+from fastapi import Depends, FastAPI, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials
+from jose import jwt
+from sqlalchemy.orm import Session
+
+from app.api.v1.deps import get_current_user, security
+from app.core.database import get_db
+from app.core.redis import redis_manager
+from app.core.config import settings
+from app.core.security import create_access_token, redis_client
+from app.core.user_cache import UserCache
+from app.models.user import User, UserRole
+
+BENCH_USER_ID = 987654321
+
+
+def legacy_current_user(
+    db: Session = Depends(get_db),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> User:
+    """Прежний get_current_user (без логирования токена, на кэше пользователя)"""
+    token = credentials.credentials
+    if redis_client.exists(f"token_blacklist:{token}"):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+    payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    user_id = int(payload["sub"])
+    if redis_client.exists(f"user_blacklist:{user_id}"):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+    cached_user_data = UserCache.get_user(user_id)
+    if not cached_user_data:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+    user = User()
+    for key, value in cached_user_data.items():
+        if key == "role":
+            value = UserRole(value) if value else UserRole.CLIENT
+        elif key in ["created_at", "updated_at"] and value:
+            value = datetime.fromisoformat(value)
+        setattr(user, key, value)
+    return user
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/legacy")
+    async def legacy(user: User = Depends(legacy_current_user)):
+        return {"id": user.id}
+
+    @app.get("/fast")
+    async def fast(user=Depends(get_current_user)):
+        return {"id": user.id}
+
+    return app
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index] * 1000
+
+
+async def run(client: httpx.AsyncClient, path: str, token: str, requests: int, concurrency: int) -> None:
+    latencies: List[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.get(path, headers=headers)
+            latencies.append(time.perf_counter() - started)
+            assert response.status_code == 200, response.text
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    print(
+        f"{path:<10} req/s={requests / elapsed:8.0f} "
+        f"p50={percentile(latencies, 50):7.3f}ms "
+        f"p99={percentile(latencies, 99):7.3f}ms "
+        f"mean={statistics.mean(latencies) * 1000:7.3f}ms"
+    )
+
+
+async def main(requests: int, concurrency: int) -> None:
+    await redis_manager.connect()
+    snapshot = {
+        "id": BENCH_USER_ID,
+        "email": "bench@msk-flower.su",
+        "full_name": "Benchmark User",
+        "phone": None,
+        "telegram_id": None,
+        "role": UserRole.CLIENT.value,
+        "is_active": True,
+        "is_verified": True,
+        "bonus_points": 0,
+        "address": None,
+        "preferences": None,
+        "created_at": datetime.now().isoformat(),
+        "updated_at": None
+    }
+    key = UserCache.key(BENCH_USER_ID)
+    await redis_manager.redis_client.setex(key, 600, json.dumps(snapshot))
+    token = create_access_token({"sub": str(BENCH_USER_ID)}, expires_delta=timedelta(minutes=10))
+
+    transport = httpx.ASGITransport(app=build_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"requests={requests} concurrency={concurrency}")
+        for path in ("/legacy", "/fast"):
+            # Прогрев: кэши claims/L1 и пул соединений
+            await run(client, path, token, min(requests, 200), concurrency)
+        for path in ("/legacy", "/fast"):
+            await run(client, path, token, requests, concurrency)
+
+    await redis_manager.redis_client.delete(key)
+    await redis_manager.disconnect()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
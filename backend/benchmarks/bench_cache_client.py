@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+⚡ Cache client benchmark
+Сравнивает p50/p99 латентность CacheManager на асинхронном пуле
+с прежним путем через blocking redis.Redis + asyncio.to_thread.
+
+Запуск (из каталога backend, нужен доступный REDIS_URL):
+    python -m benchmarks.bench_cache_client --requests 5000 --concurrency 100
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Awaitable, Callable, List
+
+import redis
+
+from app.core.cache import CacheManager
+from app.core.config import settings
+from app.core.redis import RedisManager
+
+PAYLOAD = {
+    "id": 1,
+    "name": "Роза Red Naomi",
+    "category": "roses",
+    "price": 250.0,
+    "image_url": "https://msk-flower.su/images/roses/red-naomi.jpg",
+    "is_available": True,
+    "views_count": 1024,
+    "orders_count": 128,
+}
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Перцентиль по отсортированной выборке (в миллисекундах)"""
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index] * 1000
+
+
+async def run(name: str, op: Callable[[int], Awaitable], requests: int, concurrency: int):
+    """Запускает op requests раз с заданной параллельностью и печатает результат"""
+    latencies: List[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            started = time.perf_counter()
+            await op(i)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+
+    print(
+        f"{name:<28} p50={percentile(latencies, 50):7.3f}ms "
+        f"p99={percentile(latencies, 99):7.3f}ms "
+        f"mean={statistics.mean(latencies) * 1000:7.3f}ms "
+        f"ops/s={requests / elapsed:9.0f}"
+    )
+
+
+async def main(requests: int, concurrency: int, batch: int):
+    keys = [f"cache:bench:{i}" for i in range(batch)]
+
+    # Прежний путь: blocking клиент + поток на каждую операцию
+    sync_client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    serialized = json.dumps(PAYLOAD, default=str)
+
+    async def to_thread_get(i: int):
+        value = await asyncio.to_thread(sync_client.get, keys[i % batch])
+        return json.loads(value) if value else None
+
+    async def to_thread_set(i: int):
+        await asyncio.to_thread(sync_client.setex, keys[i % batch], 60, serialized)
+
+    async def to_thread_batch_get(i: int):
+        return [await asyncio.to_thread(sync_client.get, key) for key in keys]
+
+    # Новый путь: CacheManager на пуле RedisManager
+    manager = RedisManager()
+    await manager.connect()
+    cache = CacheManager(manager)
+
+    async def async_get(i: int):
+        return await cache.get(keys[i % batch])
+
+    async def async_set(i: int):
+        await cache.set(keys[i % batch], PAYLOAD, 60)
+
+    async def async_batch_get(i: int):
+        return await cache.get_many(keys)
+
+    print(f"requests={requests} concurrency={concurrency} batch={batch}")
+    await run("to_thread set", to_thread_set, requests, concurrency)
+    await run("async set", async_set, requests, concurrency)
+    await run("to_thread get", to_thread_get, requests, concurrency)
+    await run("async get", async_get, requests, concurrency)
+    await run(f"to_thread {batch}x get", to_thread_batch_get, requests // batch or 1, concurrency)
+    await run(f"async mget x{batch}", async_batch_get, requests // batch or 1, concurrency)
+
+    await cache.delete(*keys)
+    await manager.disconnect()
+    sync_client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--batch", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency, args.batch))
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+🗄️ DB pool load test
+Показывает, как растет пропускная способность sync-эндпоинта с ростом
+числа параллельных запросов (при StaticPool все упиралось в одно соединение).
+
+Запуск против поднятого API:
+    python -m benchmarks.bench_db_pool --url http://localhost:8000 --duration 10
+По умолчанию бьет в /api/v1/flowers/search - sync-эндпоинт без кэша.
+"""
+
+import argparse
+import asyncio
+import time
+from typing import List
+
+import httpx
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index] * 1000
+
+
+async def run_level(client: httpx.AsyncClient, path: str, concurrency: int, duration: float):
+    """Гоняет concurrency воркеров duration секунд, возвращает (rps, p50, p99, errors)"""
+    latencies: List[float] = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                response = await client.get(path)
+                if response.status_code >= 500:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return len(latencies) / elapsed, percentile(latencies, 50), percentile(latencies, 99), errors
+
+
+async def main(url: str, path: str, levels: List[int], duration: float):
+    limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        await client.get(path)  # Прогрев
+        print(f"{'concurrency':>11} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+        for concurrency in levels:
+            rps, p50, p99, errors = await run_level(client, path, concurrency, duration)
+            print(f"{concurrency:>11} {rps:>9.0f} {p50:>9.2f} {p99:>9.2f} {errors:>7}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--path", default="/api/v1/flowers/search?query=роза&limit=10")
+    parser.add_argument("--levels", default="1,2,4,8,16,32,64")
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.url, args.path, [int(level) for level in args.levels.split(",")], args.duration))
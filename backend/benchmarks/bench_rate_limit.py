@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+⚡ Rate limiter benchmark
+Прежний RateLimiter (sync pipeline из 4 команд + ZRANGE при превышении
+прямо в event loop, member - целая секунда) против Lua-скриптов
+app.core.rate_limiter (sliding window log и GCRA, один EVALSHA на async-пуле).
+
+Кроме пропускной способности печатает точность: сколько запросов из
+серии 2 * limit было пропущено (должно быть ровно limit).
+
+Запуск (из каталога backend, нужен доступный REDIS_URL):
+    python -m benchmarks.bench_rate_limit --requests 20000 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Awaitable, Callable, List
+
+from app.core.rate_limiter import RateLimiter, RateLimitAlgorithm, redis_client
+from app.core.redis import redis_manager
+
+LIMIT = 100
+WINDOW = 60
+
+
+async def legacy_hit(identifier: str) -> bool:
+    """Прежний is_allowed без обертки Request (блокирующие вызовы, как и было)"""
+    key = f"bench_rate_limit:legacy:{identifier}"
+    current_time = int(time.time())
+    pipe = redis_client.pipeline()
+    pipe.zremrangebyscore(key, 0, current_time - WINDOW)
+    pipe.zcard(key)
+    pipe.zadd(key, {str(current_time): current_time})
+    pipe.expire(key, WINDOW + 1)
+    current_requests = pipe.execute()[1]
+    if current_requests >= LIMIT:
+        redis_client.zrange(key, 0, 0, withscores=True)
+        return False
+    return True
+
+
+def lua_hit(algorithm: RateLimitAlgorithm) -> Callable[[str], Awaitable[bool]]:
+    limiter = RateLimiter(requests=LIMIT, window=WINDOW, algorithm=algorithm)
+
+    async def hit(identifier: str) -> bool:
+        allowed, _ = await limiter.hit(f"bench:{identifier}")
+        return allowed
+
+    return hit
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index] * 1000
+
+
+def cleanup() -> None:
+    for pattern in ("bench_rate_limit:*", "rate_limit:*:bench:*"):
+        keys = list(redis_client.scan_iter(match=pattern, count=1000))
+        if keys:
+            redis_client.delete(*keys)
+
+
+async def run(
+    name: str,
+    hit: Callable[[str], Awaitable[bool]],
+    requests: int,
+    concurrency: int,
+    clients: int
+) -> None:
+    latencies: List[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            started = time.perf_counter()
+            await hit(f"client-{i % clients}")
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+
+    # Точность: серия 2 * LIMIT запросов одного нового клиента
+    allowed = sum([await hit("accuracy") for _ in range(2 * LIMIT)])
+
+    print(
+        f"{name:<16} ops/s={requests / elapsed:8.0f} "
+        f"p50={percentile(latencies, 50):7.3f}ms "
+        f"p99={percentile(latencies, 99):7.3f}ms "
+        f"mean={statistics.mean(latencies) * 1000:7.3f}ms "
+        f"allowed={allowed}/{2 * LIMIT} (limit {LIMIT})"
+    )
+
+
+async def main(requests: int, concurrency: int, clients: int) -> None:
+    await redis_manager.connect()
+    cleanup()
+    print(f"requests={requests} concurrency={concurrency} clients={clients}")
+    try:
+        await run("legacy", legacy_hit, requests, concurrency, clients)
+        await run("lua sliding", lua_hit(RateLimitAlgorithm.SLIDING_WINDOW), requests, concurrency, clients)
+        await run("lua gcra", lua_hit(RateLimitAlgorithm.GCRA), requests, concurrency, clients)
+    finally:
+        cleanup()
+        await redis_manager.disconnect()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--clients", type=int, default=1000, help="Разных идентификаторов (IP) в нагрузке")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency, args.clients))
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+⚡ Flower list serialization microbenchmark
+Страница каталога из 100 цветов: старый путь (ORM-объекты, dict в цикле,
+jsonable_encoder + json.dumps в JSONResponse) против проекции колонок,
+flower_list_item и ORJSONResponse.
+
+Запуск (БД не нужна):
+    python -m benchmarks.bench_serialization --items 100 --number 2000
+"""
+
+import argparse
+import statistics
+import timeit
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.core.serializers import FLOWER_LIST_COLUMNS, flower_list_item, render
+from app.models.flower import Flower, FlowerCategory
+
+# Row проекции FLOWER_LIST_COLUMNS (атрибутный доступ, как у sqlalchemy Row)
+FlowerRow = namedtuple("FlowerRow", [column.key for column in FLOWER_LIST_COLUMNS])
+
+
+def make_flowers(count: int):
+    categories = list(FlowerCategory)
+    flowers = []
+    for index in range(count):
+        flowers.append(Flower(
+            id=index + 1,
+            name=f"Роза пионовидная {index}",
+            description="Нежный букет " * 10,
+            category=categories[index % len(categories)],
+            price=1500.0 + index,
+            image_url=f"https://cdn.example.com/flowers/{index}.jpg",
+            is_available=True,
+            views_count=index * 7,
+            orders_count=index * 3,
+            created_at=datetime.now(timezone.utc)
+        ))
+    return flowers
+
+
+def page(items):
+    return {"items": items, "total": 1000, "pages": 10, "current_page": 1, "per_page": len(items)}
+
+
+def legacy(flowers):
+    result = []
+    for flower in flowers:
+        result.append({
+            "id": flower.id,
+            "name": flower.name,
+            "category": flower.category.value if flower.category else None,
+            "price": flower.price,
+            "image_url": flower.image_url,
+            "is_available": flower.is_available,
+            "views_count": flower.views_count,
+            "orders_count": flower.orders_count
+        })
+    return JSONResponse(jsonable_encoder(page(result))).body
+
+
+def projection_json(rows):
+    return JSONResponse(jsonable_encoder(page([flower_list_item(row) for row in rows]))).body
+
+
+def projection_orjson(rows):
+    return render(page([flower_list_item(row) for row in rows])).body
+
+
+def measure(name: str, func, payload, number: int, repeat: int) -> None:
+    timings = timeit.repeat(lambda: func(payload), number=number, repeat=repeat)
+    per_call = [timing / number * 1e6 for timing in timings]
+    size = len(func(payload))
+    print(f"{name:<40} {min(per_call):>9.1f} {statistics.median(per_call):>9.1f} {size:>8}")
+
+
+def main(items: int, number: int, repeat: int) -> None:
+    flowers = make_flowers(items)
+    rows = [FlowerRow(*(getattr(flower, column.key) for column in FLOWER_LIST_COLUMNS)) for flower in flowers]
+    assert projection_orjson(rows) and legacy(flowers)
+    print(f"{items} items per page, {number} x {repeat} runs")
+    print(f"{'variant':<40} {'best us':>9} {'median us':>9} {'bytes':>8}")
+    measure("ORM + dict loop + JSONResponse", legacy, flowers, number, repeat)
+    measure("projection + jsonable_encoder + json", projection_json, rows, number, repeat)
+    measure("projection + ORJSONResponse (render)", projection_orjson, rows, number, repeat)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--number", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main(args.items, args.number, args.repeat)
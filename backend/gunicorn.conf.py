@@ -0,0 +1,37 @@
+"""
+🦄 Gunicorn config
+Несколько uvicorn-воркеров с общими метриками Prometheus:
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+Каждый воркер пишет метрики в файлы PROMETHEUS_MULTIPROC_DIR, /metrics
+любого воркера отдает сумму по всем (app.core.metrics.metrics_payload).
+Для `uvicorn --workers N` достаточно задать PROMETHEUS_MULTIPROC_DIR
+пустым каталогом перед запуском
+"""
+
+import multiprocessing
+import os
+import shutil
+
+# До импорта приложения воркерами: prometheus_client выбирает режим при создании метрик
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/prometheus_multiproc")
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("GUNICORN_WORKERS", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+graceful_timeout = 30
+keepalive = 5
+
+
+def on_starting(server):
+    """Файлы прошлого запуска дали бы чужие значения счетчиков"""
+    path = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    """livesum-гейджи (пул БД) умершего воркера больше не учитываются"""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,125 @@
+"""
+Общие фикстуры API-тестов: SQLite-файл вместо PostgreSQL, без Redis
+(кэши, рейтинги и счетчики работают в fail-open режиме)
+"""
+
+import os
+import tempfile
+
+# До импорта app: settings и движки БД создаются при импорте
+_DB_PATH = os.path.join(tempfile.mkdtemp(prefix="flowers-tests-"), "test.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_DB_PATH}"
+os.environ["ASYNC_DATABASE_URL"] = f"sqlite+aiosqlite:///{_DB_PATH}"
+os.environ["DEBUG"] = "false"
+os.environ["PASSWORD_HASH_WORKERS"] = "0"
+
+from datetime import date, datetime, time, timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.schema import CreateColumn
+
+from app.api.v1 import deps
+from app.api.v1.api import api_router
+from app.core.auth import Principal
+from app.core.config import settings
+from app.core.database import Base, SessionLocal, engine
+from app.models.flower import Flower, FlowerCategory
+from app.models.order import Order, OrderItem, OrderStatus
+from app.models.user import User, UserRole
+
+ORDERS_COUNT = 10
+FLOWERS_COUNT = 3
+
+
+@compiles(CreateColumn, "sqlite")
+def _tsvector_as_text(element, compiler, **kw):
+    # В SQLite нет tsvector и to_tsvector: поисковая колонка - обычный TEXT (NULL),
+    # поиск в этих тестах не участвует; индексы пропускает их ddl_if(dialect="postgresql")
+    column = element.element
+    if isinstance(column.type, TSVECTOR):
+        return f"{compiler.preparer.format_column(column)} TEXT"
+    return compiler.visit_create_column(element, **kw)
+
+
+def _add_order(db, user_id: int, flowers, number: str) -> Order:
+    order = Order(
+        user_id=user_id,
+        order_number=f"FL-TEST-{number}",
+        status=OrderStatus.CONFIRMED,
+        subtotal=300,
+        total_amount=300,
+        delivery_address="Москва",
+        delivery_date=datetime.combine(date.today(), time(12)),
+        delivery_claim_id=f"claim-{number}"
+    )
+    db.add(order)
+    db.flush()
+    db.add_all([
+        OrderItem(order_id=order.id, flower_id=flower.id, quantity=1, unit_price=100, total_price=100)
+        for flower in flowers
+    ])
+    return order
+
+
+@pytest.fixture(scope="session")
+def schema() -> None:
+    Base.metadata.create_all(engine)
+
+
+@pytest.fixture(scope="session")
+def admin(schema) -> Principal:
+    db = SessionLocal()
+    try:
+        user = User(email="admin@example.com", hashed_password="x", full_name="Admin", role=UserRole.ADMIN)
+        db.add(user)
+        flowers = [
+            Flower(name=f"Flower {i}", price=100, category=FlowerCategory.ROSES, stock_quantity=100)
+            for i in range(FLOWERS_COUNT)
+        ]
+        db.add_all(flowers)
+        db.flush()
+        
+        for i in range(ORDERS_COUNT):
+            _add_order(db, user.id, flowers, str(i))
+        db.commit()
+        
+        return Principal(
+            id=user.id,
+            email=user.email,
+            full_name=user.full_name,
+            role=UserRole.ADMIN,
+            is_active=True,
+            is_verified=True,
+            bonus_points=0
+        )
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def order_id(admin: Principal):
+    """Отдельный заказ теста (удаляется после него): общие данные сессии не меняются"""
+    db = SessionLocal()
+    try:
+        flowers = db.query(Flower).order_by(Flower.id).limit(FLOWERS_COUNT).all()
+        order = _add_order(db, admin.id, flowers, "own")
+        db.commit()
+        yield order.id
+        db.query(OrderItem).filter(OrderItem.order_id == order.id).delete()
+        db.query(Order).filter(Order.id == order.id).delete()
+        db.commit()
+    finally:
+        db.close()
+
+
+@pytest.fixture(scope="session")
+def client(admin: Principal) -> TestClient:
+    app = FastAPI()
+    app.include_router(api_router, prefix=settings.API_V1_STR)
+    app.dependency_overrides[deps.get_current_active_user] = lambda: admin
+    app.dependency_overrides[deps.get_current_admin_user] = lambda: admin
+    return TestClient(app)
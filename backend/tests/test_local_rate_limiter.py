@@ -0,0 +1,51 @@
+"""
+Локальный tier лимитера: count-min sketch только завышает оценку, поэтому
+отказ без Redis не должен быть строже общего лимита
+"""
+
+import pytest
+
+from app.core.local_rate_limiter import LocalAdmission
+
+WINDOW = 60
+NOW = 1_000_000.0
+
+
+def saturated(admission: LocalAdmission, limit: int, events: int) -> LocalAdmission:
+    """Каждая ячейка узкого sketch набирает events / width чужих запросов"""
+    for i in range(events):
+        admission.record(f"other-{i}", limit, WINDOW, NOW)
+    return admission
+
+
+def test_small_limit_ignores_sketch():
+    # Узкий sketch: оценка любого ключа - сотни запросов, у клиента их нет
+    admission = saturated(LocalAdmission(sketch_width=16, min_limit=50), limit=100, events=20_000)
+    assert admission._sketch(WINDOW).estimate("client", NOW) > 5 * 2
+    assert admission.rejected("client", 5, WINDOW, NOW) is None
+
+
+def test_collisions_below_factor_are_admitted():
+    admission = saturated(LocalAdmission(sketch_width=64, factor=2.0, min_limit=50), limit=100, events=64 * 150)
+    estimate = admission._sketch(WINDOW).estimate("client", NOW)
+    # Оценка уже выше лимита только за счет коллизий - Redis решит сам
+    assert 100 <= estimate < 200
+    assert admission.rejected("client", 100, WINDOW, NOW) is None
+
+
+def test_client_over_factor_is_rejected():
+    admission = LocalAdmission(sketch_width=4096, factor=2.0, min_limit=50)
+    for _ in range(200):
+        admission.record("client", 100, WINDOW, NOW)
+    assert admission.rejected("client", 100, WINDOW, NOW) is not None
+
+
+def test_redis_block_applies_to_small_limits():
+    admission = LocalAdmission(min_limit=50)
+    admission.block("client", NOW + 30)
+    assert admission.rejected("client", 5, WINDOW, NOW) == pytest.approx(30)
+
+
+def test_factor_must_exceed_one():
+    with pytest.raises(ValueError):
+        LocalAdmission(factor=1.0)
@@ -0,0 +1,54 @@
+"""
+Бюджеты SQL-запросов эндпоинтов заказов и доставки: число запросов не
+должно зависеть от числа заказов и позиций на странице (N+1)
+"""
+
+import pytest
+
+from app.core.query_budget import StatementBudgetExceeded, statement_budget
+
+from tests.conftest import FLOWERS_COUNT, ORDERS_COUNT
+
+ORDERS = "/api/v1/orders"
+DELIVERY = "/api/v1/delivery"
+
+
+def test_get_order(client):
+    with statement_budget(2):
+        response = client.get(f"{ORDERS}/1")
+    assert response.status_code == 200
+    assert len(response.json()["items"]) == FLOWERS_COUNT
+
+
+@pytest.mark.parametrize("path", [f"{ORDERS}/admin/all", f"{ORDERS}/admin/today"])
+def test_admin_order_lists(client, path):
+    # Заказы + позиции всей страницы одним IN-запросом
+    with statement_budget(2):
+        response = client.get(path)
+    assert response.status_code == 200
+    orders = response.json()
+    assert len(orders) == ORDERS_COUNT
+    assert all(len(order["items"]) == FLOWERS_COUNT for order in orders)
+
+
+def test_get_delivery_orders(client):
+    # Покупатель - JOIN в том же запросе
+    with statement_budget(1):
+        response = client.get(f"{DELIVERY}/admin/orders")
+    assert response.status_code == 200
+    assert len(response.json()["data"]) == ORDERS_COUNT
+
+
+def test_update_order_status(client, order_id):
+    with statement_budget(4):
+        response = client.put(f"{ORDERS}/admin/{order_id}/status", json={"status": "preparing"})
+    assert response.status_code == 200
+    assert response.json()["status"] == "preparing"
+    assert len(response.json()["items"]) == FLOWERS_COUNT
+
+
+def test_budget_exceeded(client):
+    with pytest.raises(StatementBudgetExceeded) as exc_info:
+        with statement_budget(1):
+            client.get(f"{ORDERS}/1")
+    assert len(exc_info.value.statements) == 2
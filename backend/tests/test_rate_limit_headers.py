@@ -0,0 +1,39 @@
+"""
+X-RateLimit-* заголовки на ответах, которые роут собирает сам (render())
+"""
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1.api import api_router
+from app.core import rate_limiter
+from app.core.config import settings
+from app.core.rate_limiter import RateLimitHeadersMiddleware, enforce_rate_limits
+
+# Ответ Lua-скрипта: {allowed, remaining, reset_ms, retry_after_ms}
+SCRIPT_RESULT = [1, 99, 60000, 0]
+
+
+@pytest.fixture
+def limited_client(admin, monkeypatch) -> TestClient:
+    async def run_scripts(calls):
+        return [SCRIPT_RESULT for _ in calls]
+    
+    monkeypatch.setattr(settings, "RATE_LIMIT_DEFAULT", "api_general")
+    monkeypatch.setattr(settings, "RATE_LIMIT_LOCAL_ENABLED", False)
+    monkeypatch.setattr(rate_limiter, "_run_scripts", run_scripts)
+    
+    app = FastAPI(dependencies=[Depends(enforce_rate_limits)])
+    app.include_router(api_router, prefix=settings.API_V1_STR)
+    app.add_middleware(RateLimitHeadersMiddleware)
+    return TestClient(app)
+
+
+def test_flowers_list_has_rate_limit_headers(limited_client):
+    response = limited_client.get("/api/v1/flowers/")
+    assert response.status_code == 200
+    limit = rate_limiter.RATE_LIMITS["api_general"].requests
+    assert response.headers["X-RateLimit-Limit"] == str(limit)
+    assert response.headers["X-RateLimit-Remaining"] == "99"
+    assert response.headers["X-RateLimit-Reset"] == "60"